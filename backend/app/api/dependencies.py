@@ -1,11 +1,15 @@
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.core.security import decode_access_token
+from app.core.config import settings
+from app.core.metrics import record_stage
 from app.db.session import get_db
 from app.models.user import User
+from app.services.auth_service import auth_cache, principal_from_claims
 
 security = HTTPBearer()
 
@@ -16,30 +20,56 @@ async def get_current_user(
 ) -> User:
     """
     Dependency to get the current authenticated user from JWT token.
+    Decoded tokens and active users are cached (see AuthCache).
     """
-    token = credentials.credentials
-    user_id = decode_access_token(token)
+    start = time.perf_counter_ns()
+    try:
+        token = credentials.credentials
+        claims = auth_cache.claims_for(token)
 
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-        )
+        if claims is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials",
+            )
+        user_id = claims["sub"]
 
-    stmt = select(User).where(User.id == user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+        if settings.AUTH_TRUST_TOKEN_CLAIMS:
+            principal = principal_from_claims(claims)
+            if principal is not None:
+                return principal
 
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
+        user = auth_cache.get_user(user_id)
+        if user is not None:
+            return user
+
+        stmt = select(User).where(User.id == user_id)
+        result = await db.execute(stmt)
+        user = result.scalar_one_or_none()
 
-    if not user.is_active:
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+
+        if not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Inactive user",
+            )
+
+        auth_cache.put_user(user)
+        return user
+    finally:
+        record_stage("auth", time.perf_counter_ns() - start)
+
+
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Dependency for operator endpoints: the caller must be a superuser."""
+    if not current_user.is_superuser:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Inactive user",
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
         )
-
-    return user
\ No newline at end of file
+    return current_user
@@ -1,38 +1,299 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, literal_column
 
+from app.api.dependencies import get_current_admin, get_current_user
 from app.db.session import get_db
 from app.models.gesture_log import GestureLog
+from app.models.gesture_rollup import GestureRollup, LATENCY_BUCKETS_MS
+from app.models.user import User
+from app.services.partition_service import partition_maintainer
+from app.services.rollup_service import (
+    histogram_percentiles,
+    latency_bucket_sql,
+    truncate,
+    utc_bucket,
+)
 
 router = APIRouter()
 
+Granularity = Literal["minute", "hour", "day"]
+
+
+class AnalyticsFilter:
+    """
+    Common query parameters: time window (default: last 24h), user and session.
+
+    Without a session filter queries read the rollups at the requested
+    granularity, so the window is widened to whole buckets. Rollups
+    have no session dimension, so a session filter reads gesture_logs
+    through its session_id index instead — still aggregating in SQL,
+    never sorting raw rows.
+
+    Call restrict_to() before querying: only admins may pick another
+    user_id or look across all users.
+    """
+
+    def __init__(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        user_id: UUID | None = None,
+        session_id: str | None = None,
+        granularity: Granularity = "hour",
+    ):
+        self.end = _as_utc(end) if end else datetime.now(timezone.utc)
+        self.start = _as_utc(start) if start else self.end - timedelta(days=1)
+        if self.start >= self.end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+        self.user_id = user_id
+        self.session_id = session_id
+        self.granularity = granularity
+
+    async def restrict_to(self, user: User, db: AsyncSession):
+        """Scope the filter to the caller's own data unless they are an admin."""
+        if user.is_superuser:
+            return
+        self.user_id = user.id
+        if self.session_id is not None:
+            # Session ids are chosen by clients; only a session the caller
+            # has logged frames in is theirs to read
+            owned = await db.execute(
+                select(GestureLog.id)
+                .where(GestureLog.session_id == self.session_id, GestureLog.user_id == user.id)
+                .limit(1)
+            )
+            if owned.first() is None:
+                raise HTTPException(status_code=404, detail="Session not found")
+
+    @property
+    def use_rollups(self) -> bool:
+        return self.session_id is None
+
+    def rollup_where(self) -> list:
+        where = [
+            GestureRollup.granularity == self.granularity,
+            GestureRollup.bucket_start >= truncate(self.start, self.granularity),
+            GestureRollup.bucket_start < self.end,
+        ]
+        if self.user_id is not None:
+            where.append(GestureRollup.user_id == self.user_id)
+        return where
+
+    def log_where(self) -> list:
+        where = [
+            GestureLog.session_id == self.session_id,
+            GestureLog.detected_at >= self.start,
+            GestureLog.detected_at < self.end,
+        ]
+        if self.user_id is not None:
+            where.append(GestureLog.user_id == self.user_id)
+        return where
+
+    def window(self) -> dict:
+        return {
+            "start": self.start,
+            "end": self.end,
+            "user_id": self.user_id,
+            "session_id": self.session_id,
+            "granularity": self.granularity,
+            "source": "rollups" if self.use_rollups else "logs",
+        }
+
+
+def _as_utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
 
 @router.get("/summary")
 async def get_analytics_summary(db: AsyncSession = Depends(get_db)):
-    """Get gesture detection statistics."""
+    """
+    Get gesture detection statistics.
+    Served from the daily rollups, so cost does not grow with the log table.
+    """
+    daily = GestureRollup.granularity == "day"
 
-    # Total detections
-    total = await db.execute(select(func.count(GestureLog.id)))
-    total_count = total.scalar()
+    # Total detections and average confidence
+    totals = await db.execute(
+        select(
+            func.coalesce(func.sum(GestureRollup.count), 0).label("count"),
+            func.coalesce(func.sum(GestureRollup.confidence_sum), 0.0).label("confidence_sum"),
+        ).where(daily)
+    )
+    total = totals.one()
+    total_count = int(total.count)
+    avg_conf = total.confidence_sum / total_count if total_count else 0
 
     # Most common gestures
+    gesture_count = func.sum(GestureRollup.count)
     top_gestures = await db.execute(
-        select(GestureLog.gesture_name, func.count(GestureLog.id).label("count"))
-        .group_by(GestureLog.gesture_name)
-        .order_by(func.count(GestureLog.id).desc())
+        select(GestureRollup.gesture_name, gesture_count.label("count"))
+        .where(daily)
+        .group_by(GestureRollup.gesture_name)
+        .order_by(gesture_count.desc())
         .limit(5)
     )
 
-    # Average confidence
-    avg_confidence = await db.execute(select(func.avg(GestureLog.confidence)))
-    avg_conf = avg_confidence.scalar()
-
     return {
         "total_detections": total_count,
         "average_confidence": round(float(avg_conf or 0), 3),
         "top_gestures": [
-            {"gesture": row.gesture_name, "count": row.count}
+            {"gesture": row.gesture_name, "count": int(row.count)}
             for row in top_gestures
         ],
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/latency")
+async def get_latency_percentiles(
+    filters: AnalyticsFilter = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    p50/p95/p99 ML latency for the window, from merged latency histograms
+    (accurate to the LATENCY_BUCKETS_MS bucket edges).
+    """
+    await filters.restrict_to(current_user, db)
+    hist = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    if filters.use_rollups:
+        # Sum the stored histograms element-wise: unnest with ordinality
+        # turns each array into (index, count) rows
+        cells = func.unnest(GestureRollup.latency_hist).table_valued("n", with_ordinality="i").render_derived()
+        stmt = (
+            select(cells.c.i, func.sum(cells.c.n))
+            .select_from(GestureRollup)
+            .join(cells, literal_column("true"))
+            .where(*filters.rollup_where())
+            .group_by(cells.c.i)
+        )
+        for index, count in await db.execute(stmt):
+            hist[index - 1] = int(count)
+        latency = await db.execute(
+            select(func.sum(GestureRollup.latency_sum_ms)).where(*filters.rollup_where())
+        )
+    else:
+        bucket = latency_bucket_sql(GestureLog.latency_ms)
+        stmt = (
+            select(bucket, func.count())
+            .where(*filters.log_where(), GestureLog.latency_ms.is_not(None))
+            .group_by(bucket)
+        )
+        for index, count in await db.execute(stmt):
+            hist[index] = count
+        latency = await db.execute(
+            select(func.sum(GestureLog.latency_ms)).where(*filters.log_where())
+        )
+
+    total = sum(hist)
+    latency_sum = latency.scalar() or 0.0
+    return {
+        **filters.window(),
+        "count": total,
+        "mean_ms": round(latency_sum / total, 2) if total else None,
+        **histogram_percentiles(hist),
+        "histogram": {
+            "bucket_edges_ms": list(LATENCY_BUCKETS_MS),
+            "counts": hist,
+        },
+    }
+
+
+@router.get("/throughput")
+async def get_throughput(
+    filters: AnalyticsFilter = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Detections per time bucket over the window."""
+    await filters.restrict_to(current_user, db)
+    if filters.use_rollups:
+        stmt = (
+            select(GestureRollup.bucket_start.label("bucket"), func.sum(GestureRollup.count).label("count"))
+            .where(*filters.rollup_where())
+            .group_by(GestureRollup.bucket_start)
+            .order_by(GestureRollup.bucket_start)
+        )
+    else:
+        bucket = utc_bucket(filters.granularity, GestureLog.detected_at)
+        stmt = (
+            select(bucket.label("bucket"), func.count().label("count"))
+            .where(*filters.log_where())
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+
+    rows = (await db.execute(stmt)).all()
+    seconds = {"minute": 60, "hour": 3600, "day": 86400}[filters.granularity]
+    return {
+        **filters.window(),
+        "series": [
+            {
+                "bucket_start": row.bucket,
+                "count": int(row.count),
+                "per_second": round(int(row.count) / seconds, 3),
+            }
+            for row in rows
+        ],
+    }
+
+
+@router.get("/distribution")
+async def get_gesture_distribution(
+    filters: AnalyticsFilter = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Share of each gesture in the window, with its average confidence."""
+    await filters.restrict_to(current_user, db)
+    if filters.use_rollups:
+        count = func.sum(GestureRollup.count)
+        stmt = (
+            select(
+                GestureRollup.gesture_name.label("gesture"),
+                count.label("count"),
+                (func.sum(GestureRollup.confidence_sum) / count).label("avg_confidence"),
+            )
+            .where(*filters.rollup_where())
+            .group_by(GestureRollup.gesture_name)
+            .order_by(count.desc())
+        )
+    else:
+        count = func.count()
+        stmt = (
+            select(
+                GestureLog.gesture_name.label("gesture"),
+                count.label("count"),
+                func.avg(GestureLog.confidence).label("avg_confidence"),
+            )
+            .where(*filters.log_where())
+            .group_by(GestureLog.gesture_name)
+            .order_by(count.desc())
+        )
+
+    rows = (await db.execute(stmt)).all()
+    total = sum(int(row.count) for row in rows)
+    return {
+        **filters.window(),
+        "total": total,
+        "gestures": [
+            {
+                "gesture": row.gesture,
+                "count": int(row.count),
+                "share": round(int(row.count) / total, 4),
+                "average_confidence": round(float(row.avg_confidence or 0), 3),
+            }
+            for row in rows
+        ],
+    }
+
+
+@router.get("/partitions", dependencies=[Depends(get_current_admin)])
+async def get_partition_stats():
+    """gesture_logs partition maintenance status (admins only)."""
+    return partition_maintainer.stats()
@@ -2,15 +2,29 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.api.dependencies import get_current_admin
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse
 from app.schemas.token import Token
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import create_access_token
+from app.services.auth_service import auth_cache, password_hasher, PasswordHasherBusy
 
 router = APIRouter()
 
 
+async def run_password_hasher(coro):
+    """Await a password_hasher call, turning overload into a 503."""
+    try:
+        return await coro
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
 @router.post("/register", response_model=UserResponse, status_code=201)
 async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user."""
@@ -35,7 +49,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     new_user = User(
         email=user_data.email,
         username=user_data.username,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=await run_password_hasher(password_hasher.hash(user_data.password)),
     )
 
     db.add(new_user)
@@ -54,7 +68,9 @@ async def login(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     user = result.scalar_one_or_none()
 
     # Check user exists and password is correct
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not user or not await run_password_hasher(
+        password_hasher.verify(user_data.password, user.hashed_password)
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -64,5 +80,20 @@ async def login(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Inactive user")
 
     # Create and return JWT token
-    token = create_access_token(subject=str(user.id))
-    return Token(access_token=token)
\ No newline at end of file
+    token = create_access_token(
+        subject=str(user.id),
+        claims={"active": user.is_active, "admin": user.is_superuser},
+    )
+    return Token(access_token=token)
+
+
+@router.get("/cache/stats", dependencies=[Depends(get_current_admin)])
+async def auth_cache_stats():
+    """Hit rates of the token and user caches behind get_current_user (admins only)."""
+    return auth_cache.stats()
+
+
+@router.get("/hasher/stats", dependencies=[Depends(get_current_admin)])
+async def password_hasher_stats():
+    """Concurrency, queue time and rejections of the bcrypt thread pool (admins only)."""
+    return password_hasher.stats()
\ No newline at end of file
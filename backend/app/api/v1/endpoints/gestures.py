@@ -1,12 +1,25 @@
-from typing import List
-from fastapi import APIRouter, Depends
+import base64
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from typing import List, Literal
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.core.metrics import record_stage, remaining_budget
+from app.db.session import get_db, AsyncSessionLocal
 from app.schemas.gesture import GestureRequest, GestureResponse, GestureLogResponse
 from app.services.ml_client import ml_client
+from app.services.gesture_service import gesture_log_writer
 from app.models.gesture_log import GestureLog
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_admin, get_current_user
 from app.models.user import User
 
 router = APIRouter()
@@ -15,25 +28,28 @@ router = APIRouter()
 @router.post("/predict", response_model=GestureResponse)
 async def predict_gesture(
     request: GestureRequest,
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Predict a gesture from a base64 image.
-    Saves the result to the database for analytics.
+    Queues the result for the database (analytics) without waiting for the write.
     """
-    result = await ml_client.predict(request.image_base64)
+    result = await ml_client.predict(
+        request.image_base64,
+        session_id=request.session_id,
+        budget_s=remaining_budget(settings.PREDICT_BUDGET_S),
+    )
 
-    # Save to database
-    log = GestureLog(
+    # Buffered — written in batches by the background log writer
+    start = time.perf_counter_ns()
+    await gesture_log_writer.log(
         user_id=current_user.id,
         gesture_name=result["gesture_name"],
         confidence=result["confidence"],
         latency_ms=result.get("latency_ms", 0),
-        session_id="web_session",
+        session_id=request.session_id or "web_session",
     )
-    db.add(log)
-    await db.commit()
+    record_stage("log_enqueue", time.perf_counter_ns() - start)
 
     return result
 
@@ -41,38 +57,139 @@ async def predict_gesture(
 @router.post("/ml/predict-face")
 async def predict_face_direction(request: GestureRequest):
     """Face direction detection for face-controlled snake"""
-    result = await ml_client.predict_face(request.image_base64)
+    result = await ml_client.predict_face(
+        request.image_base64, budget_s=remaining_budget(settings.PREDICT_BUDGET_S)
+    )
     return result
 
 
+@router.get("/log-writer/stats", dependencies=[Depends(get_current_admin)])
+async def gesture_log_writer_stats():
+    """Queue depth, dropped rows and flush size/latency of the log writer (admins only)."""
+    return gesture_log_writer.stats()
+
+
+@router.get("/ml-client/stats", dependencies=[Depends(get_current_admin)])
+async def ml_client_stats():
+    """Circuit breaker state, retries and hedges of the ML service client (admins only)."""
+    return ml_client.stats()
+
+
+# Columns returned by history and export — no full ORM entities
+HISTORY_COLUMNS = (
+    GestureLog.id,
+    GestureLog.gesture_name,
+    GestureLog.confidence,
+    GestureLog.latency_ms,
+    GestureLog.session_id,
+    GestureLog.detected_at,
+)
+EXPORT_CHUNK_ROWS = 1000
+
+
+def encode_cursor(detected_at: datetime, log_id: UUID) -> str:
+    """Opaque keyset cursor for the row a page ended on."""
+    raw = f"{detected_at.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        detected_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(detected_at), UUID(log_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _export_values(row) -> list:
+    """JSON/CSV-friendly values: ISO timestamps, string UUIDs."""
+    return [
+        value.isoformat() if isinstance(value, datetime)
+        else str(value) if isinstance(value, UUID)
+        else value
+        for value in row
+    ]
+
+
 @router.get("/history", response_model=List[GestureLogResponse])
 async def get_gesture_history(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: str | None = None,
 ):
     """
-    Get recent gesture detection history for the current user.
+    Get recent gesture detection history for the current user, newest first.
+
+    Keyset-paginated on (detected_at, id): when more rows exist the
+    X-Next-Cursor response header holds the cursor for the next page.
+    """
+    stmt = (
+        select(*HISTORY_COLUMNS)
+        .where(GestureLog.user_id == current_user.id)
+        .order_by(GestureLog.detected_at.desc(), GestureLog.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(tuple_(GestureLog.detected_at, GestureLog.id) < decode_cursor(cursor))
+
+    rows = (await db.execute(stmt)).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["detected_at"], last["id"])
+
+    return rows
+
+
+@router.get("/export")
+async def export_gesture_history(
+    current_user: User = Depends(get_current_user),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
     """
-    from sqlalchemy import select
+    Stream the current user's full history, oldest first, as NDJSON or CSV.
 
+    Rows come from a server-side cursor in chunks, so the export never
+    holds the whole result set in memory.
+    """
     stmt = (
-        select(GestureLog)
+        select(*HISTORY_COLUMNS)
         .where(GestureLog.user_id == current_user.id)
-        .order_by(GestureLog.detected_at.desc())
-        .limit(limit)
+        .order_by(GestureLog.detected_at, GestureLog.id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
     )
+    if start is not None:
+        stmt = stmt.where(GestureLog.detected_at >= start)
+    if end is not None:
+        stmt = stmt.where(GestureLog.detected_at < end)
 
-    result = await db.execute(stmt)
-    logs = result.scalars().all()
+    columns = [column.key for column in HISTORY_COLUMNS]
 
-    return [
-        GestureLogResponse(
-            id=log.id,
-            gesture_name=log.gesture_name,
-            confidence=log.confidence,
-            latency_ms=log.latency_ms,
-            detected_at=log.detected_at,
-        )
-        for log in logs
-    ]
\ No newline at end of file
+    async def rows():
+        # Own session: request dependencies are closed before the body streams
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt)
+            if format == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerow(columns)
+                yield buffer.getvalue()
+            async for chunk in result.partitions():
+                buffer = io.StringIO()
+                if format == "csv":
+                    csv.writer(buffer).writerows(map(_export_values, chunk))
+                else:
+                    for row in chunk:
+                        buffer.write(json.dumps(dict(zip(columns, _export_values(row)))))
+                        buffer.write("\n")
+                yield buffer.getvalue()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=gesture_history.{format}"},
+    )
@@ -1,11 +1,21 @@
-import uuid
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import asyncio
+import binascii
+import json
+import time
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
 
-from app.services.websocket_manager import ws_manager
-from app.services.ml_client import MLServiceClient
+from app.api.dependencies import get_current_admin
+from app.core.config import settings
+from app.core.metrics import StageTimer, current_timer
+from app.services.websocket_manager import ws_manager, FrameQueue
+from app.services.ml_client import decode_image_payload
+from app.services.ml_stream import ml_stream_pool
 
 router = APIRouter()
 
+# Route label for per-frame stage metrics
+WS_ROUTE = f"{settings.API_V1_PREFIX}/ws/{{session_id}}"
+
 
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
@@ -13,34 +23,107 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     Real-time WebSocket endpoint.
     Frontend connects here and sends camera frames continuously.
     We process each frame and send the gesture back instantly.
+
+    Receiving and inference run concurrently: incoming frames go into a
+    latest-frame-wins FrameQueue, so when the ML service is slower than
+    the camera stale frames are dropped instead of piling up.
     """
     await ws_manager.connect(websocket, session_id)
-    ml_client = MLServiceClient()
+    frames = FrameQueue(ws_manager.stats_for(session_id), depth=settings.WS_FRAME_QUEUE_DEPTH)
+    receiving = asyncio.create_task(receive_frames(websocket, frames))
+    inference = asyncio.create_task(process_frames(websocket, session_id, frames))
 
     try:
-        while True:
-            # Wait for image data from frontend
-            data = await websocket.receive_json()
-            image_base64 = data.get("image_base64")
-
-            if not image_base64:
-                await websocket.send_json({"error": "No image data received"})
-                continue
-
-            # Send to ML service for prediction
-            result = await ml_client.predict(image_base64)
-
-            if result:
-                await websocket.send_json({
-                    "gesture_name": result["gesture_name"],
-                    "confidence": result["confidence"],
-                    "latency_ms": result["latency_ms"],
-                    "session_id": session_id,
-                })
-            else:
-                await websocket.send_json({
-                    "error": "ML service unavailable"
-                })
+        # Whichever loop ends first ends the session — a crashed inference
+        # loop must not leave the client sending frames nobody answers
+        done, _ = await asyncio.wait({receiving, inference}, return_when=asyncio.FIRST_COMPLETED)
+        if inference in done:
+            error = inference.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"❌ Inference loop for session {session_id} failed: {error!r}")
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        else:
+            receiving.result()
+    finally:
+        frames.close()
+        receiving.cancel()
+        inference.cancel()
+        await asyncio.gather(receiving, inference, return_exceptions=True)
+        ws_manager.disconnect(session_id)
+        await ml_stream_pool.end_session(session_id)
+
 
+async def receive_frames(websocket: WebSocket, frames: FrameQueue):
+    """Receive loop: queues frames until the client disconnects."""
+    try:
+        while True:
+            # Keep the raw text — dropped frames never pay for parsing
+            frames.put(await websocket.receive_text())
     except WebSocketDisconnect:
-        ws_manager.disconnect(session_id)
\ No newline at end of file
+        pass
+
+
+async def process_frames(websocket: WebSocket, session_id: str, frames: FrameQueue):
+    """Inference loop: always works on the newest frame available."""
+    stats = frames.stats
+
+    while True:
+        item = await frames.get()
+        if item is None:
+            return
+        received_at, message = item
+        # One timer per frame, started when the frame arrived
+        timer = StageTimer(WS_ROUTE)
+        timer.started_ns = int(received_at * 1e9)
+        timer.since("queue", timer.started_ns)
+        current_timer.set(timer)
+
+        start = time.perf_counter_ns()
+        try:
+            image_base64 = json.loads(message).get("image_base64")
+        except (ValueError, AttributeError):
+            image_base64 = None
+        timer.since("parse", start)
+
+        if not image_base64:
+            await websocket.send_json({"error": "No image data received"})
+            continue
+
+        try:
+            image_bytes = decode_image_payload(image_base64)
+        except (binascii.Error, ValueError):
+            await websocket.send_json({"error": "Invalid image data"})
+            continue
+
+        # Send to ML service for prediction — the session id keeps
+        # this stream on a tracking classifier in the ML service
+        start = time.perf_counter_ns()
+        result = await ml_stream_pool.predict(
+            image_bytes, session_id=session_id, budget_s=timer.remaining(settings.WS_FRAME_BUDGET_S)
+        )
+        timer.since("ml_call", start)
+
+        start = time.perf_counter_ns()
+        if result:
+            await websocket.send_json({
+                "gesture_name": result["gesture_name"],
+                "confidence": result["confidence"],
+                "latency_ms": result["latency_ms"],
+                "session_id": session_id,
+            })
+        else:
+            await websocket.send_json({
+                "error": "ML service unavailable"
+            })
+        timer.since("send", start)
+        timer.finish()
+        stats.record_processed(received_at)
+
+
+@router.get("/ws/stats", dependencies=[Depends(get_current_admin)])
+async def websocket_stats():
+    """Received, processed and dropped frames plus lag for each live session (admins only)."""
+    return {
+        "connections": ws_manager.connection_count,
+        "sessions": ws_manager.get_stats(),
+    }
@@ -20,6 +20,20 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Authenticated users are cached in-process for AUTH_CACHE_TTL_S,
+    # so most requests skip the users lookup. With
+    # AUTH_TRUST_TOKEN_CLAIMS the signed "active" and "admin" claims are
+    # trusted and the lookup is skipped entirely (deactivation then takes
+    # effect when the token expires, or immediately within this process).
+    AUTH_CACHE_SIZE: int = 10_000
+    AUTH_CACHE_TTL_S: float = 60.0
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+
+    # bcrypt runs on its own thread pool, off the event loop; past
+    # PASSWORD_HASH_MAX_QUEUE waiting requests, login/register get a 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
     # ─── Database ────────────────────────────────────────
     POSTGRES_HOST: str = "postgres"
     POSTGRES_PORT: int = 5432
@@ -47,6 +61,86 @@ class Settings(BaseSettings):
 
     # ─── ML Service ──────────────────────────────────────
     ML_SERVICE_URL: str = "http://ml-service:8001"
+    # Several replicas (JSON list) take precedence over ML_SERVICE_URL;
+    # requests are balanced across them, sessions stay on one replica
+    ML_SERVICE_URLS: List[str] = []
+
+    @property
+    def ML_SERVICE_ENDPOINTS(self) -> List[str]:
+        """Base URLs of every ML service replica."""
+        return self.ML_SERVICE_URLS or [self.ML_SERVICE_URL]
+
+    # Live WebSocket sessions are multiplexed over this many
+    # long-lived streams to the ML service's /stream endpoint
+    ML_STREAM_CONNECTIONS: int = 2
+    ML_STREAM_TIMEOUT_S: float = 5.0
+
+    # HTTP client: total deadline per prediction (all attempts), pool
+    # limits and keep-alive. ML_HTTP2 needs an https:// URL (HTTP/2 is
+    # negotiated via TLS) and the h2 package from httpx[http2].
+    ML_REQUEST_TIMEOUT_S: float = 2.0
+    # End-to-end budget of an HTTP prediction, from the moment the
+    # request reaches the backend; the ML call (attempts, retries and
+    # hedges) gets whatever auth and parsing left of it, at most
+    # ML_REQUEST_TIMEOUT_S
+    PREDICT_BUDGET_S: float = 2.5
+    ML_CONNECT_TIMEOUT_S: float = 0.5
+    ML_POOL_MAX_CONNECTIONS: int = 100
+    ML_POOL_MAX_KEEPALIVE: int = 20
+    ML_POOL_KEEPALIVE_EXPIRY_S: float = 30.0
+    ML_HTTP2: bool = False
+    # Retries (jittered exponential backoff) and hedging (a second copy
+    # after ML_HEDGE_AFTER_S, 0 = off) stay within the deadline
+    ML_RETRIES: int = 1
+    ML_RETRY_BACKOFF_S: float = 0.05
+    ML_HEDGE_AFTER_S: float = 0.0
+    # Consecutive failures that open the circuit breaker, and how long
+    # it stays open before letting a probe request through
+    ML_BREAKER_FAILURE_THRESHOLD: int = 5
+    ML_BREAKER_RESET_S: float = 10.0
+
+    # Replicas failing /ready (checked every ML_HEALTH_INTERVAL_S, so
+    # also while they warm up) are skipped; so is one whose error rate
+    # over its last requests (at least ML_EJECT_MIN_REQUESTS) reaches
+    # ML_EJECT_ERROR_RATE, for ML_EJECT_S seconds
+    ML_HEALTH_INTERVAL_S: float = 5.0
+    ML_EJECT_ERROR_RATE: float = 0.5
+    ML_EJECT_MIN_REQUESTS: int = 10
+    ML_EJECT_S: float = 30.0
+
+    # ─── Live Sessions ───────────────────────────────────
+    # Unprocessed frames kept per WebSocket session; older ones are
+    # dropped so results never lag further behind the camera
+    WS_FRAME_QUEUE_DEPTH: int = 1
+    # A frame's budget from arrival, including time spent queued; the
+    # ML call gets the rest, and a frame with none left is not sent
+    WS_FRAME_BUDGET_S: float = 2.0
+
+    # ─── Gesture Log Writer ──────────────────────────────
+    # Predictions are logged off the response path: rows are buffered
+    # and written in batches of up to GESTURE_LOG_BATCH_SIZE, at least
+    # every GESTURE_LOG_FLUSH_INTERVAL_S seconds.
+    GESTURE_LOG_QUEUE_SIZE: int = 10_000
+    GESTURE_LOG_BATCH_SIZE: int = 500
+    GESTURE_LOG_FLUSH_INTERVAL_S: float = 1.0
+    # What to do when the queue is full: drop_newest | drop_oldest | block
+    GESTURE_LOG_OVERFLOW: str = "drop_oldest"
+
+    # ─── Gesture Log Partitions ──────────────────────────
+    # gesture_logs is partitioned by UTC day. Partitions are created
+    # this many days ahead. Retention is opt-in: with a value above 0,
+    # partitions older than that many days are dropped (history and
+    # exports lose them; rollups are kept regardless).
+    GESTURE_LOG_PARTITION_PREMAKE_DAYS: int = 7
+    GESTURE_LOG_RETENTION_DAYS: int = 0
+    GESTURE_LOG_PARTITION_CHECK_S: float = 3600.0
+
+    # ─── Observability ───────────────────────────────────
+    # Per-stage latency histograms (including the ML service's own
+    # stages, from its Server-Timing header) are always on at /metrics.
+    # This also returns them to clients as a Server-Timing header —
+    # handy in browser devtools, but it exposes internals, so off by default.
+    SERVER_TIMING: bool = False
 
     # ─── CORS ────────────────────────────────────────────
     ALLOWED_ORIGINS: List[str] = [
@@ -0,0 +1,99 @@
+"""
+Per-stage latency instrumentation.
+
+A StageTimer collects perf_counter_ns durations for one HTTP request or
+one WebSocket frame; finish() observes them into the
+backend_stage_seconds histogram served on /metrics. The timer of the
+request being handled lives in a ContextVar, so services along the path
+(auth, ML client, log writer) record stages without it being passed in.
+
+Stages the ML service reports in its Server-Timing header are recorded
+under an "ml." prefix, so one request's histogram covers both services.
+"""
+import time
+from contextvars import ContextVar
+
+from prometheus_client import Histogram
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STAGE_SECONDS = Histogram(
+    "backend_stage_seconds",
+    "Time spent in each stage of handling a request",
+    ["route", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+GESTURE_LOG_FLUSH_SECONDS = Histogram(
+    "backend_gesture_log_flush_seconds",
+    "Duration of one gesture log batch INSERT and commit",
+    buckets=LATENCY_BUCKETS,
+)
+GESTURE_LOG_COMMIT_DELAY_SECONDS = Histogram(
+    "backend_gesture_log_commit_delay_seconds",
+    "Time from log() until the row's batch is committed",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+class StageTimer:
+    """Stage durations (ns) of one request; stages recorded twice add up."""
+
+    __slots__ = ("route", "stages", "started_ns")
+
+    def __init__(self, route: str = ""):
+        self.route = route
+        self.stages: dict[str, int] = {}
+        self.started_ns = time.perf_counter_ns()
+
+    def record(self, stage: str, duration_ns: int):
+        self.stages[stage] = self.stages.get(stage, 0) + duration_ns
+
+    def since(self, stage: str, start_ns: int):
+        """Record the time from start_ns (a perf_counter_ns reading) until now."""
+        self.record(stage, time.perf_counter_ns() - start_ns)
+
+    def remaining(self, budget_s: float) -> float:
+        """Seconds left of a budget that started with the request (may be negative)."""
+        return budget_s - (time.perf_counter_ns() - self.started_ns) / 1e9
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, with the total so far."""
+        stages = {**self.stages, "total": time.perf_counter_ns() - self.started_ns}
+        return ", ".join(f"{stage};dur={ns / 1e6:.3f}" for stage, ns in stages.items())
+
+    def finish(self):
+        self.record("total", time.perf_counter_ns() - self.started_ns)
+        for stage, duration_ns in self.stages.items():
+            STAGE_SECONDS.labels(self.route, stage).observe(duration_ns / 1e9)
+
+
+current_timer: ContextVar[StageTimer | None] = ContextVar("current_timer", default=None)
+
+
+def record_stage(stage: str, duration_ns: int):
+    """Add to the current request's timer, if there is one."""
+    timer = current_timer.get()
+    if timer is not None:
+        timer.record(stage, duration_ns)
+
+
+def remaining_budget(budget_s: float) -> float | None:
+    """What is left of budget_s for the current request; None outside one."""
+    timer = current_timer.get()
+    return timer.remaining(budget_s) if timer is not None else None
+
+
+def record_server_timing(header: str | None, prefix: str = "ml."):
+    """Record the stages of a downstream Server-Timing header ("name;dur=ms, ...")."""
+    timer = current_timer.get()
+    if timer is None or not header:
+        return
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    timer.record(prefix + name, int(float(value) * 1_000_000))
+                except ValueError:
+                    pass
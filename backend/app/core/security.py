@@ -21,12 +21,16 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 # ─── JWT Tokens ──────────────────────────────────────────────────────────────
-def create_access_token(subject: str | Any) -> str:
-    """Create a JWT token for an authenticated user."""
+def create_access_token(subject: str | Any, claims: dict | None = None) -> str:
+    """
+    Create a JWT token for an authenticated user.
+    Extra claims (e.g. {"active": True}) are signed along with the subject.
+    """
     expire = datetime.now(timezone.utc) + timedelta(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
     payload = {
+        **(claims or {}),
         "sub": str(subject),
         "exp": expire,
         "iat": datetime.now(timezone.utc),
@@ -40,15 +44,22 @@ def create_access_token(subject: str | Any) -> str:
 
 def decode_access_token(token: str) -> str | None:
     """Decode and validate a JWT token."""
+    payload = decode_access_token_claims(token)
+    if payload is None:
+        return None
+    return payload["sub"]
+
+
+def decode_access_token_claims(token: str) -> dict | None:
+    """Decode and validate a JWT token, returning all claims (None if invalid)."""
     try:
         payload = jwt.decode(
             token,
             settings.SECRET_KEY,
             algorithms=[settings.ALGORITHM]
         )
-        subject: str = payload.get("sub")
-        if subject is None:
-            return None
-        return subject
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    if payload.get("sub") is None:
+        return None
+    return payload
\ No newline at end of file
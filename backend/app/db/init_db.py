@@ -0,0 +1,30 @@
+from sqlalchemy import inspect
+
+from app.db.base import Base
+from app.db.session import AsyncSessionLocal, engine
+
+# Imported so every table is registered on Base.metadata
+from app.models import gesture_log, gesture_rollup, ml_model, user  # noqa: F401
+from app.services.rollup_service import backfill_rollups
+
+
+async def create_missing_tables(engine=engine):
+    """
+    Create any table in the models that the database doesn't have yet;
+    existing tables are left as they are. Runs at startup, so a database
+    from before gesture_rollups existed gets the table — and, when it
+    already holds gesture logs, rollups rebuilt from them — instead of
+    every log batch failing on it.
+    """
+    async with engine.begin() as conn:
+        existing = await conn.run_sync(lambda sync_conn: set(inspect(sync_conn).get_table_names()))
+        missing = [name for name in Base.metadata.tables if name not in existing]
+        if not missing:
+            return
+        await conn.run_sync(Base.metadata.create_all)
+    print(f"🗄️  Created tables: {', '.join(missing)}")
+
+    if "gesture_rollups" in missing and "gesture_logs" in existing:
+        print("🗄️  Backfilling gesture_rollups from existing gesture logs...")
+        async with AsyncSessionLocal() as session:
+            await backfill_rollups(session)
@@ -1,18 +1,39 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.core.config import settings
 from app.api.v1.router import api_router
 from app.api.v1.endpoints.websocket import router as ws_router
+from app.db.init_db import create_missing_tables
+from app.middleware.timing_middleware import StageTimingMiddleware
+from app.services.ml_balancer import ml_balancer
+from app.services.ml_client import ml_client
+from app.services.ml_stream import ml_stream_pool
+from app.services.gesture_service import gesture_log_writer
+from app.services.partition_service import partition_maintainer
+from app.services.auth_service import password_hasher
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print(f"Starting {settings.PROJECT_NAME}")
+    await create_missing_tables()
+    # Today's partition must exist before the first log is written
+    await partition_maintainer.start()
+    gesture_log_writer.start()
+    ml_balancer.start()
     yield
     print("Shutting down...")
+    await ml_stream_pool.close()
+    await ml_client.close()
+    await ml_balancer.stop()
+    # Flush buffered gesture logs before the process exits
+    await gesture_log_writer.stop()
+    await partition_maintainer.stop()
+    password_hasher.close()
 
 
 app = FastAPI(
@@ -21,6 +42,8 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(StageTimingMiddleware, server_timing=settings.SERVER_TIMING)
+
 # CORS must be first middleware
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +51,8 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Browsers hide response headers from scripts unless listed here
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
@@ -39,6 +64,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics, including per-stage latency histograms."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome"}
\ No newline at end of file
@@ -0,0 +1,37 @@
+from starlette.datastructures import MutableHeaders
+
+from app.core.metrics import StageTimer, current_timer
+
+
+class StageTimingMiddleware:
+    """
+    Gives every HTTP request a StageTimer, observed once the response
+    is sent, and optionally returns it as a Server-Timing header.
+    Plain ASGI rather than BaseHTTPMiddleware, so it adds no task hop.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = current_timer.set(timer)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", timer.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing if self.server_timing else send)
+        finally:
+            current_timer.reset(token)
+            # Set by the router once the request matched a route
+            route = scope.get("route")
+            timer.route = getattr(route, "path", "unmatched")
+            timer.finish()
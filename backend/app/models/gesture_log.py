@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, func
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -7,6 +7,14 @@ from app.db.base import Base
 
 
 class GestureLog(Base):
+    """
+    One detection per row, range-partitioned by detected_at.
+
+    Partitions (one per UTC day) are created ahead of time, and dropped
+    after the retention period if one is set, by
+    app.services.partition_service. The primary key must include the
+    partition key, hence (id, detected_at).
+    """
     __tablename__ = "gesture_logs"
 
     # ─── Primary Key ─────────────────────────────────────
@@ -14,7 +22,6 @@ class GestureLog(Base):
         UUID(as_uuid=True),
         primary_key=True,
         default=uuid.uuid4,
-        index=True
     )
 
     # ─── Foreign Key ─────────────────────────────────────
@@ -23,20 +30,35 @@ class GestureLog(Base):
         UUID(as_uuid=True),
         ForeignKey("users.id", ondelete="CASCADE"),
         nullable=False,
-        index=True
     )
 
     # ─── Gesture Data ─────────────────────────────────────
-    gesture_name = Column(String, nullable=False, index=True)
+    gesture_name = Column(String, nullable=False)
     confidence = Column(Float, nullable=False)   # 0.0 to 1.0
     latency_ms = Column(Float, nullable=True)    # How fast ML responded
-    session_id = Column(String, nullable=True, index=True)
+    session_id = Column(String, nullable=True)
 
     # ─── Timestamps ──────────────────────────────────────
+    # Partition key — part of the primary key
     detected_at = Column(
         DateTime(timezone=True),
+        primary_key=True,
         server_default=func.now(),
-        index=True
+    )
+
+    # ─── Indexes ─────────────────────────────────────────
+    # Kept to what reads need, since every insert updates each one.
+    # Aggregate analytics read gesture_rollups, so gesture_name and a
+    # standalone user_id index are not needed.
+    __table_args__ = (
+        # User history, newest first (also serves the user_id FK)
+        Index("ix_gesture_logs_user_detected", "user_id", "detected_at"),
+        # Per-session analytics
+        Index("ix_gesture_logs_session_detected", "session_id", "detected_at"),
+        # Time-range scans — rows arrive in time order, so a tiny BRIN
+        # index does the job of a large B-tree
+        Index("ix_gesture_logs_detected_brin", "detected_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (detected_at)"},
     )
 
     # ─── Relationships ───────────────────────────────────
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, String, Float, BigInteger, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
+
+from app.db.base import Base
+
+# Time bucket sizes kept by the rollup table (date_trunc units)
+GRANULARITIES = ("minute", "hour", "day")
+
+# Latency histogram edges (ms). Bucket i counts latencies in
+# [edge[i-1], edge[i]) — the same convention as Postgres width_bucket() —
+# so there are len(LATENCY_BUCKETS_MS) + 1 buckets.
+LATENCY_BUCKETS_MS = (5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000, 2000)
+
+
+class GestureRollup(Base):
+    """
+    Pre-aggregated gesture_logs: one row per time bucket, user and gesture.
+
+    Updated together with every batch of logs, so analytics read a
+    handful of rows instead of scanning the log table.
+    """
+    __tablename__ = "gesture_rollups"
+
+    # ─── Bucket Key ──────────────────────────────────────
+    granularity = Column(String, primary_key=True)                   # minute / hour / day
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    gesture_name = Column(String, primary_key=True)
+
+    # ─── Aggregates ──────────────────────────────────────
+    count = Column(BigInteger, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    latency_sum_ms = Column(Float, nullable=False, default=0.0)
+    # One counter per LATENCY_BUCKETS_MS bucket
+    latency_hist = Column(ARRAY(Integer), nullable=False)
+
+    __table_args__ = (
+        # Time-range scans across all users ("last 24h", summary)
+        Index("ix_gesture_rollups_granularity_bucket", "granularity", "bucket_start"),
+        # Per-user analytics
+        Index("ix_gesture_rollups_user_bucket", "user_id", "granularity", "bucket_start"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<GestureRollup {self.granularity} {self.bucket_start} {self.gesture_name} x{self.count}>"
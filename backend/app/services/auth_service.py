@@ -0,0 +1,238 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.security import decode_access_token_claims, hash_password, verify_password
+from app.models.user import User
+
+
+class TTLCache:
+    """Bounded LRU whose entries expire individually."""
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict = OrderedDict()    # key → (expires_at, value)
+
+        # ─── Metrics ─────────────────────────────────────
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value, ttl_s: float | None = None):
+        ttl_s = self.ttl_s if ttl_s is None else min(ttl_s, self.ttl_s)
+        self._entries[key] = (time.monotonic() + ttl_s, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key) -> bool:
+        return self._entries.pop(key, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class AuthCache:
+    """
+    In-process caches for get_current_user.
+
+    - tokens: raw JWT → verified claims, until the token (or the TTL) expires
+    - users:  user id → active User loaded from the database
+
+    Deactivating or deleting a user through the ORM in this process
+    evicts it immediately (see the listeners below); changes made
+    elsewhere are picked up once the entry's TTL runs out.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_s: float = 60.0):
+        self.tokens = TTLCache(max_entries, ttl_s)
+        self.users = TTLCache(max_entries, ttl_s)
+        # Users deactivated in this process — trusted token claims are
+        # ignored for them until their tokens have expired
+        self.revoked = TTLCache(max_entries, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        self.invalidations = 0
+
+    def claims_for(self, token: str) -> dict | None:
+        """Verified claims of a token, decoding it only on a cache miss."""
+        claims = self.tokens.get(token)
+        if claims is not None:
+            return claims
+        claims = decode_access_token_claims(token)
+        if claims is not None:
+            self.tokens.put(token, claims, ttl_s=claims["exp"] - time.time())
+        return claims
+
+    def get_user(self, user_id: str) -> User | None:
+        return self.users.get(user_id)
+
+    def put_user(self, user: User):
+        self.users.put(str(user.id), user)
+
+    def is_revoked(self, user_id: str) -> bool:
+        return self.revoked.get(user_id) is not None
+
+    def invalidate_user(self, user_id, revoke: bool = False):
+        user_id = str(user_id)
+        self.users.pop(user_id)
+        if revoke:
+            self.revoked.put(user_id, True)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "trust_token_claims": settings.AUTH_TRUST_TOKEN_CLAIMS,
+            "tokens": self.tokens.stats(),
+            "users": self.users.stats(),
+            "revoked": len(self.revoked),
+            "invalidations": self.invalidations,
+        }
+
+
+# Single instance shared across the entire app
+auth_cache = AuthCache(
+    max_entries=settings.AUTH_CACHE_SIZE,
+    ttl_s=settings.AUTH_CACHE_TTL_S,
+)
+
+
+# ─── Invalidation ────────────────────────────────────────────────────────────
+@event.listens_for(User.is_active, "set")
+def _on_is_active_set(target: User, value, oldvalue, initiator):
+    # oldvalue is a marker, not a bool, while an object is being built
+    if target.id is not None and isinstance(oldvalue, bool) and value != oldvalue:
+        auth_cache.invalidate_user(target.id, revoke=not value)
+
+
+@event.listens_for(User, "after_delete")
+def _on_user_deleted(mapper, connection, target: User):
+    auth_cache.invalidate_user(target.id, revoke=True)
+
+
+def principal_from_claims(claims: dict) -> User | None:
+    """
+    A transient User built from trusted token claims, or None if the
+    token does not carry an active claim or the user was revoked.
+    Only id, is_active and is_superuser are set — enough for handlers
+    that just need to know who is calling.
+    """
+    if not claims.get("active") or auth_cache.is_revoked(claims["sub"]):
+        return None
+    try:
+        user_id = uuid.UUID(claims["sub"])
+    except ValueError:
+        return None
+    return User(id=user_id, is_active=True, is_superuser=bool(claims.get("admin")))
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes are already waiting."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool.
+
+    A bcrypt round takes 100+ ms of CPU; run inline it blocks the event
+    loop and every live WebSocket on this worker with it. bcrypt
+    releases the GIL, so the threads hash in parallel with the loop.
+    At most `workers` hashes run at once; beyond max_queue waiting
+    callers the hasher refuses new work (PasswordHasherBusy) instead
+    of letting a login storm queue up unboundedly.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 64):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._slots: asyncio.Semaphore | None = None
+        self._waiting = 0
+
+        # ─── Metrics ─────────────────────────────────────
+        self.completed = 0
+        self.rejected = 0
+        self.max_waiting = 0
+        self.total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+        self.total_hash_ms = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def _run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        if self.max_queue and self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        enqueued = time.perf_counter()
+        self._waiting += 1
+        self.max_waiting = max(self.max_waiting, self._waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            started = time.perf_counter()
+            queue_ms = (started - enqueued) * 1000
+            self.total_queue_ms += queue_ms
+            self.max_queue_ms = max(self.max_queue_ms, queue_ms)
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            self.total_hash_ms += (time.perf_counter() - started) * 1000
+            self.completed += 1
+            return result
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "waiting": self._waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_queue_ms": round(self.total_queue_ms / self.completed, 2) if self.completed else 0.0,
+            "max_queue_ms": round(self.max_queue_ms, 2),
+            "avg_hash_ms": round(self.total_hash_ms / self.completed, 2) if self.completed else 0.0,
+        }
+
+
+# Single instance shared across the entire app
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
@@ -0,0 +1,214 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.metrics import GESTURE_LOG_COMMIT_DELAY_SECONDS, GESTURE_LOG_FLUSH_SECONDS
+from app.db.session import AsyncSessionLocal
+from app.models.gesture_log import GestureLog
+from app.services.rollup_service import apply_rollups
+
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+
+class GestureLogWriter:
+    """
+    Background writer for GestureLog rows.
+
+    Request handlers call log() and return immediately; rows wait in a
+    bounded in-memory queue and a background task writes them with one
+    multi-row INSERT per batch, updating the analytics rollups in the
+    same transaction. The rollup update runs in a savepoint: if it
+    fails, the raw rows are still committed and the rollups can be
+    rebuilt later with backfill_rollups(). A batch is flushed as soon
+    as it holds batch_size rows or its oldest row waited
+    flush_interval_s.
+
+    When the queue is full the overflow policy decides what happens:
+    "drop_newest" discards the new row, "drop_oldest" discards the
+    oldest queued row, "block" makes log() wait for room.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval_s: float = 1.0,
+        overflow: str = "drop_oldest",
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.session_factory = session_factory
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_s = flush_interval_s
+        self.overflow = overflow
+        # Queued as (perf_counter_ns at log(), row)
+        self._queue: asyncio.Queue[tuple[int, dict]] | None = None
+        self._task: asyncio.Task | None = None
+        self._batch: list[tuple[int, dict]] = []     # Being collected
+        self._inflight: asyncio.Future | None = None   # Being written
+
+        # ─── Metrics ─────────────────────────────────────
+        self.rows_enqueued = 0
+        self.rows_dropped = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rollup_failures = 0
+        self.flushes = 0
+        self.last_flush_size = 0
+        self.max_flush_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting rows and flush everything still queued."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if self._inflight is not None:
+            await self._inflight
+
+        remaining, self._batch = self._batch, []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def log(
+        self,
+        user_id: uuid.UUID,
+        gesture_name: str,
+        confidence: float,
+        latency_ms: float | None = None,
+        session_id: str | None = None,
+    ):
+        """Queue one detection. The timestamp is taken now, not at flush time."""
+        item = time.perf_counter_ns(), {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "gesture_name": gesture_name,
+            "confidence": confidence,
+            "latency_ms": latency_ms,
+            "session_id": session_id,
+            "detected_at": datetime.now(timezone.utc),
+        }
+        if self._task is None:
+            # Not started (or shutting down) — nowhere to write to
+            self.rows_dropped += 1
+            return
+
+        if self.overflow == "block":
+            await self._queue.put(item)
+        elif self._queue.full():
+            self.rows_dropped += 1
+            if self.overflow == "drop_newest":
+                return
+            self._queue.get_nowait()
+            self._queue.put_nowait(item)
+        else:
+            self._queue.put_nowait(item)
+        self.rows_enqueued += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval_s
+
+            # Top up without waiting, then wait for more until the deadline
+            while len(self._batch) < self.batch_size:
+                if not self._queue.empty():
+                    self._batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Shielded so stop() never cancels a half-written batch;
+            # it waits for _inflight instead
+            batch, self._batch = self._batch, []
+            self._inflight = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    async def _flush(self, items: list[tuple[int, dict]]):
+        rows = [row for _, row in items]
+        start_ns = time.perf_counter_ns()
+        try:
+            async with self.session_factory() as session:
+                # executemany → SQLAlchemy batches the rows into
+                # multi-row INSERT ... VALUES statements
+                await session.execute(insert(GestureLog), rows)
+                # Derived data must not cost the raw rows
+                try:
+                    async with session.begin_nested():
+                        await apply_rollups(session, rows)
+                except Exception as e:
+                    self.rollup_failures += 1
+                    print(f"⚠️ Rollup update for {len(rows)} gesture logs failed, rollups now lag: {e}")
+                await session.commit()
+        except Exception as e:
+            self.rows_failed += len(rows)
+            print(f"❌ Gesture log flush of {len(rows)} rows failed: {e}")
+            return
+
+        committed_ns = time.perf_counter_ns()
+        flush_ms = (committed_ns - start_ns) / 1_000_000
+        GESTURE_LOG_FLUSH_SECONDS.observe(flush_ms / 1000)
+        for enqueued_ns, _ in items:
+            GESTURE_LOG_COMMIT_DELAY_SECONDS.observe((committed_ns - enqueued_ns) / 1e9)
+        self.flushes += 1
+        self.rows_written += len(rows)
+        self.last_flush_size = len(rows)
+        self.max_flush_size = max(self.max_flush_size, len(rows))
+        self.last_flush_ms = flush_ms
+        self.max_flush_ms = max(self.max_flush_ms, flush_ms)
+        self.total_flush_ms += flush_ms
+
+    def stats(self) -> dict:
+        return {
+            "running": self.is_running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "overflow_policy": self.overflow,
+            "rows_enqueued": self.rows_enqueued,
+            "rows_dropped": self.rows_dropped,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "rollup_failures": self.rollup_failures,
+            "flushes": self.flushes,
+            "avg_flush_size": round(self.rows_written / self.flushes, 1) if self.flushes else 0.0,
+            "last_flush_size": self.last_flush_size,
+            "max_flush_size": self.max_flush_size,
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+# Single instance shared across the entire app
+gesture_log_writer = GestureLogWriter(
+    max_queue=settings.GESTURE_LOG_QUEUE_SIZE,
+    batch_size=settings.GESTURE_LOG_BATCH_SIZE,
+    flush_interval_s=settings.GESTURE_LOG_FLUSH_INTERVAL_S,
+    overflow=settings.GESTURE_LOG_OVERFLOW,
+)
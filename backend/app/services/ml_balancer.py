@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import httpx
+
+from app.core.config import settings
+
+
+class Replica:
+    """One ML service endpoint and what the balancer knows about it."""
+
+    def __init__(self, url: str, window: int = 20):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True                      # Last /ready verdict
+        self.ejected_until = 0.0                 # Error-rate ejection
+        self._outcomes: deque[bool] = deque(maxlen=window)
+
+        # ─── Metrics ─────────────────────────────────────
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.last_health_error: str | None = None
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and time.monotonic() >= self.ejected_until
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available,
+            "healthy": self.healthy,
+            "ejected_for_s": round(max(0.0, self.ejected_until - time.monotonic()), 1),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "recent_error_rate": round(self.error_rate, 3),
+            "ejections": self.ejections,
+            "last_health_error": self.last_health_error,
+        }
+
+
+class ReplicaBalancer:
+    """
+    Client-side load balancing across ML service replicas.
+
+    - Stateless requests: power of two choices — sample two available
+      replicas, send to the one with fewer requests outstanding.
+    - Session requests: rendezvous (highest random weight) hashing of
+      the session id over the available replicas, so a stream keeps
+      hitting the replica holding its tracking state, and only the
+      sessions of a replica that drops out move elsewhere.
+
+    A replica is taken out of rotation while its /ready check fails
+    (so also while it warms up its models), or for eject_s once at
+    least min_requests of its last requests show an error rate of
+    error_threshold or more. If no replica is
+    available every replica is used, so a blip never blackholes traffic.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        health_interval_s: float = 5.0,
+        health_timeout_s: float = 1.0,
+        error_threshold: float = 0.5,
+        min_requests: int = 10,
+        eject_s: float = 30.0,
+    ):
+        if not urls:
+            raise ValueError("At least one ML service URL is required")
+        self.replicas = [Replica(url, window=max(min_requests, 1) * 2) for url in urls]
+        self.health_interval_s = health_interval_s
+        self.health_timeout_s = health_timeout_s
+        self.error_threshold = error_threshold
+        self.min_requests = max(1, min_requests)
+        self.eject_s = eject_s
+        self._task: asyncio.Task | None = None
+        self._client: httpx.AsyncClient | None = None
+
+    # ─── Selection ───────────────────────────────────────────────────────────
+    def _candidates(self, exclude: Replica | None = None) -> list[Replica]:
+        available = [r for r in self.replicas if r.available and r is not exclude]
+        if available:
+            return available
+        return [r for r in self.replicas if r is not exclude] or self.replicas
+
+    def pick(self, session_id: str | None = None, exclude: Replica | None = None) -> Replica:
+        """Replica for the next request (exclude: e.g. the one a hedge is racing)."""
+        candidates = self._candidates(exclude)
+        if session_id:
+            return max(candidates, key=lambda r: _rendezvous_weight(session_id, r.url))
+        if len(candidates) == 1:
+            return candidates[0]
+        a, b = random.sample(candidates, 2)
+        return a if a.outstanding <= b.outstanding else b
+
+    @contextmanager
+    def in_flight(self, replica: Replica):
+        """Count a request as outstanding on the replica while it runs."""
+        replica.outstanding += 1
+        try:
+            yield replica
+        finally:
+            replica.outstanding -= 1
+
+    def record(self, replica: Replica, ok: bool):
+        """Feed one request outcome into the replica's error-rate window."""
+        replica.requests += 1
+        replica._outcomes.append(ok)
+        if ok:
+            return
+        replica.errors += 1
+        if (
+            len(replica._outcomes) >= self.min_requests
+            and replica.error_rate >= self.error_threshold
+            and time.monotonic() >= replica.ejected_until
+        ):
+            replica.ejected_until = time.monotonic() + self.eject_s
+            replica.ejections += 1
+            # Start from a clean slate when it comes back
+            replica._outcomes.clear()
+            print(f"⚠️  Ejected ML replica {replica.url} for {self.eject_s:g}s (error rate)")
+
+    # ─── Health Checks ───────────────────────────────────────────────────────
+    def start(self):
+        self._client = httpx.AsyncClient(timeout=self.health_timeout_s)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval_s)
+
+    async def check_health(self):
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica):
+        try:
+            response = await self._client.get(f"{replica.url}/ready")
+            healthy = response.status_code == 200 and response.json().get("ready") is True
+            error = None if healthy else f"HTTP {response.status_code}"
+        except (httpx.HTTPError, ValueError) as e:
+            healthy, error = False, repr(e)
+        if healthy != replica.healthy:
+            print(f"{'✅' if healthy else '❌'} ML replica {replica.url} is {'healthy' if healthy else 'unhealthy'}")
+        replica.healthy = healthy
+        replica.last_health_error = error
+
+    def stats(self) -> dict:
+        return {"replicas": [replica.stats() for replica in self.replicas]}
+
+
+def _rendezvous_weight(session_id: str, url: str) -> int:
+    digest = hashlib.blake2b(f"{session_id}|{url}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+# Single instance shared across the entire app
+ml_balancer = ReplicaBalancer(
+    settings.ML_SERVICE_ENDPOINTS,
+    health_interval_s=settings.ML_HEALTH_INTERVAL_S,
+    error_threshold=settings.ML_EJECT_ERROR_RATE,
+    min_requests=settings.ML_EJECT_MIN_REQUESTS,
+    eject_s=settings.ML_EJECT_S,
+)
@@ -1,62 +1,542 @@
+import asyncio
+import base64
+import binascii
+import random
+import time
 import httpx
 from typing import Dict, Any
 
+from app.core.config import settings
+from app.core.metrics import record_server_timing, record_stage
+from app.services.ml_balancer import Replica, ReplicaBalancer, ml_balancer
+
+GESTURE_ERROR_RESULT = {
+    "gesture_name": "error",
+    "confidence": 0.0,
+    "latency_ms": 0,
+    "hand_detected": False,
+}
+
+FACE_ERROR_RESULT = {
+    "direction": "error",
+    "mouth_open": False,
+    "confidence": 0.0,
+    "latency_ms": 0,
+    "face_detected": False,
+}
+
+ERROR_RESULTS = {
+    "gesture": GESTURE_ERROR_RESULT,
+    "face": FACE_ERROR_RESULT,
+}
+
+# Statuses worth another attempt: overloaded (admission control) or
+# a proxy that could not reach a replica
+RETRYABLE_STATUSES = {502, 503, 504}
+# A replica shedding load is healthy — it must not count as an error
+OVERLOADED_STATUS = 503
+
+
+def multi_error_result(models) -> Dict[str, Any]:
+    """Error placeholder for each model of a failed /predict-multi call."""
+    return {model: dict(ERROR_RESULTS[model]) for model in models}
+
+
+def decode_image_payload(image_base64: str) -> bytes:
+    """Strip an optional data-URL header and return the raw image bytes."""
+    start = time.perf_counter_ns()
+    header, _, data = image_base64.partition(",")
+    image_bytes = base64.b64decode(data or header)
+    record_stage("decode", time.perf_counter_ns() - start)
+    return image_bytes
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the ML service looks unhealthy.
+
+    closed    — requests flow; failure_threshold consecutive failures open it
+    open      — requests are refused without touching the network
+    half-open — after reset_timeout_s one probe request is let through;
+                its success closes the breaker, its failure re-opens it
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 10.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_s = reset_timeout_s
+        self.consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+        # ─── Metrics ─────────────────────────────────────
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout_s:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may go out now (claims the probe when half-open)."""
+        if self._opened_at is None:
+            return True
+        if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._probing or (
+            self._opened_at is None and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.opens += 1
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """The probe ended without a verdict (e.g. cancelled) — allow another."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
+
 
 class MLServiceClient:
     """
     Client for communicating with the ML service.
     Handles all prediction requests and error handling.
+
+    By default frames are sent as raw image bytes to the ML service's
+    /binary endpoints instead of base64 inside JSON.
+
+    Every call has a deadline: timeout_s, or the caller's budget_s when
+    that is shorter, covering all attempts. Within it, failed predictions are
+    retried with jittered exponential backoff, and stateless ones
+    (no session_id) are hedged — if no reply arrives after
+    hedge_after_s a second copy is sent and the first answer wins.
+    Frames of a tracking session are only retried when they never
+    reached the service, since a duplicate would advance the tracker.
+    A circuit breaker turns a failing ML service into immediate error
+    results instead of requests that each wait out their deadline.
+    Only a timeout that had the full timeout_s counts against a replica
+    or the breaker; one cut short by the caller's budget does not, and
+    neither does a 503 (the replica is shedding load, not failing).
+
+    Each attempt goes to the replica the balancer picks: a session's
+    frames to its pinned replica, a retry or hedge of a stateless frame
+    possibly elsewhere.
     """
 
-    def __init__(self, base_url: str = "http://ml-service:8001"):
-        self.base_url = base_url
-        self.client = httpx.AsyncClient(timeout=10.0)
+    def __init__(
+        self,
+        balancer: ReplicaBalancer,
+        binary: bool = True,
+        timeout_s: float = 2.0,
+        connect_timeout_s: float = 0.5,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry_s: float = 30.0,
+        http2: bool = False,
+        retries: int = 1,
+        retry_backoff_s: float = 0.05,
+        hedge_after_s: float = 0.0,
+        breaker_failure_threshold: int = 5,
+        breaker_reset_timeout_s: float = 10.0,
+    ):
+        self.balancer = balancer
+        self.binary = binary
+        self.timeout_s = timeout_s
+        self.connect_timeout_s = connect_timeout_s
+        self.retries = max(0, retries)
+        self.retry_backoff_s = retry_backoff_s
+        self.hedge_after_s = hedge_after_s
+        self.http2 = http2
+        self.breaker = CircuitBreaker(breaker_failure_threshold, breaker_reset_timeout_s)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout_s, connect=connect_timeout_s),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry_s,
+            ),
+            http2=http2,
+        )
+
+        # ─── Metrics ─────────────────────────────────────
+        self.requests = 0
+        self.failures = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+        self.overloaded = 0
+
+    async def predict(
+        self, image_base64: str, session_id: str | None = None, budget_s: float | None = None
+    ) -> Dict[str, Any]:
+        """
+        Send image to ML service for gesture prediction.
+        Passing a session_id lets the ML service track the hand across
+        consecutive frames of that stream instead of re-detecting it.
+        """
+        if self.binary:
+            try:
+                image_bytes = decode_image_payload(image_base64)
+            except (binascii.Error, ValueError) as e:
+                print(f"Invalid image payload: {e}")
+                return dict(GESTURE_ERROR_RESULT)
+            return await self.predict_bytes(image_bytes, session_id, budget_s)
 
-    async def predict(self, image_base64: str) -> Dict[str, Any]:
-        """Send image to ML service for gesture prediction."""
+        return await self._request(
+            "/predict",
+            GESTURE_ERROR_RESULT,
+            session_id,
+            budget_s,
+            json={"image_base64": image_base64, "session_id": session_id},
+        )
+
+    async def predict_face(
+        self, image_base64: str, session_id: str | None = None, budget_s: float | None = None
+    ) -> Dict[str, Any]:
+        """Send image to ML service for face direction prediction."""
+        if self.binary:
+            try:
+                image_bytes = decode_image_payload(image_base64)
+            except (binascii.Error, ValueError) as e:
+                print(f"Invalid image payload: {e}")
+                return dict(FACE_ERROR_RESULT)
+            return await self.predict_face_bytes(image_bytes, session_id, budget_s)
+
+        return await self._request(
+            "/predict-face",
+            FACE_ERROR_RESULT,
+            session_id,
+            budget_s,
+            json={"image_base64": image_base64, "session_id": session_id},
+        )
+
+    async def predict_multi(
+        self,
+        image_base64: str,
+        session_id: str | None = None,
+        models: tuple[str, ...] = ("gesture", "face"),
+        budget_s: float | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Run several models on one frame with a single request; the ML
+        service decodes the frame once. Returns {model: result}.
+        """
+        if self.binary:
+            try:
+                image_bytes = decode_image_payload(image_base64)
+            except (binascii.Error, ValueError) as e:
+                print(f"Invalid image payload: {e}")
+                return multi_error_result(models)
+            return await self.predict_multi_bytes(image_bytes, session_id, models, budget_s)
+
+        return await self._request(
+            "/predict-multi",
+            multi_error_result(models),
+            session_id,
+            budget_s,
+            json={"image_base64": image_base64, "session_id": session_id, "models": list(models)},
+        )
+
+    async def predict_bytes(
+        self, image_bytes: bytes, session_id: str | None = None, budget_s: float | None = None
+    ) -> Dict[str, Any]:
+        """Send encoded image bytes (JPEG/PNG) for gesture prediction."""
+        return await self._post_binary(
+            "/predict/binary", image_bytes, session_id, GESTURE_ERROR_RESULT, budget_s
+        )
+
+    async def predict_face_bytes(
+        self, image_bytes: bytes, session_id: str | None = None, budget_s: float | None = None
+    ) -> Dict[str, Any]:
+        """Send encoded image bytes (JPEG/PNG) for face direction prediction."""
+        return await self._post_binary(
+            "/predict-face/binary", image_bytes, session_id, FACE_ERROR_RESULT, budget_s
+        )
+
+    async def predict_multi_bytes(
+        self,
+        image_bytes: bytes,
+        session_id: str | None = None,
+        models: tuple[str, ...] = ("gesture", "face"),
+        budget_s: float | None = None,
+    ) -> Dict[str, Any]:
+        """Send encoded image bytes (JPEG/PNG) for several models at once."""
+        return await self._post_binary(
+            "/predict-multi/binary",
+            image_bytes,
+            session_id,
+            multi_error_result(models),
+            budget_s,
+            {"X-Models": ",".join(models)},
+        )
+
+    async def _post_binary(
+        self,
+        path: str,
+        image_bytes: bytes,
+        session_id: str | None,
+        error_result: Dict[str, Any],
+        budget_s: float | None = None,
+        extra_headers: Dict[str, str] | None = None,
+    ) -> Dict[str, Any]:
+        headers = {"Content-Type": "application/octet-stream", **(extra_headers or {})}
+        if session_id:
+            headers["X-Session-Id"] = session_id
+        return await self._request(
+            path, error_result, session_id, budget_s, content=image_bytes, headers=headers
+        )
+
+    # ─── Resilience ──────────────────────────────────────────────────────────
+    async def _request(
+        self,
+        path: str,
+        error_result: Dict[str, Any],
+        session_id: str | None,
+        budget_s: float | None,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """POST a prediction; any failure becomes a copy of error_result."""
+        if budget_s is not None and budget_s <= 0:
+            # The caller's budget ran out before the call — not the service's fault
+            self.deadline_exceeded += 1
+            return dict(error_result)
+        if not self.breaker.allow():
+            return dict(error_result)
+        self.requests += 1
+        # A budget shorter than timeout_s truncates the deadline, and then
+        # a timeout says more about the caller than about the service
+        full_timeout = budget_s is None or budget_s >= self.timeout_s
+        deadline = time.monotonic() + (self.timeout_s if full_timeout else budget_s)
+        start = time.perf_counter_ns()
         try:
-            response = await self.client.post(
-                f"{self.base_url}/predict",
-                json={"image_base64": image_base64},
-            )
-            response.raise_for_status()
-            return response.json()
+            response = await self._send_with_retries(path, deadline, session_id, kwargs, full_timeout)
+        except httpx.TimeoutException as e:
+            record_stage("ml_call", time.perf_counter_ns() - start)
+            self.failures += 1
+            if full_timeout:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_probe()
+            print(f"ML Service error: {e!r}")
+            return dict(error_result)
         except httpx.HTTPError as e:
-            print(f"ML Service error: {e}")
-            return {
-                "gesture_name": "error",
-                "confidence": 0.0,
-                "latency_ms": 0,
-                "hand_detected": False,
-            }
-
-    async def predict_face(self, image_base64: str) -> Dict[str, Any]:
-        """Send image to ML service for face direction prediction."""
+            record_stage("ml_call", time.perf_counter_ns() - start)
+            self.failures += 1
+            self.breaker.record_failure()
+            print(f"ML Service error: {e!r}")
+            return dict(error_result)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        record_stage("ml_call", time.perf_counter_ns() - start)
+        record_server_timing(response.headers.get("server-timing"))
+
+        if response.status_code == OVERLOADED_STATUS:
+            # Every attempt found a replica busy — no verdict on its health
+            self.overloaded += 1
+            self.breaker.release_probe()
+            print(f"ML Service overloaded: 503 from {path}")
+            return dict(error_result)
+        if response.status_code >= 500:
+            self.failures += 1
+            self.breaker.record_failure()
+            print(f"ML Service error: {response.status_code} from {path}")
+            return dict(error_result)
+        if response.is_error:
+            # A 4xx is about this frame, not the service's health
+            self.breaker.record_success()
+            print(f"ML Service rejected frame: {response.status_code} {response.text}")
+            return dict(error_result)
         try:
-            response = await self.client.post(
-                f"{self.base_url}/predict-face",
-                json={"image_base64": image_base64},
-            )
+            result = response.json()
+        except ValueError:
+            self.failures += 1
+            self.breaker.record_failure()
+            print(f"ML Service error: non-JSON {response.status_code} body from {path}")
+            return dict(error_result)
+        self.breaker.record_success()
+        return result
+
+    async def _send_with_retries(
+        self, path: str, deadline: float, session_id: str | None, kwargs: dict, full_timeout: bool = True
+    ) -> httpx.Response:
+        """
+        Attempt the request until it succeeds, fails for good, runs out
+        of retries or hits the deadline. Returns the last response.
+        Only the first attempt can have the full timeout; retries get
+        what is left of the deadline.
+        """
+        idempotent = session_id is None
+        attempt = 0
+        failed = None
+        while True:
+            # A stateless retry avoids the replica that just failed
+            replica = self.balancer.pick(session_id, exclude=failed)
+            try:
+                full = full_timeout and attempt == 0
+                if idempotent and self.hedge_after_s > 0:
+                    response = await self._send_hedged(replica, path, deadline, kwargs, full)
+                else:
+                    response = await self._send(replica, path, deadline, kwargs, full)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return response
+                error = None
+            except httpx.TransportError as e:
+                # A frame that may have reached a tracking session must not be sent twice
+                never_sent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if not (idempotent or never_sent):
+                    raise
+                error, response = e, None
+
+            backoff = self.retry_backoff_s * (2 ** attempt) * random.uniform(0.5, 1.5)
+            if attempt >= self.retries or time.monotonic() + backoff >= deadline:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            failed = replica
+            self.retried += 1
+            await asyncio.sleep(backoff)
+
+    async def _send(
+        self, replica: Replica, path: str, deadline: float, kwargs: dict, full_timeout: bool = False
+    ) -> httpx.Response:
+        """
+        One POST to a replica, bounded by the deadline as a whole rather
+        than per read. The outcome feeds the replica's error rate — a
+        timeout only if the attempt had the full timeout, a 503 never.
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.deadline_exceeded += 1
+            raise httpx.TimeoutException("ML request deadline exceeded")
+        timeout = httpx.Timeout(remaining, connect=min(self.connect_timeout_s, remaining))
+        with self.balancer.in_flight(replica):
+            try:
+                async with asyncio.timeout(remaining):
+                    response = await self.client.post(f"{replica.url}{path}", timeout=timeout, **kwargs)
+            except TimeoutError:
+                self.deadline_exceeded += 1
+                if full_timeout:
+                    self.balancer.record(replica, ok=False)
+                raise httpx.TimeoutException(f"No ML response from {replica.url} within {remaining:.3f}s")
+            except httpx.TimeoutException as e:
+                # httpx's own timeouts are cut to the deadline as well
+                if full_timeout or (isinstance(e, httpx.ConnectTimeout) and remaining >= self.connect_timeout_s):
+                    self.balancer.record(replica, ok=False)
+                raise
+            except httpx.TransportError:
+                self.balancer.record(replica, ok=False)
+                raise
+        if response.status_code != OVERLOADED_STATUS:
+            self.balancer.record(replica, ok=response.status_code < 500)
+        return response
+
+    async def _send_hedged(
+        self, replica: Replica, path: str, deadline: float, kwargs: dict, full_timeout: bool = False
+    ) -> httpx.Response:
+        """
+        Send, and send again (to another replica when there is one) if
+        the first copy is slow; the first good answer wins.
+        """
+        primary = asyncio.create_task(self._send(replica, path, deadline, kwargs, full_timeout))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after_s)
+        if done or time.monotonic() >= deadline:
+            return await primary
+
+        self.hedged += 1
+        hedge = asyncio.create_task(
+            self._send(self.balancer.pick(exclude=replica), path, deadline, kwargs)
+        )
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUSES:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both failed — report the hedge's outcome
+            return hedge.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def end_session(self, session_id: str) -> bool:
+        """Tell the ML service a stream ended so it can free its trackers."""
+        replica = self.balancer.pick(session_id)
+        try:
+            response = await self.client.delete(f"{replica.url}/sessions/{session_id}")
             response.raise_for_status()
-            return response.json()
+            return response.json().get("ended", False)
         except httpx.HTTPError as e:
             print(f"ML Service error: {e}")
-            return {
-                "direction": "error",
-                "mouth_open": False,
-                "confidence": 0.0,
-                "latency_ms": 0,
-                "face_detected": False,
-            }
+            return False
 
     async def health_check(self) -> bool:
-        """Check if ML service is healthy."""
-        try:
-            response = await self.client.get(f"{self.base_url}/health")
-            return response.status_code == 200
-        except Exception:
-            return False
+        """Check if any ML service replica is healthy."""
+        for replica in self.balancer.replicas:
+            try:
+                response = await self.client.get(f"{replica.url}/health")
+                if response.status_code == 200:
+                    return True
+            except Exception:
+                continue
+        return False
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "requests": self.requests,
+            "failures": self.failures,
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded,
+            "overloaded": self.overloaded,
+            "http2": self.http2,
+            "timeout_s": self.timeout_s,
+            **self.balancer.stats(),
+        }
 
 
 # Singleton instance
-ml_client = MLServiceClient()
\ No newline at end of file
+ml_client = MLServiceClient(
+    ml_balancer,
+    timeout_s=settings.ML_REQUEST_TIMEOUT_S,
+    connect_timeout_s=settings.ML_CONNECT_TIMEOUT_S,
+    max_connections=settings.ML_POOL_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.ML_POOL_MAX_KEEPALIVE,
+    keepalive_expiry_s=settings.ML_POOL_KEEPALIVE_EXPIRY_S,
+    http2=settings.ML_HTTP2,
+    retries=settings.ML_RETRIES,
+    retry_backoff_s=settings.ML_RETRY_BACKOFF_S,
+    hedge_after_s=settings.ML_HEDGE_AFTER_S,
+    breaker_failure_threshold=settings.ML_BREAKER_FAILURE_THRESHOLD,
+    breaker_reset_timeout_s=settings.ML_BREAKER_RESET_S,
+)
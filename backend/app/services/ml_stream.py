@@ -0,0 +1,210 @@
+import asyncio
+import json
+import struct
+import zlib
+from typing import Dict, Any
+
+import websockets
+
+from app.core.config import settings
+from app.services.ml_balancer import Replica, ReplicaBalancer, ml_balancer
+from app.services.ml_client import GESTURE_ERROR_RESULT, FACE_ERROR_RESULT, multi_error_result
+
+# Frame header — must match ml-service/app/utils/stream_protocol.py:
+# seq, model, pixel format, height, width, session id length
+HEADER = struct.Struct("!IBBHHH")
+MODEL_CODES = {"gesture": 0, "face": 1, "multi": 2}
+ENCODED_FORMAT = 0
+
+
+class MLStreamError(Exception):
+    """The ML service answered a frame with an error."""
+
+
+def stream_url(base_url: str) -> str:
+    """WebSocket URL of an ML service replica's streaming endpoint."""
+    base = base_url.rstrip("/")
+    if base.startswith("https://"):
+        return "wss://" + base[len("https://"):] + "/stream"
+    return "ws://" + base.removeprefix("http://") + "/stream"
+
+
+class MLStream:
+    """
+    One long-lived WebSocket to the ML service, shared by many sessions.
+
+    Requests are tagged with a sequence number and matched to replies
+    by a background reader, so many frames can be in flight at once.
+    The connection is (re)opened lazily on the next request after a drop.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._ws = None
+        self._reader: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._seq = 0
+        self._connect_lock = asyncio.Lock()
+
+    async def _connection(self):
+        if self._ws is not None and self._ws.open:
+            return self._ws
+        async with self._connect_lock:
+            if self._ws is None or not self._ws.open:
+                self._ws = await websockets.connect(self.url, max_size=None)
+                self._reader = asyncio.create_task(self._read_loop(self._ws))
+        return self._ws
+
+    async def _read_loop(self, ws):
+        try:
+            async for message in ws:
+                data = json.loads(message)
+                future = self._pending.pop(data.get("seq"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in data:
+                    future.set_exception(MLStreamError(data["error"]))
+                else:
+                    future.set_result(data["result"])
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if self._ws is ws:
+                self._ws = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("ML stream closed"))
+            self._pending.clear()
+
+    async def request(
+        self, model: str, image_bytes: bytes, session_id: str | None = None, timeout: float | None = None
+    ) -> dict:
+        """Send one encoded frame and wait for its result (timeout defaults to the stream's)."""
+        ws = await self._connection()
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        seq = self._seq
+        future = asyncio.get_running_loop().create_future()
+        self._pending[seq] = future
+
+        session = (session_id or "").encode()
+        header = HEADER.pack(seq, MODEL_CODES[model], ENCODED_FORMAT, 0, 0, len(session))
+        try:
+            await ws.send(b"".join((header, session, image_bytes)))
+            return await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+        finally:
+            self._pending.pop(seq, None)
+
+    async def end_session(self, session_id: str):
+        ws = await self._connection()
+        await ws.send(json.dumps({"type": "end_session", "session_id": session_id}))
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+
+class MLStreamPool:
+    """
+    A small, fixed set of MLStreams per ML service replica, shared by
+    every live client session.
+
+    Each session is pinned to one replica by the balancer, so its
+    tracking state stays warm, and to one of that replica's streams
+    (by hashing its id), so its frames stay ordered on one connection.
+    All sessions together share a handful of connections instead of
+    one HTTP request per frame.
+    """
+
+    def __init__(self, balancer: ReplicaBalancer, connections: int = 2, timeout: float = 5.0):
+        self.balancer = balancer
+        self.streams = {
+            replica.url: [MLStream(stream_url(replica.url), timeout) for _ in range(max(1, connections))]
+            for replica in balancer.replicas
+        }
+
+    def _stream_for(self, session_id: str | None) -> tuple[Replica, MLStream]:
+        replica = self.balancer.pick(session_id)
+        streams = self.streams[replica.url]
+        if not session_id:
+            return replica, streams[0]
+        return replica, streams[zlib.crc32(session_id.encode()) % len(streams)]
+
+    async def _predict(
+        self,
+        model: str,
+        image_bytes: bytes,
+        session_id: str | None,
+        error_result: Dict[str, Any],
+        budget_s: float | None = None,
+    ) -> Dict[str, Any]:
+        if budget_s is not None and budget_s <= 0:
+            # Its answer would arrive too late to be of use
+            return dict(error_result)
+        replica, stream = self._stream_for(session_id)
+        timeout = stream.timeout if budget_s is None else min(budget_s, stream.timeout)
+        with self.balancer.in_flight(replica):
+            try:
+                result = await stream.request(model, image_bytes, session_id, timeout)
+            except MLStreamError as e:
+                # The replica answered — this frame failed, the replica is fine
+                self.balancer.record(replica, ok=True)
+                print(f"ML stream error: {e!r}")
+                return dict(error_result)
+            except asyncio.TimeoutError:
+                # Silence for the full stream timeout counts against the
+                # replica; running out of a shorter budget does not
+                if timeout >= stream.timeout:
+                    self.balancer.record(replica, ok=False)
+                print(f"ML stream error from {replica.url}: no reply within {timeout:.3f}s")
+                return dict(error_result)
+            except (ConnectionError, OSError, websockets.WebSocketException) as e:
+                self.balancer.record(replica, ok=False)
+                print(f"ML stream error from {replica.url}: {e!r}")
+                return dict(error_result)
+        self.balancer.record(replica, ok=True)
+        return result
+
+    async def predict(
+        self, image_bytes: bytes, session_id: str | None = None, budget_s: float | None = None
+    ) -> Dict[str, Any]:
+        """Gesture prediction for one encoded frame, within budget_s (at most the stream timeout)."""
+        return await self._predict("gesture", image_bytes, session_id, GESTURE_ERROR_RESULT, budget_s)
+
+    async def predict_face(
+        self, image_bytes: bytes, session_id: str | None = None, budget_s: float | None = None
+    ) -> Dict[str, Any]:
+        """Face direction prediction for one encoded frame."""
+        return await self._predict("face", image_bytes, session_id, FACE_ERROR_RESULT, budget_s)
+
+    async def predict_multi(
+        self, image_bytes: bytes, session_id: str | None = None, budget_s: float | None = None
+    ) -> Dict[str, Any]:
+        """Gesture and face predictions for one encoded frame, decoded once."""
+        return await self._predict(
+            "multi", image_bytes, session_id, multi_error_result(("gesture", "face")), budget_s
+        )
+
+    async def end_session(self, session_id: str):
+        """Free the session's tracking state in the ML service."""
+        try:
+            _, stream = self._stream_for(session_id)
+            await stream.end_session(session_id)
+        except (ConnectionError, OSError, websockets.WebSocketException) as e:
+            print(f"ML stream error: {e!r}")
+
+    async def close(self):
+        await asyncio.gather(
+            *(stream.close() for streams in self.streams.values() for stream in streams),
+            return_exceptions=True,
+        )
+
+
+# Shared by every WebSocket session in this process
+ml_stream_pool = MLStreamPool(
+    ml_balancer,
+    connections=settings.ML_STREAM_CONNECTIONS,
+    timeout=settings.ML_STREAM_TIMEOUT_S,
+)
@@ -0,0 +1,209 @@
+import asyncio
+import re
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.gesture_log import GestureLog
+from app.models.user import User  # noqa: F401 — target of gesture_logs' foreign key
+
+PARENT_TABLE = "gesture_logs"
+# One partition per UTC day: gesture_logs_p20240131
+PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_p(\d{{8}})$")
+# Where convert_unpartitioned() moves a pre-partitioning table aside
+LEGACY_TABLE = f"{PARENT_TABLE}_unpartitioned"
+COLUMNS = "id, user_id, gesture_name, confidence, latency_ms, session_id"
+
+
+class UnpartitionedTableError(RuntimeError):
+    """gesture_logs exists as a plain table, from before partitioning."""
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT_TABLE}_p{day:%Y%m%d}"
+
+
+def _day_start(day: date) -> str:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc).isoformat()
+
+
+class PartitionMaintainer:
+    """
+    Keeps gesture_logs' daily partitions in shape.
+
+    Each run creates partitions for today and the next premake_days,
+    so inserts never hit a missing range, and drops whole partitions
+    older than retention_days (0, the default, keeps everything).
+    Dropping a partition is a metadata operation — no DELETE, no vacuum
+    debt. Runs once at startup and then every interval_s in the
+    background.
+
+    A gesture_logs table created before partitioning can't take
+    partitions; start() refuses to run on one, and
+    convert_unpartitioned() (scripts/partition_gesture_logs.py) copies
+    it into the partitioned layout.
+    """
+
+    def __init__(
+        self,
+        engine=engine,
+        premake_days: int = 7,
+        retention_days: int = 0,
+        interval_s: float = 3600.0,
+    ):
+        self.engine = engine
+        self.premake_days = max(1, premake_days)
+        self.retention_days = retention_days
+        self.interval_s = interval_s
+        self._task: asyncio.Task | None = None
+
+        # ─── Metrics ─────────────────────────────────────
+        self.runs = 0
+        self.failures = 0
+        self.partitions_created = 0
+        self.partitions_dropped = 0
+        self.last_run_at: datetime | None = None
+        self.last_error: str | None = None
+
+    async def start(self):
+        if await self._is_unpartitioned():
+            raise UnpartitionedTableError(
+                f"{PARENT_TABLE} is an unpartitioned table from an older version. "
+                f"Stop the backend and run `python -m scripts.partition_gesture_logs` "
+                f"from backend/ to convert it, then start again."
+            )
+        await self.run_once()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            await self.run_once()
+
+    async def run_once(self, today: date | None = None):
+        """Create upcoming partitions and drop expired ones; never raises."""
+        today = today or datetime.now(timezone.utc).date()
+        try:
+            async with self.engine.begin() as conn:
+                existing = await self._partitions(conn)
+                for offset in range(self.premake_days + 1):
+                    day = today + timedelta(days=offset)
+                    if day not in existing:
+                        await self._create_partition(conn, day)
+
+                if self.retention_days > 0:
+                    cutoff = today - timedelta(days=self.retention_days)
+                    for day in sorted(existing):
+                        # A partition holds one day, so it expires once the whole day is past the cutoff
+                        if day < cutoff:
+                            await conn.execute(text(f"DROP TABLE IF EXISTS {partition_name(day)}"))
+                            self.partitions_dropped += 1
+                            print(f"🗑️  Dropped expired partition {partition_name(day)}")
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"❌ Partition maintenance failed: {e}")
+        finally:
+            self.runs += 1
+            self.last_run_at = datetime.now(timezone.utc)
+
+    async def convert_unpartitioned(self) -> int:
+        """
+        Rebuild a plain gesture_logs table as the partitioned table,
+        in one transaction: the old table is renamed aside, a partition
+        is created for every day it has rows, the rows are copied over
+        and the old table dropped. Returns the number of rows moved.
+        Holds an exclusive lock on gesture_logs throughout, so run it
+        with the backend stopped.
+        """
+        today = datetime.now(timezone.utc).date()
+        async with self.engine.begin() as conn:
+            if not await self._is_unpartitioned(conn):
+                return 0
+            await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}"))
+            # The new table's primary key index takes this name
+            await conn.execute(text(
+                f"ALTER INDEX IF EXISTS {PARENT_TABLE}_pkey RENAME TO {LEGACY_TABLE}_pkey"
+            ))
+            await conn.run_sync(GestureLog.__table__.create)
+
+            first, last = (await conn.execute(text(
+                f"SELECT min((detected_at AT TIME ZONE 'UTC')::date), "
+                f"max((detected_at AT TIME ZONE 'UTC')::date) FROM {LEGACY_TABLE}"
+            ))).one()
+            day = min(first or today, today)
+            while day <= max(last or today, today):
+                await self._create_partition(conn, day)
+                day += timedelta(days=1)
+
+            # detected_at was nullable before it became the partition key
+            moved = await conn.execute(text(
+                f"INSERT INTO {PARENT_TABLE} ({COLUMNS}, detected_at) "
+                f"SELECT {COLUMNS}, COALESCE(detected_at, now()) FROM {LEGACY_TABLE}"
+            ))
+            await conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+        print(f"🗂️  Moved {moved.rowcount} rows into partitioned {PARENT_TABLE}")
+        return moved.rowcount
+
+    async def _is_unpartitioned(self, conn=None) -> bool:
+        """Whether gesture_logs is a plain table (relkind 'r', not 'p')."""
+        if conn is None:
+            async with self.engine.connect() as conn:
+                return await self._is_unpartitioned(conn)
+        relkind = (await conn.execute(text(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"
+        ), {"table": PARENT_TABLE})).scalar()
+        return relkind == "r"
+
+    async def _create_partition(self, conn, day: date):
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(day)} "
+            f"PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{_day_start(day)}') TO ('{_day_start(day + timedelta(days=1))}')"
+        ))
+        self.partitions_created += 1
+        print(f"🗂️  Created partition {partition_name(day)}")
+
+    @staticmethod
+    async def _partitions(conn) -> set[date]:
+        """Days of the existing daily partitions of gesture_logs."""
+        result = await conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ), {"parent": PARENT_TABLE})
+        days = set()
+        for (name,) in result:
+            match = PARTITION_NAME.match(name)
+            if match:
+                days.add(datetime.strptime(match.group(1), "%Y%m%d").date())
+        return days
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "partitions_created": self.partitions_created,
+            "partitions_dropped": self.partitions_dropped,
+            "premake_days": self.premake_days,
+            "retention_days": self.retention_days,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error,
+        }
+
+
+# Single instance shared across the entire app
+partition_maintainer = PartitionMaintainer(
+    premake_days=settings.GESTURE_LOG_PARTITION_PREMAKE_DAYS,
+    retention_days=settings.GESTURE_LOG_RETENTION_DAYS,
+    interval_s=settings.GESTURE_LOG_PARTITION_CHECK_S,
+)
@@ -0,0 +1,195 @@
+"""
+Incremental gesture_logs rollups.
+
+The gesture log writer calls apply_rollups() in the same transaction as
+each batch insert (in a savepoint, so a failure here never loses the raw
+rows), keeping minute/hour/day aggregates in step with the raw log.
+backfill_rollups() rebuilds them from gesture_logs — it runs at startup
+when gesture_rollups is first created, and by hand after rollup failures
+(see the writer's rollup_failures):
+
+    python -m app.services.rollup_service [--since 2024-01-01]
+"""
+import argparse
+import asyncio
+from bisect import bisect_right
+from datetime import datetime, timezone
+
+from sqlalchemy import Integer, cast, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import array, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.gesture_log import GestureLog
+from app.models.gesture_rollup import GestureRollup, GRANULARITIES, LATENCY_BUCKETS_MS
+
+ROLLUP_KEY = ("granularity", "bucket_start", "user_id", "gesture_name")
+
+# Element-wise sum of the stored and the incoming histogram
+_MERGE_HIST = literal_column(
+    "ARRAY(SELECT a + b FROM unnest(gesture_rollups.latency_hist, excluded.latency_hist) AS t(a, b))"
+)
+
+
+def latency_bucket(latency_ms: float) -> int:
+    """Histogram index for a latency — same edges as Postgres width_bucket()."""
+    return bisect_right(LATENCY_BUCKETS_MS, latency_ms)
+
+
+def histogram_percentiles(hist: list[int], quantiles=(0.5, 0.95, 0.99)) -> dict[str, float | None]:
+    """
+    Approximate latency percentiles from a LATENCY_BUCKETS_MS histogram,
+    interpolating linearly inside the bucket that holds each rank.
+    The open-ended last bucket reports its lower edge.
+    """
+    total = sum(hist)
+    result = {}
+    for q in quantiles:
+        name = f"p{q * 100:g}"
+        if total == 0:
+            result[name] = None
+            continue
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(hist):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0.0
+                if i == len(LATENCY_BUCKETS_MS):
+                    result[name] = float(lower)
+                else:
+                    upper = LATENCY_BUCKETS_MS[i]
+                    result[name] = round(lower + (upper - lower) * (rank - seen) / count, 2)
+                break
+            seen += count
+    return result
+
+
+def truncate(ts: datetime, granularity: str) -> datetime:
+    """Start of the UTC minute/hour/day containing ts."""
+    ts = ts.astimezone(timezone.utc)
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate_rows(rows: list[dict]) -> list[dict]:
+    """Fold gesture log rows into one rollup row per granularity/bucket/user/gesture."""
+    buckets: dict[tuple, dict] = {}
+    for row in rows:
+        latency_ms = row.get("latency_ms")
+        for granularity in GRANULARITIES:
+            key = (granularity, truncate(row["detected_at"], granularity), row["user_id"], row["gesture_name"])
+            rollup = buckets.get(key)
+            if rollup is None:
+                rollup = buckets[key] = {
+                    **dict(zip(ROLLUP_KEY, key)),
+                    "count": 0,
+                    "confidence_sum": 0.0,
+                    "latency_sum_ms": 0.0,
+                    "latency_hist": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            rollup["count"] += 1
+            rollup["confidence_sum"] += row["confidence"]
+            if latency_ms is not None:
+                rollup["latency_sum_ms"] += latency_ms
+                rollup["latency_hist"][latency_bucket(latency_ms)] += 1
+    # Stable key order so concurrent writers lock rows in the same order
+    return [buckets[key] for key in sorted(buckets, key=lambda k: (k[0], k[1], str(k[2]), k[3]))]
+
+
+async def apply_rollups(session: AsyncSession, rows: list[dict]):
+    """Add a batch of gesture log rows to the rollups (upsert, no commit)."""
+    rollups = aggregate_rows(rows)
+    if not rollups:
+        return
+    stmt = pg_insert(GestureRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={
+            "count": GestureRollup.count + stmt.excluded["count"],
+            "confidence_sum": GestureRollup.confidence_sum + stmt.excluded["confidence_sum"],
+            "latency_sum_ms": GestureRollup.latency_sum_ms + stmt.excluded["latency_sum_ms"],
+            "latency_hist": _MERGE_HIST,
+        },
+    )
+    await session.execute(stmt, rollups)
+
+
+def utc_bucket(granularity: str, column):
+    """SQL for the start of the UTC minute/hour/day containing a timestamptz column."""
+    # Inlined rather than bound, so GROUP BY matches the select expression
+    utc = literal_column("'UTC'")
+    return func.timezone(
+        utc, func.date_trunc(literal_column(f"'{granularity}'"), func.timezone(utc, column))
+    )
+
+
+def latency_bucket_sql(column):
+    """SQL histogram index of a latency column — matches latency_bucket()."""
+    return func.width_bucket(column, literal_column(f"ARRAY{list(LATENCY_BUCKETS_MS)}::float8[]"))
+
+
+def _rebuild_statement(granularity: str, since: datetime | None):
+    """INSERT ... SELECT recomputing one granularity from gesture_logs."""
+    bucket = utc_bucket(granularity, GestureLog.detected_at)
+    hist_index = latency_bucket_sql(GestureLog.latency_ms)
+    hist = array([
+        cast(func.count().filter(hist_index == i), Integer)
+        for i in range(len(LATENCY_BUCKETS_MS) + 1)
+    ])
+
+    query = select(
+        literal(granularity),
+        bucket,
+        GestureLog.user_id,
+        GestureLog.gesture_name,
+        func.count(),
+        func.sum(GestureLog.confidence),
+        func.coalesce(func.sum(GestureLog.latency_ms), 0.0),
+        hist,
+    ).group_by(bucket, GestureLog.user_id, GestureLog.gesture_name)
+    if since is not None:
+        query = query.where(GestureLog.detected_at >= since)
+
+    stmt = pg_insert(GestureRollup).from_select(
+        [*ROLLUP_KEY, "count", "confidence_sum", "latency_sum_ms", "latency_hist"], query
+    )
+    # Recomputed buckets replace what the writer accumulated
+    return stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={
+            column: stmt.excluded[column]
+            for column in ("count", "confidence_sum", "latency_sum_ms", "latency_hist")
+        },
+    )
+
+
+async def backfill_rollups(session: AsyncSession, since: datetime | None = None):
+    """
+    Rebuild rollups from gesture_logs (everything, or from `since`).
+    since is aligned down to a day boundary so no bucket is rebuilt
+    from a partial range.
+    """
+    if since is not None:
+        since = truncate(since, "day")
+    for granularity in GRANULARITIES:
+        await session.execute(_rebuild_statement(granularity, since))
+    await session.commit()
+
+
+async def _main(since: datetime | None):
+    from app.db.session import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        await backfill_rollups(session, since)
+    print("✅ Gesture rollups rebuilt")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild gesture_rollups from gesture_logs")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="only rebuild buckets from this date (ISO format, UTC)")
+    args = parser.parse_args()
+    since = args.since.replace(tzinfo=args.since.tzinfo or timezone.utc) if args.since else None
+    asyncio.run(_main(since))
@@ -1,6 +1,76 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+
 from fastapi import WebSocket
 
 
+@dataclass
+class SessionStats:
+    """Per-session frame counters for live WebSocket streams."""
+    frames_received: int = 0
+    frames_processed: int = 0
+    frames_dropped: int = 0
+    last_lag_ms: float = 0.0     # Frame received → result sent, last frame
+    max_lag_ms: float = 0.0
+    total_lag_ms: float = 0.0
+
+    def record_processed(self, received_at: float):
+        lag_ms = (time.perf_counter() - received_at) * 1000
+        self.frames_processed += 1
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.total_lag_ms += lag_ms
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        total = data.pop("total_lag_ms")
+        data["avg_lag_ms"] = round(total / self.frames_processed, 2) if self.frames_processed else 0.0
+        data["last_lag_ms"] = round(self.last_lag_ms, 2)
+        data["max_lag_ms"] = round(self.max_lag_ms, 2)
+        return data
+
+
+class FrameQueue:
+    """
+    Latest-frame-wins buffer between a socket's receiver and its
+    inference loop.
+
+    Holds at most `depth` unprocessed frames; when a new frame arrives
+    and the buffer is full the oldest one is dropped (and counted), so
+    a slow ML call never lets the gesture fall further behind the camera.
+    """
+
+    def __init__(self, stats: SessionStats, depth: int = 1):
+        self.stats = stats
+        self.depth = max(1, depth)
+        self._frames: deque = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def put(self, frame):
+        self.stats.frames_received += 1
+        if len(self._frames) >= self.depth:
+            self._frames.popleft()
+            self.stats.frames_dropped += 1
+        self._frames.append((time.perf_counter(), frame))
+        self._ready.set()
+
+    async def get(self):
+        """Wait for the oldest kept frame; returns None once closed."""
+        while not self._frames:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self._frames.popleft()
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+
 class WebSocketManager:
     """
     Manages all active WebSocket connections.
@@ -9,19 +79,29 @@ class WebSocketManager:
 
     def __init__(self):
         self.active_connections: dict[str, WebSocket] = {}
+        self.session_stats: dict[str, SessionStats] = {}
 
     async def connect(self, websocket: WebSocket, session_id: str):
         """Accept a new WebSocket connection."""
         await websocket.accept()
         self.active_connections[session_id] = websocket
+        self.session_stats[session_id] = SessionStats()
         print(f"✅ WebSocket connected: {session_id}")
 
     def disconnect(self, session_id: str):
         """Remove a disconnected WebSocket."""
         if session_id in self.active_connections:
             del self.active_connections[session_id]
+            self.session_stats.pop(session_id, None)
             print(f"👋 WebSocket disconnected: {session_id}")
 
+    def stats_for(self, session_id: str) -> SessionStats:
+        return self.session_stats.setdefault(session_id, SessionStats())
+
+    def get_stats(self) -> dict[str, dict]:
+        """Frame counters for every connected session."""
+        return {session_id: stats.to_dict() for session_id, stats in self.session_stats.items()}
+
     async def send_to_session(self, session_id: str, data: dict):
         """Send a message to one specific session."""
         if session_id in self.active_connections:
@@ -48,4 +128,4 @@ class WebSocketManager:
 
 
 # Single instance shared across the entire app
-ws_manager = WebSocketManager()
\ No newline at end of file
+ws_manager = WebSocketManager()
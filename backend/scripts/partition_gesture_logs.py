@@ -0,0 +1,35 @@
+"""
+Convert a gesture_logs table created before partitioning into the
+partitioned layout (see app.services.partition_service).
+
+Run from backend/, with the backend stopped:
+    python -m scripts.partition_gesture_logs
+
+Every row is copied into a daily partition in a single transaction, so
+a failure leaves the old table untouched. The copy rewrites the whole
+table; on a large one, expect it to take a while and need as much free
+disk again. Running it on an already partitioned table does nothing.
+"""
+import asyncio
+
+from app.db.session import engine
+from app.services.partition_service import partition_maintainer
+
+
+async def convert():
+    try:
+        moved = await partition_maintainer.convert_unpartitioned()
+        if moved or partition_maintainer.partitions_created:
+            print(f"✅ gesture_logs partitioned, {moved} rows moved")
+        else:
+            print("✅ gesture_logs is already partitioned, nothing to do")
+    finally:
+        await engine.dispose()
+
+
+def main():
+    asyncio.run(convert())
+
+
+if __name__ == "__main__":
+    main()
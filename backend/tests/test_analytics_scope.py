@@ -0,0 +1,64 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.api.dependencies import get_current_admin
+from app.api.v1.endpoints.analytics import AnalyticsFilter
+
+ALICE = SimpleNamespace(id=uuid.UUID(int=1), is_superuser=False)
+BOB = SimpleNamespace(id=uuid.UUID(int=2), is_superuser=False)
+ADMIN = SimpleNamespace(id=uuid.UUID(int=3), is_superuser=True)
+
+
+class SessionDB:
+    """Answers the session ownership query from (session_id, user_id) pairs."""
+
+    def __init__(self, logged: set[tuple[str, uuid.UUID]]):
+        self.logged = logged
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        session_id = next(v for v in params.values() if isinstance(v, str))
+        user_id = next(v for v in params.values() if isinstance(v, uuid.UUID))
+        row = ("log-id",) if (session_id, user_id) in self.logged else None
+        return SimpleNamespace(first=lambda: row)
+
+
+def scoped(user, db, **params) -> AnalyticsFilter:
+    filters = AnalyticsFilter(**params)
+    asyncio.run(filters.restrict_to(user, db))
+    return filters
+
+
+def test_users_only_see_their_own_rows():
+    filters = scoped(ALICE, SessionDB(set()), user_id=BOB.id)
+    assert filters.user_id == ALICE.id
+    assert scoped(ALICE, SessionDB(set())).user_id == ALICE.id
+
+
+def test_admins_keep_the_requested_scope():
+    db = SessionDB(set())
+    assert scoped(ADMIN, db).user_id is None
+    assert scoped(ADMIN, db, user_id=BOB.id, session_id="s1").user_id == BOB.id
+    assert db.queries == 0
+
+
+def test_session_filter_requires_a_session_of_the_caller():
+    db = SessionDB({("s1", ALICE.id)})
+    assert scoped(ALICE, db, session_id="s1").session_id == "s1"
+    with pytest.raises(HTTPException) as error:
+        scoped(BOB, db, session_id="s1")
+    assert error.value.status_code == 404
+
+
+def test_admin_dependency_rejects_other_users():
+    assert asyncio.run(get_current_admin(ADMIN)) is ADMIN
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_current_admin(ALICE))
+    assert error.value.status_code == 403
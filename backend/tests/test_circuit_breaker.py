@@ -0,0 +1,211 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import ml_client as ml_client_module
+from app.services.ml_balancer import ReplicaBalancer
+from app.services.ml_client import GESTURE_ERROR_RESULT, CircuitBreaker, MLServiceClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ml_client_module.time, "monotonic", clock)
+    return clock
+
+
+def opened(clock, threshold: int = 3, reset_s: float = 10.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=threshold, reset_timeout_s=reset_s)
+    for _ in range(threshold):
+        breaker.record_failure()
+    return breaker
+
+
+# ─── State machine ───────────────────────────────────────────────────────────
+
+def test_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_rejects_until_the_reset_timeout(clock):
+    breaker = opened(clock)
+    assert not breaker.allow()
+    clock.now += 9.9
+    assert not breaker.allow()
+    assert breaker.rejected == 2
+    clock.now += 0.1
+    assert breaker.state == "half_open"
+
+
+def test_half_open_lets_exactly_one_probe_through(clock):
+    breaker = opened(clock)
+    clock.now += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.state == "half_open"
+
+
+def test_successful_probe_closes(clock):
+    breaker = opened(clock)
+    clock.now += 10
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_for_another_full_timeout(clock):
+    breaker = opened(clock)
+    clock.now += 10
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 2
+    clock.now += 9.9
+    assert not breaker.allow()
+
+
+def test_released_probe_lets_another_through(clock):
+    breaker = opened(clock)
+    clock.now += 10
+    breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+def test_failures_while_open_do_not_extend_it(clock):
+    breaker = opened(clock)
+    clock.now += 5
+    # A request sent just before the breaker opened fails late
+    breaker.record_failure()
+    assert breaker.opens == 1
+    clock.now += 5
+    assert breaker.allow()
+
+
+# ─── Client integration ──────────────────────────────────────────────────────
+
+def client_for(handler, **kwargs) -> MLServiceClient:
+    client = MLServiceClient(
+        ReplicaBalancer(["http://ml"]),
+        retries=0,
+        breaker_failure_threshold=2,
+        breaker_reset_timeout_s=60.0,
+        **kwargs,
+    )
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def run(client: MLServiceClient, times: int = 1, **kwargs) -> list[dict]:
+    async def calls():
+        try:
+            return [await client.predict_bytes(b"frame", **kwargs) for _ in range(times)]
+        finally:
+            await client.close()
+    return asyncio.run(calls())
+
+
+def test_server_errors_open_the_breaker_and_later_calls_skip_the_network():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    client = client_for(handler)
+    results = run(client, times=5)
+
+    assert results == [GESTURE_ERROR_RESULT] * 5
+    assert len(calls) == 2
+    assert client.breaker.stats()["rejected"] == 3
+
+
+def test_rejected_frames_do_not_trip_the_breaker():
+    client = client_for(lambda request: httpx.Response(400, text="bad frame"))
+    run(client, times=5)
+    assert client.breaker.state == "closed"
+
+
+def test_exhausted_budget_is_not_a_service_failure():
+    calls = []
+    client = client_for(lambda request: calls.append(request) or httpx.Response(200, json={}))
+    run(client, times=5, budget_s=0.0)
+    assert calls == []
+    assert client.breaker.state == "closed"
+    assert client.deadline_exceeded == 5
+
+
+def test_overloaded_replicas_are_retried_elsewhere_without_blame():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.host)
+        return httpx.Response(503) if request.url.host == "ml-1" else httpx.Response(200, json={"ok": True})
+
+    client = client_for(handler)
+    client.balancer = ReplicaBalancer(["http://ml-1", "http://ml-2"])
+    client.retries = 1
+    client.retry_backoff_s = 0.0
+    results = run(client, times=4)
+
+    assert results == [{"ok": True}] * 4
+    assert all(replica.errors == 0 for replica in client.balancer.replicas)
+    assert client.breaker.state == "closed" and client.failures == 0
+
+
+def test_overload_everywhere_does_not_trip_the_breaker():
+    client = client_for(lambda request: httpx.Response(503))
+    results = run(client, times=5)
+    assert results == [GESTURE_ERROR_RESULT] * 5
+    assert client.breaker.state == "closed"
+    assert client.overloaded == 5
+    assert client.balancer.replicas[0].errors == 0
+
+
+async def silent(request):
+    await asyncio.sleep(1)
+    return httpx.Response(200, json={})
+
+
+def test_only_full_timeouts_count_against_the_replica():
+    client = client_for(silent, timeout_s=0.05)
+    run(client, times=2, budget_s=0.01)
+    assert client.balancer.replicas[0].errors == 0
+    assert client.breaker.consecutive_failures == 0
+
+    client = client_for(silent, timeout_s=0.05)
+    run(client, times=2)
+    assert client.balancer.replicas[0].errors == 2
+    assert client.breaker.state == "open"
+
+
+def test_non_json_success_is_a_handled_failure():
+    client = client_for(lambda request: httpx.Response(200, text="<html>proxy</html>"))
+    assert run(client) == [GESTURE_ERROR_RESULT]
+    assert client.failures == 1 and client.breaker.consecutive_failures == 1
@@ -0,0 +1,129 @@
+import asyncio
+import base64
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy.dialects import postgresql
+
+from app.api.v1.endpoints.gestures import decode_cursor, encode_cursor, get_gesture_history
+
+USER = SimpleNamespace(id=uuid.UUID(int=1))
+START = datetime(2024, 1, 31, 12, tzinfo=timezone.utc)
+
+
+# ─── Cursor ──────────────────────────────────────────────────────────────────
+
+def test_cursor_round_trips():
+    detected_at = datetime(2024, 1, 31, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    log_id = uuid.uuid4()
+    cursor = encode_cursor(detected_at, log_id)
+    assert decode_cursor(cursor) == (detected_at, log_id)
+    # Safe to put in a URL as-is
+    assert not set(cursor) & set("+/")
+
+
+def test_cursor_keeps_the_utc_offset():
+    detected_at = datetime(2024, 1, 31, 13, tzinfo=timezone(timedelta(hours=1)))
+    decoded, _ = decode_cursor(encode_cursor(detected_at, uuid.uuid4()))
+    assert decoded == detected_at and decoded.utcoffset() == timedelta(hours=1)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),                  # not UTF-8
+    base64.urlsafe_b64encode(b"2024-01-31T12:00:00").decode(),       # no id
+    base64.urlsafe_b64encode(b"yesterday|" + str(uuid.uuid4()).encode()).decode(),
+    base64.urlsafe_b64encode(b"2024-01-31T12:00:00|not-a-uuid").decode(),
+    base64.urlsafe_b64encode(b"a|b|c").decode(),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+# ─── Keyset pages ────────────────────────────────────────────────────────────
+
+class KeysetDB:
+    """
+    Answers the history query from a list of rows, applying the
+    statement's own bound values (cursor and limit).
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        limit = next(v for v in params.values() if isinstance(v, int))
+        after = [v for k, v in params.items() if not k.startswith("user_id") and not isinstance(v, int)]
+        rows = sorted(self.rows, key=lambda r: (r["detected_at"], r["id"]), reverse=True)
+        if after:
+            rows = [r for r in rows if (r["detected_at"], r["id"]) < tuple(after)]
+        page = rows[:limit]
+        return SimpleNamespace(mappings=lambda: SimpleNamespace(all=lambda: page))
+
+
+def history_rows(count: int) -> list[dict]:
+    # Three rows per timestamp, so pages often split a tie
+    return [
+        {"id": uuid.uuid4(), "gesture_name": "fist", "confidence": 0.9, "latency_ms": 10.0,
+         "session_id": None, "detected_at": START + timedelta(seconds=i // 3)}
+        for i in range(count)
+    ]
+
+
+def fetch(db, limit: int, cursor: str | None = None) -> tuple[list[dict], str | None]:
+    response = Response()
+    rows = asyncio.run(get_gesture_history(response, db=db, current_user=USER, limit=limit, cursor=cursor))
+    return rows, response.headers.get("X-Next-Cursor")
+
+
+def test_history_query_compares_the_row_value():
+    db = KeysetDB([])
+    cursor = encode_cursor(START, uuid.UUID(int=7))
+    fetch(db, 5, cursor)
+
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert "(gesture_logs.detected_at, gesture_logs.id) < (" in sql
+    assert "ORDER BY gesture_logs.detected_at DESC, gesture_logs.id DESC" in sql
+    params = db.statements[0].compile(dialect=postgresql.dialect()).params
+    assert START in params.values() and uuid.UUID(int=7) in params.values()
+    # One row beyond the page tells whether there is a next page
+    assert 6 in params.values()
+
+
+def test_pages_cover_every_row_once_newest_first():
+    rows = history_rows(23)
+    db = KeysetDB(rows)
+
+    seen, cursor = [], None
+    for pages in range(1, 10):
+        page, cursor = fetch(db, 5, cursor)
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert pages == 5
+    assert [r["id"] for r in seen] == [
+        r["id"] for r in sorted(rows, key=lambda r: (r["detected_at"], r["id"]), reverse=True)
+    ]
+
+
+def test_exactly_full_last_page_has_no_next_cursor():
+    db = KeysetDB(history_rows(10))
+    first, cursor = fetch(db, 5)
+    second, cursor = fetch(db, 5, cursor)
+    assert len(first) == len(second) == 5
+    assert cursor is None
+
+
+def test_cursor_points_at_the_last_row_returned():
+    db = KeysetDB(history_rows(7))
+    page, cursor = fetch(db, 3)
+    assert decode_cursor(cursor) == (page[-1]["detected_at"], page[-1]["id"])
@@ -0,0 +1,225 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.gesture_rollup import LATENCY_BUCKETS_MS
+from app.services.gesture_service import GestureLogWriter
+from app.services.rollup_service import (
+    aggregate_rows,
+    apply_rollups,
+    histogram_percentiles,
+    latency_bucket,
+    truncate,
+)
+
+USER = uuid.UUID(int=1)
+NUM_BUCKETS = len(LATENCY_BUCKETS_MS) + 1
+
+
+def row(minute: int, latency_ms: float | None = 10.0, gesture: str = "fist", confidence: float = 0.5) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "user_id": USER,
+        "gesture_name": gesture,
+        "confidence": confidence,
+        "latency_ms": latency_ms,
+        "session_id": None,
+        "detected_at": datetime(2024, 1, 31, 12, minute, 30, tzinfo=timezone.utc),
+    }
+
+
+def merge(stored: dict, incoming: dict) -> dict:
+    """What the upsert's ON CONFLICT clause does to an existing rollup row."""
+    return {
+        **stored,
+        "count": stored["count"] + incoming["count"],
+        "confidence_sum": stored["confidence_sum"] + incoming["confidence_sum"],
+        "latency_sum_ms": stored["latency_sum_ms"] + incoming["latency_sum_ms"],
+        "latency_hist": [a + b for a, b in zip(stored["latency_hist"], incoming["latency_hist"])],
+    }
+
+
+def by_key(rollups: list[dict]) -> dict:
+    return {(r["granularity"], r["bucket_start"], r["user_id"], r["gesture_name"]): r for r in rollups}
+
+
+# ─── Histogram buckets ───────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("latency_ms, bucket", [
+    (0.0, 0),
+    (4.99, 0),
+    (5, 1),                       # an edge belongs to the bucket above it
+    (9.99, 1),
+    (150, 8),
+    (1999.9, 12),
+    (2000, 13),                   # open-ended last bucket
+    (60_000, 13),
+])
+def test_latency_bucket_matches_width_bucket(latency_ms, bucket):
+    assert latency_bucket(latency_ms) == bucket
+
+
+def test_truncate_to_utc_buckets():
+    ts = datetime(2024, 1, 31, 23, 59, 59, tzinfo=timezone.utc)
+    assert truncate(ts, "minute") == datetime(2024, 1, 31, 23, 59, tzinfo=timezone.utc)
+    assert truncate(ts, "hour") == datetime(2024, 1, 31, 23, tzinfo=timezone.utc)
+    assert truncate(ts, "day") == datetime(2024, 1, 31, tzinfo=timezone.utc)
+
+
+# ─── Aggregation ─────────────────────────────────────────────────────────────
+
+def test_rows_fold_into_one_rollup_per_bucket_user_and_gesture():
+    rollups = by_key(aggregate_rows([row(0, 7), row(0, 120), row(1, None), row(0, 3, gesture="open_palm")]))
+
+    minute = rollups[("minute", datetime(2024, 1, 31, 12, 0, tzinfo=timezone.utc), USER, "fist")]
+    assert minute["count"] == 2
+    assert minute["latency_sum_ms"] == 127
+    assert minute["latency_hist"][latency_bucket(7)] == 1
+    assert minute["latency_hist"][latency_bucket(120)] == 1
+    assert sum(minute["latency_hist"]) == 2
+
+    hour = rollups[("hour", datetime(2024, 1, 31, 12, tzinfo=timezone.utc), USER, "fist")]
+    # A row without a latency is counted, but not in the histogram
+    assert hour["count"] == 3
+    assert hour["confidence_sum"] == 1.5
+    assert sum(hour["latency_hist"]) == 2
+    assert all(len(r["latency_hist"]) == NUM_BUCKETS for r in rollups.values())
+    # 3 granularities x (2 fist minutes + 1 shared hour/day) + 3 for open_palm
+    assert len(rollups) == 4 + 3
+
+
+def test_incremental_merges_equal_one_aggregation_of_everything():
+    batches = [
+        [row(0, 4), row(0, 5), row(2, 2500)],
+        [row(0, 99), row(1, None, confidence=0.25)],
+        [row(2, 5), row(0, 4)],
+    ]
+    stored: dict = {}
+    for batch in batches:
+        for key, rollup in by_key(aggregate_rows(batch)).items():
+            stored[key] = merge(stored[key], rollup) if key in stored else rollup
+
+    assert stored == by_key(aggregate_rows([r for batch in batches for r in batch]))
+
+
+def test_rollups_are_sorted_for_a_stable_lock_order():
+    rows = [row(5), row(1, gesture="b"), row(3, gesture="a")]
+    keys = [(r["granularity"], r["bucket_start"], r["gesture_name"]) for r in aggregate_rows(rows)]
+    assert keys == sorted(keys)
+    assert aggregate_rows(list(reversed(rows))) == aggregate_rows(rows)
+
+
+# ─── Percentiles ─────────────────────────────────────────────────────────────
+
+def test_percentiles_of_an_empty_histogram_are_none():
+    assert histogram_percentiles([0] * NUM_BUCKETS) == {"p50": None, "p95": None, "p99": None}
+
+
+def test_percentiles_interpolate_inside_a_bucket():
+    hist = [0] * NUM_BUCKETS
+    hist[latency_bucket(15)] = 100          # all in [10, 20)
+    result = histogram_percentiles(hist, quantiles=(0.5, 0.9))
+    assert result == {"p50": 15.0, "p90": 19.0}
+
+
+def test_percentiles_of_the_open_ended_bucket_report_its_lower_edge():
+    hist = [0] * NUM_BUCKETS
+    hist[0] = 50
+    hist[-1] = 50
+    result = histogram_percentiles(hist, quantiles=(0.25, 0.99))
+    assert result["p25"] == 2.5
+    assert result["p99"] == float(LATENCY_BUCKETS_MS[-1])
+
+
+# ─── Upsert ──────────────────────────────────────────────────────────────────
+
+class RecordingSession:
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, stmt, params=None):
+        self.executed.append((stmt, params))
+
+
+def test_upsert_adds_to_existing_rollups():
+    session = RecordingSession()
+    asyncio.run(apply_rollups(session, [row(0)]))
+
+    (stmt, params), = session.executed
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (granularity, bucket_start, user_id, gesture_name) DO UPDATE" in sql
+    assert "count = (gesture_rollups.count + excluded.count)" in sql
+    # Histograms are summed element-wise, not replaced
+    assert "unnest(gesture_rollups.latency_hist, excluded.latency_hist)" in sql
+    assert len(params) == 3
+
+
+def test_no_rows_no_statement():
+    session = RecordingSession()
+    asyncio.run(apply_rollups(session, []))
+    assert session.executed == []
+
+
+# ─── Log writer ──────────────────────────────────────────────────────────────
+
+class FakeSession:
+    """Fails the statements asked to; commit() keeps every statement that ran."""
+
+    def __init__(self, store: dict, fail_rollups: bool = False, fail_insert: bool = False):
+        self.store = store
+        self.fail_rollups = fail_rollups
+        self.fail_insert = fail_insert
+        self.pending = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin_nested(self):
+        return self
+
+    async def execute(self, stmt, params=None):
+        table = stmt.table.name
+        if table == "gesture_rollups" and self.fail_rollups:
+            raise RuntimeError('relation "gesture_rollups" does not exist')
+        if table == "gesture_logs" and self.fail_insert:
+            raise RuntimeError("partition missing")
+        self.pending.append((table, params))
+
+    async def commit(self):
+        for table, params in self.pending:
+            self.store.setdefault(table, []).extend(params)
+
+
+def flush(**failures) -> tuple[GestureLogWriter, dict]:
+    store: dict = {}
+    writer = GestureLogWriter(session_factory=lambda: FakeSession(store, **failures))
+    asyncio.run(writer._flush([(0, row(0)), (0, row(1))]))
+    return writer, store
+
+
+def test_flush_commits_raw_rows_and_rollups_together():
+    writer, store = flush()
+    assert len(store["gesture_logs"]) == 2
+    assert len(store["gesture_rollups"]) == 4
+    assert writer.rows_written == 2 and writer.rollup_failures == 0
+
+
+def test_rollup_failure_does_not_lose_raw_rows():
+    writer, store = flush(fail_rollups=True)
+    assert len(store["gesture_logs"]) == 2
+    assert "gesture_rollups" not in store
+    assert writer.rows_written == 2
+    assert writer.rows_failed == 0
+    assert writer.rollup_failures == 1
+
+
+def test_insert_failure_counts_the_batch_as_failed():
+    writer, store = flush(fail_insert=True)
+    assert store == {}
+    assert writer.rows_failed == 2 and writer.rows_written == 0
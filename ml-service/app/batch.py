@@ -0,0 +1,410 @@
+"""
+Offline batch inference over recorded sessions — no FastAPI involved.
+
+    python -m app.batch INPUT --output DIR [--models gesture,face]
+                        [--format npz|parquet] [--workers N] [--stride N]
+
+INPUT is a directory of images (searched recursively) or a video file.
+Frames stream through a generator pipeline — read (or decode, for
+video) in this process, then batches fan out to the process worker
+pool, where each worker decodes and classifies with its own classifiers.
+
+Results are written as numbered part files of columns (frame_id,
+timestamp_ms, error, then <model>_<field> per requested model). Each
+part is written atomically, so rerunning into the same DIR resumes:
+frames already present in a part are skipped, except those with an
+error, which are retried (their newer row supersedes the error row).
+DIR/manifest.json records the models and format, and a rerun with
+different ones is refused. Parquet needs pyarrow.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.services.worker_pool import COMBINED_MODEL, TIMINGS_KEY, create_worker_pool
+from app.utils.image_processor import FrameData
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+FORMATS = ("npz", "parquet")
+MANIFEST = "manifest.json"
+
+# Output columns per model, with their types (see the classifiers' _result)
+RESULT_COLUMNS = {
+    "gesture": {"gesture_name": str, "confidence": float, "latency_ms": float, "hand_detected": bool},
+    "face": {
+        "direction": str,
+        "mouth_open": bool,
+        "confidence": float,
+        "latency_ms": float,
+        "face_detected": bool,
+    },
+}
+MISSING = {str: "", float: float("nan"), bool: False}
+
+
+@dataclass
+class SourceFrame:
+    frame_id: str
+    frame: FrameData
+    timestamp_ms: float = float("nan")
+
+
+@dataclass
+class StageStats:
+    """Wall time and item count of one pipeline stage."""
+    seconds: float = 0.0
+    items: int = 0
+
+    def add(self, seconds: float, items: int = 1):
+        self.seconds += seconds
+        self.items += items
+
+    def summary(self) -> dict:
+        return {
+            "items": self.items,
+            "seconds": round(self.seconds, 3),
+            "items_per_s": round(self.items / self.seconds, 1) if self.seconds else None,
+        }
+
+
+@dataclass
+class PipelineStats:
+    read: StageStats = field(default_factory=StageStats)
+    infer: StageStats = field(default_factory=StageStats)
+    write: StageStats = field(default_factory=StageStats)
+    skipped: int = 0
+    errors: int = 0
+
+
+# ─── Sources ─────────────────────────────────────────────────────────────────
+
+def iter_image_dir(root: Path, done: set[str], stats: PipelineStats):
+    """Encoded image files under root, in path order; decoded on the workers."""
+    for path in sorted(p for p in root.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS):
+        frame_id = path.relative_to(root).as_posix()
+        if frame_id in done:
+            stats.skipped += 1
+            continue
+        start = time.perf_counter()
+        data = path.read_bytes()
+        stats.read.add(time.perf_counter() - start)
+        yield SourceFrame(frame_id, FrameData(data, reduction=settings.DECODE_REDUCTION))
+
+
+def iter_video(path: Path, done: set[str], stats: PipelineStats, stride: int = 1):
+    """
+    Every stride-th frame of a video as a raw BGR frame (converted on
+    the workers). Frames that are skipped or already done are only
+    grabbed, never decoded.
+    """
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise SystemExit(f"Could not open video: {path}")
+    try:
+        index = 0
+        while True:
+            start = time.perf_counter()
+            wanted = index % stride == 0 and str(index) not in done
+            if not capture.grab():
+                break
+            if not wanted:
+                if index % stride == 0:
+                    stats.skipped += 1
+                index += 1
+                continue
+            ok, frame = capture.retrieve()
+            timestamp_ms = capture.get(cv2.CAP_PROP_POS_MSEC)
+            stats.read.add(time.perf_counter() - start)
+            if ok:
+                height, width = frame.shape[:2]
+                yield SourceFrame(str(index), FrameData(frame, "bgr", height, width), timestamp_ms)
+            index += 1
+    finally:
+        capture.release()
+
+
+def batched(frames, size: int):
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ─── Output ──────────────────────────────────────────────────────────────────
+
+class ResultWriter:
+    """Buffers result rows and writes them as numbered, atomic part files."""
+
+    def __init__(self, output_dir: Path, fmt: str, models: list[str], part_size: int = 5000):
+        if fmt == "parquet":
+            _require_pyarrow()
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.part_size = max(1, part_size)
+        self.schema = {"frame_id": str, "timestamp_ms": float, "error": str}
+        for model in models:
+            for name, kind in RESULT_COLUMNS[model].items():
+                self.schema[f"{model}_{name}"] = kind
+        self._rows: list[dict] = []
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self._check_manifest({"models": models, "format": fmt})
+        self._next_part = 1 + max((self._part_number(p) for p in self._parts()), default=-1)
+
+    def _check_manifest(self, manifest: dict):
+        """Record what this output holds; refuse to mix in other columns."""
+        path = self.output_dir / MANIFEST
+        if path.exists():
+            existing = json.loads(path.read_text())
+            if existing != manifest:
+                raise SystemExit(
+                    f"{self.output_dir} holds {existing['models']} as {existing['format']}, "
+                    f"not {manifest['models']} as {manifest['format']} — use another --output"
+                )
+            return
+        path.write_text(json.dumps(manifest, indent=2))
+
+    def _parts(self) -> list[Path]:
+        return sorted(self.output_dir.glob(f"part-*.{self.fmt}"))
+
+    @staticmethod
+    def _part_number(path: Path) -> int:
+        return int(path.stem.split("-")[1])
+
+    def done_ids(self) -> set[str]:
+        """Frame ids a previous run wrote without an error."""
+        done = set()
+        for path in self._parts():
+            if self.fmt == "npz":
+                with np.load(path) as part:
+                    frame_ids, errors = part["frame_id"].tolist(), part["error"].tolist()
+            else:
+                import pyarrow.parquet as pq
+                table = pq.read_table(path, columns=["frame_id", "error"])
+                frame_ids, errors = table.column("frame_id").to_pylist(), table.column("error").to_pylist()
+            done.update(frame_id for frame_id, error in zip(frame_ids, errors) if not error)
+        return done
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def add(self, row: dict) -> float:
+        """Buffer one row; returns the seconds spent writing, if a part filled up."""
+        self._rows.append(row)
+        if len(self._rows) >= self.part_size:
+            return self.flush()
+        return 0.0
+
+    def flush(self) -> float:
+        if not self._rows:
+            return 0.0
+        start = time.perf_counter()
+        columns = {
+            name: np.array(
+                [row.get(name, MISSING[kind]) for row in self._rows],
+                dtype=np.float64 if kind is float else bool if kind is bool else str,
+            )
+            for name, kind in self.schema.items()
+        }
+        path = self.output_dir / f"part-{self._next_part:05d}.{self.fmt}"
+        tmp = path.with_name(path.name + ".tmp")
+        if self.fmt == "npz":
+            with open(tmp, "wb") as f:
+                np.savez(f, **columns)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.table({name: values.tolist() for name, values in columns.items()}), tmp)
+        # A part either exists complete or not at all — what resuming relies on
+        os.replace(tmp, path)
+        self._next_part += 1
+        self._rows = []
+        return time.perf_counter() - start
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise SystemExit("Parquet output needs pyarrow (pip install pyarrow) — or use --format npz")
+
+
+def to_row(source: SourceFrame, models: list[str], result) -> dict:
+    row = {"frame_id": source.frame_id, "timestamp_ms": source.timestamp_ms}
+    if isinstance(result, Exception):
+        row["error"] = str(result) or type(result).__name__
+        return row
+    result.pop(TIMINGS_KEY, None)
+    by_model = result if len(models) > 1 else {models[0]: result}
+    for model in models:
+        for name, value in by_model[model].items():
+            row[f"{model}_{name}"] = value
+    return row
+
+
+# ─── Pipeline ────────────────────────────────────────────────────────────────
+
+async def run(
+    source: Path,
+    output_dir: Path,
+    models: list[str],
+    fmt: str = "npz",
+    workers: int = 0,
+    batch_size: int = 8,
+    stride: int = 1,
+    part_size: int = 5000,
+    track: bool = False,
+) -> dict:
+    writer = ResultWriter(output_dir, fmt, models, part_size)
+    done = writer.done_ids()
+    stats = PipelineStats()
+    if done:
+        print(f"↩️  Resuming: {len(done)} frames already in {output_dir}")
+
+    is_video = source.is_file()
+    frames = iter_video(source, done, stats, stride) if is_video else iter_image_dir(source, done, stats)
+    # Tracking keeps one video's frames in order on one worker
+    session_id = f"batch:{source}" if track and is_video else None
+    model = COMBINED_MODEL if len(models) > 1 else models[0]
+
+    pool = create_worker_pool(
+        "process",
+        num_workers=workers,
+        shm_mb=settings.WORKER_SHM_MB,
+        roi_margin=settings.ROI_MARGIN,
+    )
+    print(f"🤖 Loading classifiers on {pool.num_workers} worker processes...")
+    pool.start()
+    await pool.warm_up(models)
+
+    async def infer(batch: list[SourceFrame]):
+        start = time.perf_counter()
+        try:
+            results = await pool.submit(
+                model, [item.frame for item in batch], [session_id] * len(batch) if session_id else None
+            )
+        except Exception as e:
+            # A failed batch (e.g. a worker died) becomes error rows,
+            # which the next run retries, instead of ending this one
+            results = [e] * len(batch)
+        return batch, results, time.perf_counter() - start
+
+    started = time.perf_counter()
+    last_report = started
+    processed = 0
+    inflight: deque[asyncio.Task] = deque()
+
+    async def drain_one():
+        nonlocal processed
+        batch, results, seconds = await inflight.popleft()
+        stats.infer.add(seconds, len(batch))
+        for item, result in zip(batch, results):
+            try:
+                row = to_row(item, models, result)
+            except Exception as e:
+                # e.g. a result without the requested model's fields
+                row = to_row(item, models, e)
+            if row.get("error"):
+                stats.errors += 1
+            write_s = writer.add(row)
+            if write_s:
+                stats.write.add(write_s, writer.part_size)
+        processed += len(batch)
+
+    try:
+        for batch in batched(frames, batch_size):
+            inflight.append(asyncio.create_task(infer(batch)))
+            # Keep the pool busy, in submission order so parts stay ordered
+            if len(inflight) >= pool.capacity:
+                await drain_one()
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                print(f"🎞️  {processed} frames, {processed / (now - started):.1f} frames/s")
+                last_report = now
+        while inflight:
+            await drain_one()
+    finally:
+        for task in inflight:
+            task.cancel()
+        rows = writer.pending
+        write_s = writer.flush()
+        if write_s:
+            stats.write.add(write_s, rows)
+        if session_id:
+            await pool.end_session(session_id)
+        pool.close()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "source": str(source),
+        "models": models,
+        "frames": processed,
+        "skipped": stats.skipped,
+        "errors": stats.errors,
+        "seconds": round(elapsed, 3),
+        "frames_per_s": round(processed / elapsed, 1) if elapsed else None,
+        "stages": {
+            # Per-stage throughput; infer is wall time of the batch round
+            # trips, which overlap when several batches are in flight
+            "read": stats.read.summary(),
+            "infer": stats.infer.summary(),
+            "write": stats.write.summary(),
+        },
+    }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline gesture/face inference over images or a video")
+    parser.add_argument("input", type=Path, help="directory of images or a video file")
+    parser.add_argument("--output", type=Path, required=True, help="directory for the part files")
+    parser.add_argument("--models", default="gesture",
+                        help="comma-separated: gesture, face or both (decoded once)")
+    parser.add_argument("--format", choices=FORMATS, default="npz")
+    parser.add_argument("--workers", type=int, default=settings.INFERENCE_WORKERS,
+                        help="worker processes (0 = one per CPU core)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--stride", type=int, default=1, help="video: process every Nth frame")
+    parser.add_argument("--part-size", type=int, default=5000, help="rows per output part file")
+    parser.add_argument("--track", action="store_true",
+                        help="video: use tracking classifiers (frames run in order on one worker)")
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    unknown = set(models) - set(RESULT_COLUMNS)
+    if unknown or not models:
+        parser.error(f"--models must be a subset of {list(RESULT_COLUMNS)}")
+    if not args.input.exists():
+        parser.error(f"No such file or directory: {args.input}")
+
+    summary = asyncio.run(run(
+        args.input,
+        args.output,
+        list(dict.fromkeys(models)),
+        fmt=args.format,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        stride=max(1, args.stride),
+        part_size=args.part_size,
+        track=args.track,
+    ))
+    (args.output / "summary.json").write_text(json.dumps(summary, indent=2))
+    print(json.dumps(summary, indent=2))
+    print("✅ Batch inference done")
+
+
+if __name__ == "__main__":
+    main()
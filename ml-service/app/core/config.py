@@ -0,0 +1,97 @@
+from typing import List
+
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    """
+    ML service settings loaded from environment variables.
+    Env vars take priority over the .env file.
+    """
+
+    # ─── Project ─────────────────────────────────────────
+    PROJECT_NAME: str = "Gesture & Face Recognition ML Service"
+    VERSION: str = "1.0.0"
+    ENVIRONMENT: str = "development"
+
+    # ─── Models ──────────────────────────────────────────
+    # Models this replica serves; others are never loaded, so a
+    # gesture-only deployment never pays for FaceMesh. Workers load a
+    # model on first use — WARMUP does that in the background at
+    # startup, and /ready reports 200 once every enabled model is warm.
+    ENABLED_MODELS: List[str] = ["gesture", "face"]
+    WARMUP: bool = True
+
+    # ─── Inference Scheduler ─────────────────────────────
+    # Concurrent requests are grouped into micro-batches before
+    # being handed to a classifier worker. A batch is dispatched as
+    # soon as it is full or the oldest request waited BATCH_MAX_WAIT_US.
+    BATCH_MAX_SIZE: int = 8
+    BATCH_MAX_WAIT_US: int = 2000
+    # Admission control: with this many frames already waiting, new
+    # frames are refused with a fast 503 (0 = never refuse). Decoding
+    # and inference run on the workers, so the event loop stays free
+    # for /health and other light requests even under overload.
+    ADMISSION_MAX_QUEUE: int = 64
+
+    # ─── Worker Pool ─────────────────────────────────────
+    # Each worker owns its own GestureClassifier and FaceClassifier.
+    # "thread" runs workers in this process; "process" runs one
+    # process per worker so inference can use every CPU core.
+    WORKER_MODE: str = "thread"
+    INFERENCE_WORKERS: int = 2          # 0 = one worker per CPU core
+    WORKER_SHM_MB: int = 16             # Shared-memory frame arena per process worker
+
+    # ─── Streaming Sessions ──────────────────────────────
+    # Requests tagged with a session id use tracking-mode classifiers
+    # kept per session, so detection only runs when tracking is lost.
+    # Limits apply per worker pool (per process in process mode).
+    SESSION_MAX: int = 64
+    SESSION_TTL_S: float = 30.0
+
+    # ─── Preprocessing ───────────────────────────────────
+    # Decode encoded frames at 1/N size (1, 2, 4 or 8) — MediaPipe
+    # downsizes internally anyway, so 2 is usually free for HD webcams.
+    DECODE_REDUCTION: int = 1
+    # Streaming sessions only process a crop around the previous
+    # detection, grown by this fraction of its size (0 = full frame)
+    ROI_MARGIN: float = 0.5
+
+    # ─── Result Cache ────────────────────────────────────
+    # Repeated frames (static camera, paused game, retries) reuse the
+    # previous prediction without decoding. "exact" matches identical
+    # bytes, "perceptual" also matches near-identical encoded frames.
+    # Frames of a tracking session are never cached.
+    RESULT_CACHE_MODE: str = "off"      # off | exact | perceptual
+    RESULT_CACHE_SIZE: int = 1024
+    RESULT_CACHE_TTL_S: float = 1.0
+
+    # ─── Observability ───────────────────────────────────
+    # Per-stage latency histograms are always on (/metrics); this also
+    # returns each request's stages as a Server-Timing header, which
+    # the backend folds into its own metrics.
+    SERVER_TIMING: bool = True
+
+    # ─── Profiling ───────────────────────────────────────
+    # Off until switched on at runtime through /admin/profiling; the
+    # sampler and slow request recorder write under PROFILE_DIR.
+    PROFILE_DIR: str = "data/profiles"
+    PROFILE_INTERVAL_MS: float = 10.0   # Sampling period, per process
+    # The recorder keeps users' raw camera frames, in memory while it
+    # runs and on disk under PROFILE_DIR once stopped. Nothing deletes
+    # those dumps; remove them once replayed.
+    SLOW_REQUESTS_KEEP: int = 20
+    # Required in an X-Admin-Token header. /admin/profiling is not
+    # mounted at all while this is empty.
+    ADMIN_TOKEN: str = ""
+
+    # ─── Pydantic v2 style config ────────────────────────
+    model_config = {
+        "env_file": ".env",
+        "case_sensitive": True,
+        "extra": "ignore"
+    }
+
+
+# Single instance used across the entire service
+settings = Settings()
@@ -0,0 +1,99 @@
+"""
+Per-stage latency instrumentation.
+
+A StageTimer collects perf_counter_ns durations for one HTTP request or
+one streamed frame; finish() observes them into the ml_stage_seconds
+histogram served on /metrics. The timer of the request being handled
+lives in a ContextVar, so code along the path records stages without
+the timer being passed through every call.
+"""
+import time
+from contextvars import ContextVar
+
+from prometheus_client import Histogram
+from starlette.datastructures import MutableHeaders
+
+from app.core.profiling import slow_requests
+
+STAGE_SECONDS = Histogram(
+    "ml_stage_seconds",
+    "Time spent in each stage of handling a frame",
+    ["route", "stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class StageTimer:
+    """Stage durations (ns) of one request; stages recorded twice add up."""
+
+    __slots__ = ("route", "stages", "started_ns", "frame")
+
+    def __init__(self, route: str = ""):
+        self.route = route
+        self.stages: dict[str, int] = {}
+        self.started_ns = time.perf_counter_ns()
+        # (model, buffer, pixel_format, height, width, session_id), kept
+        # only while the slow request recorder is on
+        self.frame: tuple | None = None
+
+    def record(self, stage: str, duration_ns: int):
+        self.stages[stage] = self.stages.get(stage, 0) + duration_ns
+
+    def since(self, stage: str, start_ns: int):
+        """Record the time from start_ns (a perf_counter_ns reading) until now."""
+        self.record(stage, time.perf_counter_ns() - start_ns)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, with the total so far."""
+        stages = {**self.stages, "total": time.perf_counter_ns() - self.started_ns}
+        return ", ".join(f"{stage};dur={ns / 1e6:.3f}" for stage, ns in stages.items())
+
+    def finish(self):
+        self.record("total", time.perf_counter_ns() - self.started_ns)
+        for stage, duration_ns in self.stages.items():
+            STAGE_SECONDS.labels(self.route, stage).observe(duration_ns / 1e9)
+        if self.frame is not None and slow_requests.enabled:
+            slow_requests.offer(self)
+
+
+current_timer: ContextVar[StageTimer | None] = ContextVar("current_timer", default=None)
+
+
+def record_stage(stage: str, duration_ns: int):
+    """Add to the current request's timer, if there is one."""
+    timer = current_timer.get()
+    if timer is not None:
+        timer.record(stage, duration_ns)
+
+
+class StageTimingMiddleware:
+    """
+    Gives every HTTP request a StageTimer, observed once the response
+    is sent, and optionally returns it as a Server-Timing header.
+    Plain ASGI rather than BaseHTTPMiddleware, so it adds no task hop.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = current_timer.set(timer)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", timer.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing if self.server_timing else send)
+        finally:
+            current_timer.reset(token)
+            route = scope.get("route")
+            timer.route = getattr(route, "path", "unmatched")
+            timer.finish()
@@ -0,0 +1,203 @@
+"""
+Opt-in production profiling, toggled at runtime from /admin/profiling.
+
+SamplingProfiler — a background thread that snapshots every thread's
+Python stack at a fixed interval and folds them into collapsed stacks
+("thread;outer;...;inner count"), the input format of flamegraph.pl,
+speedscope and inferno. Threads parked in a wait are not counted.
+
+SlowRequestRecorder — keeps the N slowest requests with their stage
+timings and frame bytes, so they can be replayed through the
+classifiers later (scripts/replay_slow_requests.py). Those are users'
+raw camera frames: they sit in memory until stop(), then on disk under
+PROFILE_DIR until someone deletes the dump.
+
+Both cost nothing while off: no thread runs, and finishing a request
+only checks a flag.
+"""
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+# (file, function) of innermost frames that mean a thread is idle
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),           # ThreadPoolExecutor worker between tasks
+    ("selectors.py", "select"),
+    ("connection.py", "_recv"),
+    ("connection.py", "poll"),
+    ("connection.py", "_poll"),
+}
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def dump_collapsed(stacks: Counter, directory: Path) -> Path:
+    """Write stacks to directory/profile-<timestamp>.collapsed, hottest first."""
+    path = directory / f"profile-{_timestamp()}.collapsed"
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
+
+
+class SamplingProfiler:
+    """Samples all Python threads of this process into collapsed stacks."""
+
+    def __init__(self):
+        self.interval_s = 0.01
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: float | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval_s: float = 0.01):
+        if self.running:
+            return
+        self.interval_s = max(0.001, interval_s)
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        """Stop sampling and return the collapsed stacks collected."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            if frames.keys() - names.keys():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            del frames
+            self.samples += 1
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval_s * 1000, 3),
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "seconds": round(time.monotonic() - self.started_at, 1) if self.started_at else 0.0,
+        }
+
+
+class SlowRequestRecorder:
+    """
+    The N slowest requests (by total time) since start(), with their
+    frames. offer() runs on the event loop when a request finishes;
+    the frame is only copied when the request makes the cut.
+    """
+
+    def __init__(self):
+        self.keep = 0
+        self._heap: list[tuple[int, int, dict]] = []   # (total_ns, seq, entry)
+        self._seq = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep > 0
+
+    def start(self, keep: int = 20):
+        self.keep = max(1, keep)
+        self._heap = []
+
+    def stop(self):
+        self.keep = 0
+
+    def offer(self, timer):
+        total_ns = timer.stages.get("total", 0)
+        if len(self._heap) >= self.keep and total_ns <= self._heap[0][0]:
+            return
+        model, buffer, pixel_format, height, width, session_id = timer.frame
+        entry = {
+            "route": timer.route,
+            "model": model,
+            "session_id": session_id,
+            "pixel_format": pixel_format,
+            "height": height,
+            "width": width,
+            "frame_bytes": len(buffer),
+            "recorded_at": time.time(),
+            "stages_ms": {stage: round(ns / 1e6, 3) for stage, ns in timer.stages.items()},
+            "frame": bytes(buffer),
+        }
+        self._seq += 1
+        if len(self._heap) < self.keep:
+            heapq.heappush(self._heap, (total_ns, self._seq, entry))
+        else:
+            heapq.heapreplace(self._heap, (total_ns, self._seq, entry))
+
+    def entries(self) -> list[dict]:
+        """Recorded requests, slowest first, without their frames."""
+        return [
+            {k: v for k, v in entry.items() if k != "frame"}
+            for _, _, entry in sorted(self._heap, reverse=True)
+        ]
+
+    def dump(self, directory: Path) -> Path:
+        """
+        Write the recorded requests to directory/slow-<timestamp>/:
+        index.json plus one NNN.bin file holding each frame.
+        """
+        out = directory / f"slow-{_timestamp()}"
+        out.mkdir(parents=True, exist_ok=True)
+        index = []
+        for i, (_, _, entry) in enumerate(sorted(self._heap, reverse=True)):
+            name = f"{i:03d}.bin"
+            (out / name).write_bytes(entry["frame"])
+            index.append({**{k: v for k, v in entry.items() if k != "frame"}, "file": name})
+        (out / "index.json").write_text(json.dumps(index, indent=2))
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "keep": self.keep,
+            "recorded": len(self._heap),
+            "fastest_kept_ms": round(self._heap[0][0] / 1e6, 3) if self._heap else None,
+        }
+
+
+# Single instances shared across the entire service
+sampling_profiler = SamplingProfiler()
+slow_requests = SlowRequestRecorder()
@@ -1,60 +1,510 @@
+import asyncio
+import functools
+import json
+import secrets
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from pathlib import Path
+from fastapi import (
+    APIRouter, Depends, FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect,
+)
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
 
-from app.models.gesture_classifier import GestureClassifier
-from app.models.face_classifier import FaceClassifier
-from app.utils.image_processor import decode_base64_image, preprocess_image
+from app.core.config import settings
+from app.core.metrics import StageTimer, StageTimingMiddleware, current_timer, record_stage
+from app.core.profiling import dump_collapsed, sampling_profiler, slow_requests
+from app.services.result_cache import create_result_cache
+from app.services.scheduler import BatchScheduler, SchedulerOverloaded
+from app.services.worker_pool import COMBINED_MODEL, TIMINGS_KEY, ModelNotEnabled, create_worker_pool
+from app.utils.image_processor import FrameData, decode_base64_bytes
+from app.utils.stream_protocol import parse_frame_message, peek_seq
 
 # Global instances
-gesture_classifier = None
-face_classifier = None
+worker_pool = create_worker_pool(
+    settings.WORKER_MODE,
+    num_workers=settings.INFERENCE_WORKERS,
+    shm_mb=settings.WORKER_SHM_MB,
+    max_sessions=settings.SESSION_MAX,
+    session_ttl_s=settings.SESSION_TTL_S,
+    roi_margin=settings.ROI_MARGIN,
+    enabled_models=settings.ENABLED_MODELS,
+)
+scheduler = BatchScheduler(
+    worker_pool,
+    max_batch_size=settings.BATCH_MAX_SIZE,
+    max_wait_us=settings.BATCH_MAX_WAIT_US,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+)
+result_cache = create_result_cache(
+    settings.RESULT_CACHE_MODE,
+    max_entries=settings.RESULT_CACHE_SIZE,
+    ttl_s=settings.RESULT_CACHE_TTL_S,
+)
+
+
+# Models /predict-multi can run together on one frame
+COMBINABLE_MODELS = ("gesture", "face")
+
+# Per model: disabled | lazy (loads on its first frame) | warming | ready | failed
+model_status = {
+    model: (
+        "disabled" if model not in settings.ENABLED_MODELS
+        else "warming" if settings.WARMUP
+        else "lazy"
+    )
+    for model in COMBINABLE_MODELS
+}
+READY_STATES = ("lazy", "ready")
+
+
+async def warm_up_models():
+    """Warm the enabled models one at a time, so the first is ready soonest."""
+    for model in settings.ENABLED_MODELS:
+        start = time.perf_counter()
+        try:
+            await worker_pool.warm_up([model])
+        except Exception as e:
+            model_status[model] = "failed"
+            print(f"❌ Warm-up of {model} failed: {e!r}")
+            continue
+        model_status[model] = "ready"
+        print(f"✅ {model} ready on {worker_pool.num_workers} workers in {time.perf_counter() - start:.1f}s")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global gesture_classifier, face_classifier
-    print("🤖 Loading classifiers...")
-    gesture_classifier = GestureClassifier()
-    face_classifier = FaceClassifier()
-    print("✅ Classifiers ready!")
+    print(f"🤖 Starting {worker_pool.num_workers} {worker_pool.mode} workers for {settings.ENABLED_MODELS}...")
+    worker_pool.start()
+    await scheduler.start()
+    warm_up = asyncio.create_task(warm_up_models()) if settings.WARMUP else None
     yield
     print("👋 Shutting down...")
-    gesture_classifier.close()
-    face_classifier.close()
+    if warm_up is not None:
+        warm_up.cancel()
+        await asyncio.gather(warm_up, return_exceptions=True)
+    sampling_profiler.stop()
+    await scheduler.stop()
+    worker_pool.close()
 
 
 app = FastAPI(
-    title="Gesture & Face Recognition ML Service",
-    version="1.0.0",
+    title=settings.PROJECT_NAME,
+    version=settings.VERSION,
     lifespan=lifespan,
 )
+app.add_middleware(StageTimingMiddleware, server_timing=settings.SERVER_TIMING)
 
 
 class PredictionRequest(BaseModel):
     image_base64: str
+    session_id: str | None = None
+
+
+class MultiPredictionRequest(PredictionRequest):
+    models: list[str] = list(COMBINABLE_MODELS)
+
+
+async def predict_frame(
+    model: str,
+    buffer,
+    session_id: str | None = None,
+    pixel_format: str | None = None,
+    height: int = 0,
+    width: int = 0,
+) -> dict:
+    """
+    Run a frame through the scheduler, consulting the result cache first
+    so repeated frames skip decode and inference. Session frames bypass
+    the cache: each one must advance the session's tracker, and a
+    cached result may belong to another stream. The frame is decoded
+    on an inference worker, never on the event loop.
+    Raises ValueError if the frame cannot be decoded,
+    SchedulerOverloaded if the inference queue is full and
+    ModelNotEnabled for a model this replica does not serve.
+    """
+    needed = COMBINABLE_MODELS if model == COMBINED_MODEL else (model,)
+    if any(model_status.get(m, "disabled") == "disabled" for m in needed):
+        raise ModelNotEnabled(f"Model '{model}' is not enabled on this replica")
+
+    cache_key = None
+    if result_cache is not None and not session_id:
+        start = time.perf_counter_ns()
+        variant = f"{pixel_format}:{height}x{width}" if pixel_format else ""
+        if result_cache.decodes(variant):
+            # A dHash decodes the frame, which must stay off the event loop
+            loop = asyncio.get_running_loop()
+            cache_key = await loop.run_in_executor(None, result_cache.key, model, buffer, variant)
+        else:
+            cache_key = result_cache.key(model, buffer, variant)
+        if cache_key is not None:
+            cached = result_cache.get(cache_key)
+            record_stage("cache", time.perf_counter_ns() - start)
+            if cached is not None:
+                return cached
+
+    if slow_requests.enabled:
+        timer = current_timer.get()
+        if timer is not None:
+            timer.frame = (model, buffer, pixel_format, height, width, session_id)
+
+    frame = FrameData(buffer, pixel_format, height, width, settings.DECODE_REDUCTION)
+    result = await scheduler.submit(model, frame, session_id)
+    for stage, duration_ns in result.pop(TIMINGS_KEY, {}).items():
+        record_stage(stage, duration_ns)
+    if cache_key is not None:
+        result_cache.put(cache_key, result)
+    return result
+
+
+async def predict_or_http_error(
+    model: str,
+    buffer,
+    session_id: str | None = None,
+    pixel_format: str | None = None,
+    height: int = 0,
+    width: int = 0,
+) -> dict:
+    """predict_frame for HTTP handlers: bad frames → 400, overload → fast 503."""
+    try:
+        return await predict_frame(model, buffer, session_id, pixel_format, height, width)
+    except ModelNotEnabled as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except SchedulerOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid frame: {e}")
+
+
+def parse_models(value: str | None) -> list[str]:
+    """Models from a comma-separated X-Models header; all by default."""
+    if not value:
+        return list(COMBINABLE_MODELS)
+    return [model.strip().lower() for model in value.split(",") if model.strip()]
+
+
+async def predict_models(
+    models: list[str],
+    buffer,
+    session_id: str | None = None,
+    pixel_format: str | None = None,
+    height: int = 0,
+    width: int = 0,
+) -> dict:
+    """
+    Run several models on one frame and return {model: result}.
+    The frame is decoded once and, when both models are requested,
+    they run concurrently on the same worker (the "multi" model).
+    """
+    unknown = sorted(set(models) - set(COMBINABLE_MODELS))
+    if unknown or not models:
+        raise HTTPException(
+            status_code=400,
+            detail=f"models must be a non-empty subset of {list(COMBINABLE_MODELS)}, got {models}",
+        )
+    if len(set(models)) == 1:
+        model = models[0]
+        return {model: await predict_or_http_error(model, buffer, session_id, pixel_format, height, width)}
+    return await predict_or_http_error(COMBINED_MODEL, buffer, session_id, pixel_format, height, width)
+
+
+def decode_image(image_base64: str) -> bytes:
+    """Base64 payload → encoded image bytes; malformed base64 → 400."""
+    start = time.perf_counter_ns()
+    try:
+        image_bytes = decode_base64_bytes(image_base64)
+    except ValueError as e:   # binascii.Error is a ValueError
+        raise HTTPException(status_code=400, detail=f"Invalid frame: {e}")
+    record_stage("base64", time.perf_counter_ns() - start)
+    return image_bytes
 
 
 @app.post("/predict")
 async def predict_gesture(request: PredictionRequest):
-    image = decode_base64_image(request.image_base64)
-    image_rgb = preprocess_image(image)
-    result = gesture_classifier.predict(image_rgb)
+    image_bytes = decode_image(request.image_base64)
+    result = await predict_or_http_error("gesture", image_bytes, request.session_id)
     return result
 
 
 @app.post("/predict-face")
 async def predict_face(request: PredictionRequest):
-    image = decode_base64_image(request.image_base64)
-    image_rgb = preprocess_image(image)
-    result = face_classifier.predict(image_rgb)
+    image_bytes = decode_image(request.image_base64)
+    result = await predict_or_http_error("face", image_bytes, request.session_id)
+    return result
+
+
+@app.post("/predict-multi")
+async def predict_multi(request: MultiPredictionRequest):
+    """Gesture and face predictions for one frame, decoded once."""
+    image_bytes = decode_image(request.image_base64)
+    result = await predict_models(request.models, image_bytes, request.session_id)
+    return result
+
+
+async def predict_binary_frame(model: str, request: Request) -> dict:
+    """
+    Predict on a frame sent as a binary request body.
+
+    Supported bodies:
+    - image/jpeg, image/png or application/octet-stream — encoded image bytes
+    - multipart/form-data — encoded image in the "file" field
+    - raw pixels — any body with an X-Frame-Format header (rgb, bgr, nv12)
+      and an X-Frame-Shape header of the form "<height>x<width>"
+
+    An X-Session-Id header selects streaming (tracking) mode. For the
+    combined model an X-Models header ("gesture,face") picks the models.
+    """
+    if model == COMBINED_MODEL:
+        predict = functools.partial(predict_models, parse_models(request.headers.get("x-models")))
+    else:
+        predict = functools.partial(predict_or_http_error, model)
+    session_id = request.headers.get("x-session-id")
+    content_type = request.headers.get("content-type", "")
+
+    start = time.perf_counter_ns()
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing 'file' field")
+        body = await upload.read()
+    else:
+        body = await request.body()
+    record_stage("receive", time.perf_counter_ns() - start)
+
+    pixel_format = request.headers.get("x-frame-format")
+    if not pixel_format:
+        return await predict(body, session_id)
+    try:
+        shape = request.headers.get("x-frame-shape", "")
+        height, width = (int(v) for v in shape.lower().split("x"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid frame: bad X-Frame-Shape {shape!r}")
+    return await predict(body, session_id, pixel_format.lower(), height, width)
+
+
+@app.post("/predict/binary")
+async def predict_gesture_binary(request: Request):
+    result = await predict_binary_frame("gesture", request)
+    return result
+
+
+@app.post("/predict-face/binary")
+async def predict_face_binary(request: Request):
+    result = await predict_binary_frame("face", request)
+    return result
+
+
+@app.post("/predict-multi/binary")
+async def predict_multi_binary(request: Request):
+    result = await predict_binary_frame(COMBINED_MODEL, request)
     return result
 
 
+@app.websocket("/stream")
+async def stream(websocket: WebSocket):
+    """
+    Persistent bidirectional stream for the backend.
+
+    Frames arrive as binary messages (see app.utils.stream_protocol)
+    and are processed concurrently, so one connection can multiplex
+    many client sessions. Each reply carries the frame's sequence
+    number because replies may come back out of order.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    pending: set[asyncio.Task] = set()
+
+    async def reply(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def handle_frame(message: bytes):
+        # Echoed in error replies too, so the sender fails fast instead of timing out
+        seq = peek_seq(message)
+        # Each frame is its own task, so the timer stays with this frame
+        timer = StageTimer("/stream")
+        current_timer.set(timer)
+        try:
+            seq, model, pixel_format, height, width, session_id, payload = parse_frame_message(message)
+            result = await predict_frame(model, payload, session_id, pixel_format, height, width)
+            start = time.perf_counter_ns()
+            await reply({"seq": seq, "result": result})
+            timer.since("send", start)
+        except Exception as e:
+            try:
+                await reply({"seq": seq, "error": str(e)})
+            except Exception:
+                pass
+        finally:
+            timer.finish()
+
+    async def handle_control(text: str):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if message.get("type") == "end_session":
+            session_id = message.get("session_id", "")
+            ended = await worker_pool.end_session(session_id)
+            await reply({"type": "session_ended", "session_id": session_id, "ended": ended})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                task = asyncio.create_task(handle_frame(message["bytes"]))
+            elif message.get("text"):
+                task = asyncio.create_task(handle_control(message["text"]))
+            else:
+                continue
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+@app.delete("/sessions/{session_id}")
+async def end_session(session_id: str):
+    """Release a streaming session's tracking classifiers."""
+    return {"session_id": session_id, "ended": await worker_pool.end_session(session_id)}
+
+
+def model_health() -> dict:
+    loaded = worker_pool.loaded_models()
+    return {
+        model: {
+            "status": status,
+            "ready": status in READY_STATES,
+            "workers_loaded": loaded.get(model, 0),
+        }
+        for model, status in model_status.items()
+    }
+
+
+def is_ready(model: str | None = None) -> bool:
+    if model is not None:
+        return model_status[model] in READY_STATES
+    return worker_pool.is_running and all(
+        model_status[model] in READY_STATES for model in settings.ENABLED_MODELS
+    )
+
+
 @app.get("/health")
 async def health_check():
+    """Liveness: answers as soon as the process serves HTTP, warm or not."""
+    models = model_health()
     return {
         "status": "healthy",
-        "gesture_model_loaded": gesture_classifier is not None,
-        "face_model_loaded": face_classifier is not None,
+        "ready": is_ready(),
+        "gesture_model_loaded": models["gesture"]["workers_loaded"] > 0,
+        "face_model_loaded": models["face"]["workers_loaded"] > 0,
+        "models": models,
+        "worker_mode": worker_pool.mode,
+        "workers": worker_pool.health(),
+    }
+
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness: 200 once every enabled model is warm, 503 until then."""
+    ready = is_ready()
+    if not ready:
+        response.status_code = 503
+    return {"ready": ready, "models": model_health()}
+
+
+@app.get("/ready/{model}")
+async def model_readiness_check(model: str, response: Response):
+    """Readiness of one model — 503 while it warms up or if it is disabled."""
+    if model not in model_status:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {model}")
+    ready = is_ready(model)
+    if not ready:
+        response.status_code = 503
+    return {"model": model, "ready": ready, **model_health()[model]}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics, including per-stage latency histograms."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# ─── Profiling ───────────────────────────────────────────────────────────────
+
+async def require_admin(x_admin_token: str | None = Header(None)):
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+admin = APIRouter(prefix="/admin/profiling", dependencies=[Depends(require_admin)])
+
+
+@admin.get("")
+async def profiling_status():
+    return {"sampler": sampling_profiler.stats(), "slow_requests": slow_requests.stats()}
+
+
+@admin.post("/sampler/start")
+async def start_sampler(interval_ms: float = settings.PROFILE_INTERVAL_MS):
+    """Sample the stacks of this process and of every worker process."""
+    if not sampling_profiler.running:
+        await worker_pool.start_profiler(interval_ms / 1000)
+        sampling_profiler.start(interval_ms / 1000)
+    return sampling_profiler.stats()
+
+
+@admin.post("/sampler/stop")
+async def stop_sampler():
+    """Stop sampling and write the collapsed stacks (flamegraph input) to PROFILE_DIR."""
+    if not sampling_profiler.running:
+        raise HTTPException(status_code=409, detail="Sampler is not running")
+    stacks = sampling_profiler.stop()
+    stacks.update(await worker_pool.stop_profiler())
+    path = dump_collapsed(stacks, Path(settings.PROFILE_DIR))
+    print(f"🔥 Wrote {sum(stacks.values())} stack samples to {path}")
+    return {**sampling_profiler.stats(), "path": str(path)}
+
+
+@admin.post("/slow-requests/start")
+async def start_slow_requests(keep: int = settings.SLOW_REQUESTS_KEEP):
+    """Start (or restart) keeping the `keep` slowest frames with their stage timings."""
+    slow_requests.start(keep)
+    return slow_requests.stats()
+
+
+@admin.get("/slow-requests")
+async def list_slow_requests():
+    return slow_requests.entries()
+
+
+@admin.post("/slow-requests/stop")
+async def stop_slow_requests():
+    """Stop recording and write the frames kept to PROFILE_DIR for replay."""
+    if not slow_requests.enabled:
+        raise HTTPException(status_code=409, detail="Slow request recorder is not running")
+    slow_requests.stop()
+    path = slow_requests.dump(Path(settings.PROFILE_DIR))
+    return {**slow_requests.stats(), "path": str(path)}
+
+
+# Fail closed: the recorder captures users' frames, so without a token
+# the endpoints don't exist
+if settings.ADMIN_TOKEN:
+    app.include_router(admin)
+
+
+@app.get("/stats")
+async def get_stats():
+    """Scheduler, streaming session and result cache metrics."""
+    return {
+        "scheduler": scheduler.stats(),
+        "sessions": worker_pool.session_stats(),
+        "result_cache": result_cache.stats() if result_cache is not None else None,
     }
\ No newline at end of file
@@ -1,23 +1,108 @@
 import time
-import mediapipe as mp
 import numpy as np
 
+from app.utils.image_processor import RegionOfInterest
+
+NUM_FACE_LANDMARKS = 468
+
+# Key facial landmarks
+NOSE_TIP = 1
+LEFT_EYE = 33
+RIGHT_EYE = 263
+UPPER_LIP = 13
+LOWER_LIP = 14
+
+DIRECTIONS = ("center", "left", "right", "up", "down")
+
+
+def landmarks_to_array(landmarks) -> np.ndarray:
+    """Copy MediaPipe face landmarks into a contiguous (468, 3) float32 array once."""
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmarks], dtype=np.float32)
+
+
+def classify_face_landmarks(points: np.ndarray) -> list[dict]:
+    """
+    Head direction and mouth state for N faces shaped (N, 468, 3),
+    computed in one vectorized pass.
+    """
+    points = np.asarray(points, dtype=np.float32).reshape(-1, NUM_FACE_LANDMARKS, 3)
+    # Promote only the handful of landmarks we use, so the thresholds
+    # see the same double-precision values as per-attribute access did
+    key = points[:, [NOSE_TIP, LEFT_EYE, RIGHT_EYE, UPPER_LIP, LOWER_LIP], :2].astype(np.float64)
+    nose, left_eye, right_eye, upper_lip, lower_lip = (key[:, i] for i in range(5))
+
+    # Detect head direction based on nose position relative to eye center
+    face_center = (left_eye + right_eye) / 2
+    nose_offset_x = nose[:, 0] - face_center[:, 0]
+    nose_offset_y = nose[:, 1] - face_center[:, 1]
+
+    # Vertical direction (up/down) takes precedence over horizontal
+    up = nose_offset_y < -0.03
+    down = nose_offset_y > 0.02
+    left = nose_offset_x < -0.02
+    right = nose_offset_x > 0.02
+    vertical = up | down
+    horizontal = left | right
+
+    direction = np.select([up, down, left, right], [3, 4, 1, 2], default=0)
+    offset = np.where(vertical, np.abs(nose_offset_y), np.abs(nose_offset_x))
+    confidence = np.where(vertical | horizontal, np.minimum(0.95, 0.7 + offset * 5), 0.7)
+
+    # Detect mouth open
+    mouth_open = np.abs(upper_lip[:, 1] - lower_lip[:, 1]) > 0.02
+
+    return [
+        {
+            "direction": DIRECTIONS[d],
+            "mouth_open": m,
+            "confidence": round(c, 2),
+        }
+        for d, m, c in zip(direction.tolist(), mouth_open.tolist(), confidence.tolist())
+    ]
+
 
 class FaceClassifier:
-    def __init__(self):
+    def __init__(self, static_image_mode: bool = True):
+        """
+        static_image_mode=False tracks the face between frames of one
+        video stream instead of running face detection every frame.
+        """
+        # Lazy import, as in GestureClassifier
+        import mediapipe as mp
+
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=True,
+            static_image_mode=static_image_mode,
             max_num_faces=1,
             min_detection_confidence=0.7,
         )
 
-    def predict(self, image_rgb: np.ndarray) -> dict:
-        start_time = time.time()
-        results = self.face_mesh.process(image_rgb)
-        latency_ms = (time.time() - start_time) * 1000
+    def _detect(
+        self, image_rgb: np.ndarray, roi: RegionOfInterest | None = None
+    ) -> tuple[np.ndarray | None, float]:
+        """
+        Run MediaPipe; returns the (468, 3) landmarks (or None) and latency.
+        With a RegionOfInterest only the crop around the previous
+        detection is processed; landmarks are mapped back to the frame.
+        """
+        frame = roi.crop(image_rgb) if roi is not None else image_rgb
+
+        start_ns = time.perf_counter_ns()
+        results = self.face_mesh.process(frame)
+        latency_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
 
-        if not results.multi_face_landmarks:
+        points = None
+        if results.multi_face_landmarks:
+            points = landmarks_to_array(results.multi_face_landmarks[0].landmark)
+        if roi is not None:
+            if points is not None:
+                points = roi.to_frame_coords(points, image_rgb.shape)
+            roi.update(points, image_rgb.shape)
+        return points, latency_ms
+
+    @staticmethod
+    def _result(face: dict | None, latency_ms: float) -> dict:
+        if face is None:
             return {
                 "direction": "no_face",
                 "mouth_open": False,
@@ -26,53 +111,30 @@ class FaceClassifier:
                 "face_detected": False,
             }
 
-        landmarks = results.multi_face_landmarks[0].landmark
-
-        # Key facial landmarks
-        nose_tip = landmarks[1]
-        left_eye = landmarks[33]
-        right_eye = landmarks[263]
-        upper_lip = landmarks[13]
-        lower_lip = landmarks[14]
-
-        # Calculate face center
-        face_center_x = (left_eye.x + right_eye.x) / 2
-        face_center_y = (left_eye.y + right_eye.y) / 2
-
-        # Detect head direction based on nose position relative to eye center
-        nose_offset_x = nose_tip.x - face_center_x
-        nose_offset_y = nose_tip.y - face_center_y
-
-        direction = "center"
-        confidence = 0.7
-
-        # Horizontal direction (left/right)
-        if nose_offset_x < -0.02:
-            direction = "left"
-            confidence = min(0.95, 0.7 + abs(nose_offset_x) * 5)
-        elif nose_offset_x > 0.02:
-            direction = "right"
-            confidence = min(0.95, 0.7 + abs(nose_offset_x) * 5)
-
-        # Vertical direction (up/down)
-        if nose_offset_y < -0.03:
-            direction = "up"
-            confidence = min(0.95, 0.7 + abs(nose_offset_y) * 5)
-        elif nose_offset_y > 0.02:
-            direction = "down"
-            confidence = min(0.95, 0.7 + abs(nose_offset_y) * 5)
-
-        # Detect mouth open
-        mouth_distance = abs(upper_lip.y - lower_lip.y)
-        mouth_open = mouth_distance > 0.02
-
         return {
-            "direction": direction,
-            "mouth_open": mouth_open,
-            "confidence": round(confidence, 2),
+            **face,
             "latency_ms": round(latency_ms, 2),
             "face_detected": True,
         }
 
+    def predict(self, image_rgb: np.ndarray, roi: RegionOfInterest | None = None) -> dict:
+        points, latency_ms = self._detect(image_rgb, roi)
+        face = classify_face_landmarks(points)[0] if points is not None else None
+        return self._result(face, latency_ms)
+
+    def predict_batch(self, images_rgb: list) -> list:
+        """
+        Run predict on several frames; results keep the input order.
+        Detection is per frame, classification is one vectorized call.
+        """
+        detections = [self._detect(image_rgb) for image_rgb in images_rgb]
+        found = [points for points, _ in detections if points is not None]
+        faces = iter(classify_face_landmarks(np.stack(found)) if found else [])
+
+        return [
+            self._result(next(faces) if points is not None else None, latency_ms)
+            for points, latency_ms in detections
+        ]
+
     def close(self):
-        self.face_mesh.close()
\ No newline at end of file
+        self.face_mesh.close()
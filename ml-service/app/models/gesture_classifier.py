@@ -1,115 +1,168 @@
 import time
-import mediapipe as mp
 import numpy as np
 
+from app.utils.image_processor import RegionOfInterest
 
-class GestureClassifier:
-    def __init__(self):
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=True,
-            max_num_hands=1,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5,
-        )
+NUM_HAND_LANDMARKS = 21
 
-    def _get_finger_states(self, landmarks):
-        """
-        Returns which fingers are up/extended.
-        Returns: [thumb, index, middle, ring, pinky] — True = up
-        """
-        fingers = []
+# Landmark indices used for finger states
+THUMB_TIP, THUMB_IP = 4, 3
+INDEX_MCP, PINKY_MCP = 5, 17
+FINGER_TIPS = [8, 12, 16, 20]
+FINGER_PIPS = [6, 10, 14, 18]
+
+# Bit weights for [thumb, index, middle, ring, pinky] → 0..31
+FINGER_BITS = np.array([1, 2, 4, 8, 16], dtype=np.uint8)
+
+
+def _classify_finger_states(f: list) -> tuple[str, float]:
+    """
+    Gesture rules for one finger-state combination.
+    Only used to build GESTURE_TABLE — classification itself is a lookup.
+    """
+    count = sum(f)
+
+    # ── Specific gestures first ──────────────────────
+    # Fist: all fingers closed
+    if count == 0:
+        return "fist", 0.96
+
+    # Open hand: all fingers open
+    if count == 5:
+        return "open_hand", 0.95
+
+    # Pointing: only index up
+    if f == [False, True, False, False, False]:
+        return "pointing", 0.94
+
+    # Peace/Victory: index + middle up
+    if f == [False, True, True, False, False]:
+        return "peace", 0.93
+
+    # Thumbs up: only thumb up
+    if f == [True, False, False, False, False]:
+        return "thumbs_up", 0.94
 
-        # Thumb — compare tip x vs IP joint x
-        # Works for both left and right hand
-        thumb_tip = landmarks[4]
-        thumb_ip = landmarks[3]
-        thumb_mcp = landmarks[2]
-        wrist = landmarks[0]
+    # Thumbs down: thumb down, others closed
+    if f == [False, False, False, False, False]:
+        return "fist", 0.90
 
-        # Detect if hand is left or right based on wrist vs middle finger base
-        hand_facing_right = landmarks[17].x < landmarks[5].x
+    # Pinky/Call me: thumb + pinky up
+    if f == [True, False, False, False, True]:
+        return "pinky", 0.91
 
-        if hand_facing_right:
-            thumb_up = thumb_tip.x > thumb_ip.x
-        else:
-            thumb_up = thumb_tip.x < thumb_ip.x
+    # Rock: index + pinky up
+    if f == [False, True, False, False, True]:
+        return "rock", 0.92
 
-        fingers.append(thumb_up)
+    # Three fingers: index + middle + ring
+    if f == [False, True, True, True, False]:
+        return "three", 0.89
 
-        # Other 4 fingers — tip y vs PIP joint y (up = smaller y)
-        tips = [8, 12, 16, 20]
-        pips = [6, 10, 14, 18]
+    # Four fingers: all except thumb
+    if f == [False, True, True, True, True]:
+        return "four", 0.88
 
-        for tip, pip in zip(tips, pips):
-            fingers.append(landmarks[tip].y < landmarks[pip].y)
+    # OK sign approximation: thumb + index up, others closed
+    if f == [True, True, False, False, False]:
+        return "ok", 0.85
 
-        return fingers  # [thumb, index, middle, ring, pinky]
+    # ── Fallback ─────────────────────────────────────
+    if count == 1:
+        return "pointing", 0.70
+    if count >= 4:
+        return "open_hand", 0.75
 
-    def _classify(self, landmarks):
-        f = self._get_finger_states(landmarks)
-        thumb, index, middle, ring, pinky = f
-        count = sum(f)
+    return "unknown", 0.50
 
-        # ── Specific gestures first ──────────────────────
-        # Fist: all fingers closed
-        if count == 0:
-            return "fist", 0.96
 
-        # Open hand: all fingers open
-        if count == 5:
-            return "open_hand", 0.95
+# Finger-state bitmask → (gesture, confidence), precomputed for all 32 masks
+GESTURE_TABLE = [
+    _classify_finger_states([bool(mask & int(bit)) for bit in FINGER_BITS])
+    for mask in range(32)
+]
 
-        # Pointing: only index up
-        if f == [False, True, False, False, False]:
-            return "pointing", 0.94
 
-        # Peace/Victory: index + middle up
-        if f == [False, True, True, False, False]:
-            return "peace", 0.93
+def landmarks_to_array(landmarks) -> np.ndarray:
+    """Copy MediaPipe landmarks into a contiguous (21, 3) float32 array once."""
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmarks], dtype=np.float32)
 
-        # Thumbs up: only thumb up
-        if f == [True, False, False, False, False]:
-            return "thumbs_up", 0.94
 
-        # Thumbs down: thumb down, others closed
-        if f == [False, False, False, False, False]:
-            return "fist", 0.90
+def finger_states(points: np.ndarray) -> np.ndarray:
+    """
+    Which fingers are up/extended, for (21, 3) or (N, 21, 3) landmarks.
+    Returns bools shaped (..., 5): [thumb, index, middle, ring, pinky].
+    """
+    x = points[..., 0]
+    y = points[..., 1]
 
-        # Pinky/Call me: thumb + pinky up
-        if f == [True, False, False, False, True]:
-            return "pinky", 0.91
+    # Thumb — compare tip x vs IP joint x
+    # Hand orientation from pinky base vs index base, works for both hands
+    hand_facing_right = x[..., PINKY_MCP] < x[..., INDEX_MCP]
+    thumb_up = np.where(
+        hand_facing_right,
+        x[..., THUMB_TIP] > x[..., THUMB_IP],
+        x[..., THUMB_TIP] < x[..., THUMB_IP],
+    )
 
-        # Rock: index + pinky up
-        if f == [False, True, False, False, True]:
-            return "rock", 0.92
+    # Other 4 fingers — tip y vs PIP joint y (up = smaller y)
+    others_up = y[..., FINGER_TIPS] < y[..., FINGER_PIPS]
 
-        # Three fingers: index + middle + ring
-        if f == [False, True, True, True, False]:
-            return "three", 0.89
+    return np.concatenate([thumb_up[..., None], others_up], axis=-1)
 
-        # Four fingers: all except thumb
-        if f == [False, True, True, True, True]:
-            return "four", 0.88
 
-        # OK sign approximation: thumb + index up, others closed
-        if f == [True, True, False, False, False]:
-            return "ok", 0.85
+def classify_landmarks(points: np.ndarray) -> list[tuple[str, float]]:
+    """Classify N landmark sets shaped (N, 21, 3) in one vectorized pass."""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, NUM_HAND_LANDMARKS, 3)
+    masks = finger_states(points).astype(np.uint8) @ FINGER_BITS
+    return [GESTURE_TABLE[mask] for mask in masks.tolist()]
 
-        # ── Fallback ─────────────────────────────────────
-        if count == 1:
-            return "pointing", 0.70
-        if count >= 4:
-            return "open_hand", 0.75
 
-        return "unknown", 0.50
+class GestureClassifier:
+    def __init__(self, static_image_mode: bool = True):
+        """
+        static_image_mode=True runs palm detection on every frame.
+        False enables tracking: detection only runs when the hand from
+        the previous frame is lost, so use it for one video stream.
+        """
+        # Imported here, not at module level: importing MediaPipe takes
+        # seconds, paid only once a model is actually loaded
+        import mediapipe as mp
 
-    def predict(self, image_rgb: np.ndarray) -> dict:
-        start_time = time.time()
-        results = self.hands.process(image_rgb)
-        latency_ms = (time.time() - start_time) * 1000
+        self.mp_hands = mp.solutions.hands
+        self.hands = self.mp_hands.Hands(
+            static_image_mode=static_image_mode,
+            max_num_hands=1,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.5,
+        )
 
-        if not results.multi_hand_landmarks:
+    def _detect(
+        self, image_rgb: np.ndarray, roi: RegionOfInterest | None = None
+    ) -> tuple[np.ndarray | None, float]:
+        """
+        Run MediaPipe; returns the (21, 3) landmarks (or None) and latency.
+        With a RegionOfInterest only the crop around the previous
+        detection is processed; landmarks are mapped back to the frame.
+        """
+        frame = roi.crop(image_rgb) if roi is not None else image_rgb
+
+        start_ns = time.perf_counter_ns()
+        results = self.hands.process(frame)
+        latency_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
+
+        points = None
+        if results.multi_hand_landmarks:
+            points = landmarks_to_array(results.multi_hand_landmarks[0].landmark)
+        if roi is not None:
+            if points is not None:
+                points = roi.to_frame_coords(points, image_rgb.shape)
+            roi.update(points, image_rgb.shape)
+        return points, latency_ms
+
+    @staticmethod
+    def _result(gesture: tuple[str, float] | None, latency_ms: float) -> dict:
+        if gesture is None:
             return {
                 "gesture_name": "no_hand",
                 "confidence": 0.0,
@@ -117,9 +170,7 @@ class GestureClassifier:
                 "hand_detected": False,
             }
 
-        landmarks = results.multi_hand_landmarks[0].landmark
-        gesture_name, confidence = self._classify(landmarks)
-
+        gesture_name, confidence = gesture
         return {
             "gesture_name": gesture_name,
             "confidence": confidence,
@@ -127,5 +178,24 @@ class GestureClassifier:
             "hand_detected": True,
         }
 
+    def predict(self, image_rgb: np.ndarray, roi: RegionOfInterest | None = None) -> dict:
+        points, latency_ms = self._detect(image_rgb, roi)
+        gesture = classify_landmarks(points)[0] if points is not None else None
+        return self._result(gesture, latency_ms)
+
+    def predict_batch(self, images_rgb: list) -> list:
+        """
+        Run predict on several frames; results keep the input order.
+        Detection is per frame, classification is one vectorized call.
+        """
+        detections = [self._detect(image_rgb) for image_rgb in images_rgb]
+        found = [points for points, _ in detections if points is not None]
+        gestures = iter(classify_landmarks(np.stack(found)) if found else [])
+
+        return [
+            self._result(next(gestures) if points is not None else None, latency_ms)
+            for points, latency_ms in detections
+        ]
+
     def close(self):
-        self.hands.close()
\ No newline at end of file
+        self.hands.close()
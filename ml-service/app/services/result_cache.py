@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+CACHE_MODES = ("exact", "perceptual")
+
+# dHash grid: HASH_SIZE x HASH_SIZE brightness gradients → 256-bit key
+HASH_SIZE = 16
+
+
+def frame_dhash(buffer) -> bytes | None:
+    """
+    Difference hash of an encoded frame, or None if it cannot be decoded.
+
+    The frame is decoded straight to 1/8-size grayscale (much cheaper
+    than a full decode), shrunk to (HASH_SIZE + 1) x HASH_SIZE, and each
+    bit records whether a pixel is brighter than its right neighbour.
+    Re-encodes and sensor noise leave the bits unchanged, while a hand
+    moving or changing shape flips some of them.
+    """
+    np_array = np.frombuffer(buffer, dtype=np.uint8)
+    if np_array.size == 0:
+        return None
+    gray = cv2.imdecode(np_array, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        return None
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes()
+
+
+class ResultCache:
+    """
+    Bounded LRU of prediction results keyed by frame content.
+
+    Lookups happen before decoding, so a hit skips both the decode and
+    the inference. "exact" keys on a BLAKE2b digest of the frame bytes;
+    "perceptual" keys encoded frames on their dHash, so near-identical
+    frames (a static camera, re-encoded retries) share a result. Entries
+    expire after ttl_s so a slowly changing scene is re-evaluated.
+
+    All methods are thread-safe.
+    """
+
+    def __init__(self, mode: str = "exact", max_entries: int = 1024, ttl_s: float = 1.0):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown result cache mode: {mode}")
+        self.mode = mode
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # ─── Metrics ─────────────────────────────────────
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, model: str, buffer, variant: str = "") -> bytes | None:
+        """
+        Cache key for a frame. variant distinguishes raw pixel layouts
+        (format and shape); raw frames always use the exact digest.
+        Returns None when the frame cannot be hashed.
+        """
+        prefix = f"{model}:{variant}:".encode()
+        if self.decodes(variant):
+            digest = frame_dhash(buffer)
+            return prefix + digest if digest is not None else None
+        return prefix + hashlib.blake2b(buffer, digest_size=16).digest()
+
+    def decodes(self, variant: str = "") -> bool:
+        """Whether key() decodes the frame (perceptual keys of encoded frames)."""
+        return self.mode == "perceptual" and not variant
+
+    def get(self, key: bytes) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] >= self.ttl_s:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(entry[1])
+
+    def put(self, key: bytes, result: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def create_result_cache(mode: str, max_entries: int = 1024, ttl_s: float = 1.0) -> ResultCache | None:
+    """Build the cache selected by the RESULT_CACHE_MODE setting ("off" disables it)."""
+    if not mode or mode == "off":
+        return None
+    return ResultCache(mode=mode, max_entries=max_entries, ttl_s=ttl_s)
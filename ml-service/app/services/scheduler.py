@@ -0,0 +1,198 @@
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.services.worker_pool import TIMINGS_KEY
+from app.utils.image_processor import FrameData
+
+
+class SchedulerOverloaded(Exception):
+    """The queue is past the admission limit; the caller should back off."""
+
+
+@dataclass
+class InferenceJob:
+    """One frame waiting for a prediction (decoded, or FrameData to decode)."""
+    model: str
+    image: np.ndarray | FrameData
+    future: asyncio.Future
+    session_id: str | None = None
+    enqueued_ns: int = field(default_factory=time.perf_counter_ns)
+
+
+class BatchScheduler:
+    """
+    Micro-batching stage between the HTTP handlers and the worker pool.
+
+    Handlers await submit(); the scheduler collects concurrent jobs
+    into batches of at most max_batch_size, waiting at most max_wait_us
+    for a batch to fill, and only forms a new batch when the pool has
+    room for it (pool.capacity batches in flight). Under light load a
+    frame is dispatched almost immediately; under heavy load jobs pile
+    up while workers are busy and batches grow, trading a little
+    latency for throughput.
+
+    Admission control: once max_queue jobs are waiting, submit() fails
+    fast with SchedulerOverloaded instead of queueing (0 = no limit),
+    so overload turns into quick 503s rather than ever-growing latency.
+    """
+
+    def __init__(
+        self,
+        pool,
+        max_batch_size: int = 8,
+        max_wait_us: int = 2000,
+        max_queue: int = 0,
+    ):
+        self.pool = pool
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_us) / 1_000_000
+        self.max_queue = max(0, max_queue)
+        self._queue: asyncio.Queue[InferenceJob] | None = None
+        self._free_workers: asyncio.Semaphore | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+        # ─── Metrics ─────────────────────────────────────
+        self.batch_sizes: Counter = Counter()
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.jobs_rejected = 0
+        self.max_queue_depth = 0
+        self.total_queue_wait_ms = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._free_workers = asyncio.Semaphore(self.pool.capacity)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        # Fail anything still waiting so no handler hangs on shutdown
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("Scheduler stopped"))
+
+    async def submit(
+        self, model: str, image: np.ndarray | FrameData, session_id: str | None = None
+    ) -> dict:
+        """
+        Queue one frame and wait for its prediction. Frames with a
+        session_id run on that session's tracking classifier. FrameData
+        is decoded on the worker; a frame that fails to decode raises
+        ValueError here.
+        """
+        if self._task is None:
+            raise RuntimeError("Scheduler is not running")
+        if self.max_queue and self._queue.qsize() >= self.max_queue:
+            self.jobs_rejected += 1
+            raise SchedulerOverloaded(f"Inference queue is full ({self.max_queue} frames waiting)")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(
+            InferenceJob(model=model, image=image, future=future, session_id=session_id)
+        )
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._free_workers.acquire()
+            try:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                self._free_workers.release()
+                raise
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list[InferenceJob]):
+        try:
+            dispatched_ns = time.perf_counter_ns()
+            self.batch_sizes[len(batch)] += 1
+            self.total_queue_wait_ms += sum(dispatched_ns - job.enqueued_ns for job in batch) / 1_000_000
+
+            # A batch may mix models — run each model's frames together
+            by_model: dict[str, list[InferenceJob]] = {}
+            for job in batch:
+                by_model.setdefault(job.model, []).append(job)
+
+            for model, jobs in by_model.items():
+                try:
+                    submitted_ns = time.perf_counter_ns()
+                    results = await self.pool.submit(
+                        model,
+                        [job.image for job in jobs],
+                        [job.session_id for job in jobs],
+                    )
+                    worker_ns = time.perf_counter_ns() - submitted_ns
+                except Exception as e:
+                    self.jobs_failed += len(jobs)
+                    for job in jobs:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+                    continue
+                for job, result in zip(jobs, results):
+                    if isinstance(result, Exception):
+                        self.jobs_failed += 1
+                        if not job.future.done():
+                            job.future.set_exception(result)
+                        continue
+                    self.jobs_completed += 1
+                    if TIMINGS_KEY in result:
+                        # Round trip to the pool, on top of the worker's own stages
+                        result[TIMINGS_KEY]["queue"] = submitted_ns - job.enqueued_ns
+                        result[TIMINGS_KEY]["worker"] = worker_ns
+                    if not job.future.done():
+                        job.future.set_result(result)
+        finally:
+            self._free_workers.release()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        jobs = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "batches_dispatched": batches,
+            "batches_in_flight": len(self._inflight),
+            "avg_batch_size": round(jobs / batches, 2) if batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "avg_queue_wait_ms": round(self.total_queue_wait_ms / jobs, 3) if jobs else 0.0,
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "jobs_rejected": self.jobs_rejected,
+            "max_queue": self.max_queue,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_us": int(self.max_wait * 1_000_000),
+        }
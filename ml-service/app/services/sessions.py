@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from app.models.gesture_classifier import GestureClassifier
+from app.models.face_classifier import FaceClassifier
+from app.utils.image_processor import RegionOfInterest
+
+TRACKING_CLASSIFIERS = {
+    "gesture": GestureClassifier,
+    "face": FaceClassifier,
+}
+
+
+class SessionClosed(RuntimeError):
+    """The session was ended or evicted and its graphs are closed."""
+
+
+class TrackingSession:
+    """
+    Tracking-mode classifiers for one live video stream.
+
+    With static_image_mode=False MediaPipe only runs the expensive
+    palm/face detector when it has no landmarks to track from the
+    previous frame; consecutive frames reuse the tracked region.
+    Frames of a session must be processed one at a time and in order,
+    so callers hold `lock` around predict() — SessionStore.locked()
+    does that and never hands out a session that was closed meanwhile.
+
+    With roi_margin > 0 each model also gets a RegionOfInterest, so
+    only the area around the previous detection is processed.
+    """
+
+    def __init__(self, session_id: str, roi_margin: float = 0.0):
+        self.session_id = session_id
+        self.roi_margin = roi_margin
+        self.lock = threading.Lock()
+        self.classifiers: dict = {}
+        self.rois: dict[str, RegionOfInterest] = {}
+        self.last_used = time.monotonic()
+        self.frames = 0
+        self.closed = False
+
+    def predict(self, model: str, image_rgb) -> dict:
+        """Track one frame; hold `lock` while calling this."""
+        if self.closed:
+            raise SessionClosed(self.session_id)
+        roi = None
+        if self.roi_margin > 0:
+            roi = self.rois.get(model)
+            if roi is None:
+                roi = self.rois[model] = RegionOfInterest(margin=self.roi_margin)
+        return self.get_classifier(model).predict(image_rgb, roi=roi)
+
+    def get_classifier(self, model: str):
+        if self.closed:
+            # A graph built now would never be closed
+            raise SessionClosed(self.session_id)
+        classifier = self.classifiers.get(model)
+        if classifier is None:
+            classifier = TRACKING_CLASSIFIERS[model](static_image_mode=False)
+            self.classifiers[model] = classifier
+        return classifier
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            for classifier in self.classifiers.values():
+                classifier.close()
+            self.classifiers.clear()
+
+
+class SessionStore:
+    """
+    Bounded LRU of TrackingSessions with idle-time expiry.
+
+    Each session holds its own MediaPipe graphs, so the store caps how
+    many exist at once: the least recently used session is evicted when
+    max_sessions is reached, and sessions idle for longer than ttl_s
+    are dropped whenever the store is touched.
+    """
+
+    def __init__(self, max_sessions: int = 64, ttl_s: float = 30.0, roi_margin: float = 0.0):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl_s = ttl_s
+        self.roi_margin = roi_margin
+        self._sessions: OrderedDict[str, TrackingSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # ─── Metrics ─────────────────────────────────────
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.ended = 0
+
+    def get(self, session_id: str) -> TrackingSession:
+        """Return the session, creating it (and evicting others) if needed."""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            evicted.extend(self._expire(now))
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = TrackingSession(session_id, roi_margin=self.roi_margin)
+                self._sessions[session_id] = session
+                self.created += 1
+                while len(self._sessions) > self.max_sessions:
+                    _, oldest = self._sessions.popitem(last=False)
+                    evicted.append(oldest)
+                    self.evicted_lru += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+
+        # Closing MediaPipe graphs is slow — do it outside the store lock
+        for old in evicted:
+            old.close()
+        return session
+
+    @contextmanager
+    def locked(self, session_id: str):
+        """
+        The session with its lock held. A session evicted between get()
+        and taking its lock is closed by then, so fetch a fresh one.
+        """
+        while True:
+            session = self.get(session_id)
+            with session.lock:
+                if not session.closed:
+                    yield session
+                    return
+
+    def _expire(self, now: float) -> list[TrackingSession]:
+        expired = []
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used < self.ttl_s:
+                break
+            self._sessions.popitem(last=False)
+            expired.append(session)
+            self.evicted_ttl += 1
+        return expired
+
+    def end(self, session_id: str) -> bool:
+        """Close a session explicitly, e.g. when its client disconnects."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.ended += 1
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._sessions),
+            "created": self.created,
+            "evicted_lru": self.evicted_lru,
+            "evicted_ttl": self.evicted_ttl,
+            "ended": self.ended,
+        }
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,878 @@
+import asyncio
+import dataclasses
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.core.profiling import SamplingProfiler
+from app.models.gesture_classifier import GestureClassifier
+from app.models.face_classifier import FaceClassifier
+from app.services.sessions import SessionStore
+from app.utils.image_processor import FrameData
+
+# "multi" runs gesture and face on the same decoded frame and
+# returns {"gesture": ..., "face": ...}
+COMBINED_MODEL = "multi"
+MODELS = ("gesture", "face", COMBINED_MODEL)
+# Result key carrying per-stage durations (ns) back to the service,
+# which removes it before the result is cached or returned
+TIMINGS_KEY = "_timings"
+# Messages for worker processes that are not a batch of frames
+CONTROL_COMMANDS = ("end_session", "profile_start", "profile_stop", "warm_up")
+
+STATIC_CLASSIFIERS = {
+    "gesture": GestureClassifier,
+    "face": FaceClassifier,
+}
+# Blank frame warm-up runs through, so MediaPipe initialises each graph
+# before the first real frame rather than during it
+WARMUP_FRAME_SHAPE = (240, 320, 3)
+
+
+class ModelNotEnabled(LookupError):
+    """The model is not in this replica's ENABLED_MODELS."""
+
+
+def _resolve_workers(num_workers: int) -> int:
+    """0 or less means one worker per CPU core."""
+    if num_workers <= 0:
+        return os.cpu_count() or 1
+    return num_workers
+
+
+class LazyClassifiers(dict):
+    """
+    One worker's static classifiers, each built the first time its
+    model is used, so a model that is never asked for never loads.
+    """
+
+    def __init__(self, enabled_models):
+        super().__init__()
+        self.enabled_models = tuple(enabled_models)
+
+    def __missing__(self, model: str):
+        if model not in self.enabled_models:
+            raise ModelNotEnabled(f"Model '{model}' is not enabled")
+        classifier = self[model] = STATIC_CLASSIFIERS[model]()
+        return classifier
+
+
+def _warm_up(classifiers: LazyClassifiers, models) -> list[str]:
+    """Load each model and run it once; returns the models now loaded."""
+    frame = np.zeros(WARMUP_FRAME_SHAPE, dtype=np.uint8)
+    for model in models:
+        classifiers[model].predict(frame)
+    return sorted(classifiers)
+
+
+def _check_models(enabled_models) -> tuple:
+    unknown = set(enabled_models) - set(STATIC_CLASSIFIERS)
+    if unknown:
+        raise ValueError(f"Unknown models {sorted(unknown)}; choose from {list(STATIC_CLASSIFIERS)}")
+    return tuple(enabled_models)
+
+
+def _predict_frames(
+    classifiers: dict,
+    sessions: SessionStore,
+    model: str,
+    frames: list,
+    session_ids: list | None,
+    companion: ThreadPoolExecutor | None = None,
+) -> list:
+    """
+    Decode any FrameData in the batch, then run it through the shared
+    static classifier, except frames tagged with a session id, which go
+    through that session's tracking classifier one at a time.
+
+    For COMBINED_MODEL each frame is decoded once and the face model
+    runs on the companion thread while this thread runs the gesture
+    model (MediaPipe releases the GIL, so the two overlap).
+
+    A frame that cannot be decoded gets its ValueError as its result
+    instead of failing the whole batch.
+    """
+    results = [None] * len(frames)
+    timings = [{} for _ in frames]
+    images = {}
+    for i, frame in enumerate(frames):
+        if isinstance(frame, FrameData):
+            start = time.perf_counter_ns()
+            try:
+                frame = frame.decode()
+            except ValueError as e:
+                # Drop the traceback: its frames would keep the frame buffer
+                # (a view into the shared-memory arena) alive
+                results[i] = e.with_traceback(None)
+                continue
+            timings[i]["decode"] = time.perf_counter_ns() - start
+        images[i] = frame
+
+    session_ids = session_ids or [None] * len(frames)
+    static = [i for i in images if not session_ids[i]]
+    if static:
+        static_images = [images[i] for i in static]
+        if model == COMBINED_MODEL:
+            (gestures, gesture_ns), (faces, face_ns) = _in_parallel(
+                companion,
+                lambda: _timed(classifiers["gesture"].predict_batch, static_images),
+                lambda: _timed(classifiers["face"].predict_batch, static_images),
+            )
+            for i, gesture, face in zip(static, gestures, faces):
+                results[i] = {"gesture": gesture, "face": face}
+                _add_model_timings(timings[i], "gesture", gesture, gesture_ns // len(static))
+                _add_model_timings(timings[i], "face", face, face_ns // len(static))
+        else:
+            static_results, batch_ns = _timed(classifiers[model].predict_batch, static_images)
+            for i, result in zip(static, static_results):
+                results[i] = result
+                _add_model_timings(timings[i], model, result, batch_ns // len(static))
+
+    for i, image in images.items():
+        session_id = session_ids[i]
+        if not session_id:
+            continue
+        with sessions.locked(session_id) as session:
+            # Per frame, not per model — a multi frame runs two predicts
+            session.frames += 1
+            if model == COMBINED_MODEL:
+                (gesture, gesture_ns), (face, face_ns) = _in_parallel(
+                    companion,
+                    lambda: _timed(session.predict, "gesture", image),
+                    lambda: _timed(session.predict, "face", image),
+                )
+                results[i] = {"gesture": gesture, "face": face}
+                _add_model_timings(timings[i], "gesture", gesture, gesture_ns)
+                _add_model_timings(timings[i], "face", face, face_ns)
+            else:
+                results[i], model_ns = _timed(session.predict, model, image)
+                _add_model_timings(timings[i], model, results[i], model_ns)
+
+    for result, frame_timings in zip(results, timings):
+        if isinstance(result, dict):
+            result[TIMINGS_KEY] = frame_timings
+    return results
+
+
+def _timed(fn, *args) -> tuple:
+    """fn(*args) and how long it took, in ns."""
+    start = time.perf_counter_ns()
+    result = fn(*args)
+    return result, time.perf_counter_ns() - start
+
+
+def _add_model_timings(timings: dict, model: str, result: dict, model_ns: int):
+    """Split a model's time into MediaPipe and everything around it."""
+    mediapipe_ns = int(result.get("latency_ms", 0) * 1_000_000)
+    timings[f"{model}.mediapipe"] = mediapipe_ns
+    timings[f"{model}.classify"] = max(0, model_ns - mediapipe_ns)
+
+
+def _in_parallel(companion: ThreadPoolExecutor | None, first, second) -> tuple:
+    """Run second() on the companion thread while first() runs here."""
+    if companion is None:
+        return first(), second()
+    future = companion.submit(second)
+    try:
+        return first(), future.result()
+    finally:
+        # Never return while second() may still use the classifiers
+        future.exception()
+
+
+class ThreadWorkerPool:
+    """
+    Pool of inference threads, each owning its own classifiers.
+
+    MediaPipe graphs are not re-entrant, so instead of sharing one
+    Hands/FaceMesh instance every worker thread builds its own, the
+    first time it runs that model (or during warm_up). MediaPipe
+    releases the GIL while a graph runs, so several workers make real
+    progress in parallel.
+    """
+
+    mode = "thread"
+
+    def __init__(
+        self,
+        num_workers: int = 2,
+        max_sessions: int = 64,
+        session_ttl_s: float = 30.0,
+        roi_margin: float = 0.0,
+        enabled_models=tuple(STATIC_CLASSIFIERS),
+    ):
+        self.num_workers = _resolve_workers(num_workers)
+        self.enabled_models = _check_models(enabled_models)
+        # Tracking sessions are shared by all threads; a session's lock
+        # keeps its frames from running on two threads at once.
+        self.sessions = SessionStore(
+            max_sessions=max_sessions, ttl_s=session_ttl_s, roi_margin=roi_margin
+        )
+        self._executor: ThreadPoolExecutor | None = None
+        # One helper thread per worker for the face half of "multi" frames
+        self._companion: ThreadPoolExecutor | None = None
+        self._local = threading.local()
+        self._classifiers: list[LazyClassifiers] = []
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        """How many batches the scheduler may have in flight at once."""
+        return self.num_workers
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.num_workers,
+            thread_name_prefix="inference",
+            initializer=self._init_worker,
+        )
+        self._companion = ThreadPoolExecutor(
+            max_workers=self.num_workers, thread_name_prefix="inference-companion"
+        )
+
+    async def warm_up(self, models):
+        """Load the models on every worker thread and run each once."""
+        # The barrier holds each task until all are running, which
+        # forces one task onto every thread
+        barrier = threading.Barrier(self.num_workers)
+
+        def warm():
+            barrier.wait()
+            _warm_up(self._get_classifiers(), models)
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self._executor, warm) for _ in range(self.num_workers))
+        )
+
+    def _init_worker(self):
+        self._get_classifiers()
+
+    def _get_classifiers(self) -> LazyClassifiers:
+        classifiers = getattr(self._local, "classifiers", None)
+        if classifiers is None:
+            classifiers = LazyClassifiers(self.enabled_models)
+            self._local.classifiers = classifiers
+            with self._lock:
+                self._classifiers.append(classifiers)
+                self._threads.append(threading.current_thread())
+        return classifiers
+
+    def loaded_models(self) -> dict[str, int]:
+        """How many workers have each model loaded."""
+        with self._lock:
+            return {
+                model: sum(model in classifiers for classifiers in self._classifiers)
+                for model in self.enabled_models
+            }
+
+    def _run_batch(self, model: str, images: list, session_ids: list | None) -> list:
+        return _predict_frames(
+            self._get_classifiers(), self.sessions, model, images, session_ids, self._companion
+        )
+
+    async def submit(self, model: str, images: list, session_ids: list | None = None) -> list:
+        """
+        Run one batch of frames for a model on a worker thread.
+        session_ids, if given, tags each frame with its streaming session.
+        """
+        if model not in MODELS:
+            raise ValueError(f"Unknown model: {model}")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._run_batch, model, images, session_ids
+        )
+
+    async def end_session(self, session_id: str) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.sessions.end, session_id)
+
+    async def start_profiler(self, interval_s: float):
+        """Nothing to start: worker threads are sampled by the service's own profiler."""
+
+    async def stop_profiler(self) -> Counter:
+        return Counter()
+
+    def session_stats(self) -> dict:
+        return self.sessions.stats()
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def health(self) -> list[dict]:
+        with self._lock:
+            return [
+                {"worker": thread.name, "alive": thread.is_alive(), "models": sorted(classifiers)}
+                for thread, classifiers in zip(self._threads, self._classifiers)
+            ]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._companion is not None:
+            self._companion.shutdown(wait=True)
+            self._companion = None
+        self.sessions.close()
+        with self._lock:
+            for classifiers in self._classifiers:
+                for classifier in classifiers.values():
+                    classifier.close()
+            self._classifiers.clear()
+            self._threads.clear()
+
+
+# ─── Process Pool ────────────────────────────────────────────────────────────
+
+def _frame_from_arena(shm: shared_memory.SharedMemory, frame: tuple):
+    kind = frame[0]
+    if kind == "shm":
+        return np.ndarray(frame[2], dtype=np.uint8, buffer=shm.buf, offset=frame[1])
+    if kind == "shm_data":
+        _, offset, nbytes, spec = frame
+        return FrameData(shm.buf[offset:offset + nbytes], *spec)
+    return frame[1]
+
+
+def _worker_main(
+    worker_id: int,
+    conn,
+    shm_name: str,
+    max_sessions: int,
+    session_ttl_s: float,
+    roi_margin: float,
+    enabled_models: tuple,
+):
+    """
+    Entry point of an inference worker process.
+
+    Messages over the pipe:
+    - ("predict", model, frames, session_ids) — each frame is either
+      ("shm", offset, shape), a decoded image in the shared-memory arena
+      the front process copied it into, ("shm_data", offset, nbytes, spec),
+      undecoded bytes in the arena plus the FrameData fields to decode
+      them with, or ("inline", frame) for frames too large for the arena
+    - ("end_session", session_id)
+    - ("profile_start", interval_s) / ("profile_stop",) — sample this
+      process's stacks; profile_stop replies with the collapsed stacks
+    - ("warm_up", models) — load the models and run each once
+    - None — shut down
+    Replies are ("ok", payload, status) or ("error", message), where
+    status holds the session stats and the models loaded so far.
+    Classifiers load on first use, so the process is ready at once.
+    """
+    # The front process owns shutdown; ignore Ctrl+C sent to the group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    classifiers = LazyClassifiers(enabled_models)
+    sessions = SessionStore(max_sessions=max_sessions, ttl_s=session_ttl_s, roi_margin=roi_margin)
+    companion = ThreadPoolExecutor(max_workers=1, thread_name_prefix="companion")
+    profiler = SamplingProfiler()
+    conn.send(("ready", os.getpid()))
+
+    def status() -> dict:
+        return {"sessions": sessions.stats(), "models": sorted(classifiers)}
+
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            if message[0] == "end_session":
+                conn.send(("ok", sessions.end(message[1]), status()))
+                continue
+            if message[0] == "profile_start":
+                profiler.start(message[1])
+                conn.send(("ok", None, status()))
+                continue
+            if message[0] == "profile_stop":
+                conn.send(("ok", profiler.stop(), status()))
+                continue
+            if message[0] == "warm_up":
+                try:
+                    conn.send(("ok", _warm_up(classifiers, message[1]), status()))
+                except Exception as e:
+                    conn.send(("error", f"worker {worker_id}: {e!r}"))
+                continue
+
+            _, model, frames, session_ids = message
+            images = [_frame_from_arena(shm, frame) for frame in frames]
+            try:
+                # No local for the results: a failed frame's exception
+                # must not outlive this message (see below)
+                conn.send((
+                    "ok",
+                    _predict_frames(classifiers, sessions, model, images, session_ids, companion),
+                    status(),
+                ))
+            except Exception as e:
+                conn.send(("error", f"worker {worker_id}: {e!r}"))
+            # Views must be released before the arena can be closed
+            del images
+    except EOFError:
+        pass
+    finally:
+        profiler.stop()
+        companion.shutdown(wait=True)
+        sessions.close()
+        for classifier in classifiers.values():
+            classifier.close()
+        shm.close()
+
+
+class _Task:
+    """
+    A batch (or control message) waiting in a worker's deque.
+    Pinned tasks carry streaming-session frames and are never stolen,
+    since the session's tracking state lives in that worker's process.
+    """
+
+    __slots__ = ("model", "images", "session_ids", "pinned", "future", "loop")
+
+    def __init__(
+        self,
+        model: str,
+        images: list,
+        future: asyncio.Future,
+        loop,
+        session_ids: list | None = None,
+        pinned: bool = False,
+    ):
+        self.model = model
+        self.images = images
+        self.session_ids = session_ids
+        self.pinned = pinned
+        self.future = future
+        self.loop = loop
+
+    def _set(self, result=None, error: Exception | None = None):
+        if self.future.done():
+            return
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+
+    def resolve(self, result):
+        self.loop.call_soon_threadsafe(self._set, result)
+
+    def fail(self, error: Exception):
+        self.loop.call_soon_threadsafe(self._set, None, error)
+
+
+class _ProcessWorker:
+    """Front-side handle for one worker process."""
+
+    def __init__(self, worker_id: int, shm_bytes: int):
+        self.worker_id = worker_id
+        self.tasks: deque[_Task] = deque()
+        self.shm = shared_memory.SharedMemory(create=True, size=shm_bytes)
+        self.process = None
+        self.conn = None
+        self.pid: int | None = None
+        self.thread: threading.Thread | None = None
+
+        # ─── Health ──────────────────────────────────────
+        self.busy = False
+        self.batches_completed = 0
+        self.batches_stolen = 0
+        self.jobs_completed = 0
+        self.errors = 0
+        self.restarts = 0
+        self.last_active: float | None = None
+        self.session_stats: dict = {}
+        self.models: list[str] = []                 # Loaded in the process
+
+    def health(self) -> dict:
+        return {
+            "worker": self.worker_id,
+            "pid": self.pid,
+            "alive": self.process is not None and self.process.is_alive(),
+            "busy": self.busy,
+            "queued_batches": len(self.tasks),
+            "batches_completed": self.batches_completed,
+            "batches_stolen": self.batches_stolen,
+            "jobs_completed": self.jobs_completed,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "sessions": self.session_stats.get("active", 0),
+            "models": self.models,
+            "idle_seconds": (
+                round(time.monotonic() - self.last_active, 1)
+                if self.last_active is not None else None
+            ),
+        }
+
+
+class ProcessWorkerPool:
+    """
+    Pool of inference processes, each owning its own classifiers.
+
+    One process per worker sidesteps the GIL entirely, so a single
+    container can use every core. Frames are copied once into a
+    per-worker shared-memory arena and the process reads them as
+    zero-copy NumPy views — only small headers and result dicts
+    cross the pipe.
+
+    Every worker has its own deque of batches, serviced by a dispatcher
+    thread in the front process. submit() appends to the shortest deque;
+    a dispatcher whose deque is empty steals from the tail of the
+    longest one, so a worker stuck on a slow batch does not hold up
+    the batches queued behind it. Frames of a streaming session always
+    go to the worker chosen by hashing the session id.
+    """
+
+    mode = "process"
+
+    def __init__(
+        self,
+        num_workers: int = 2,
+        shm_mb: int = 16,
+        max_sessions: int = 64,
+        session_ttl_s: float = 30.0,
+        roi_margin: float = 0.0,
+        enabled_models=tuple(STATIC_CLASSIFIERS),
+    ):
+        self.num_workers = _resolve_workers(num_workers)
+        self.enabled_models = _check_models(enabled_models)
+        self.shm_bytes = max(1, shm_mb) * 1024 * 1024
+        # Session limits apply per worker process
+        self.max_sessions = max_sessions
+        self.session_ttl_s = session_ttl_s
+        self.roi_margin = roi_margin
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: list[_ProcessWorker] = []
+        self._cond = threading.Condition()
+        self._closing = False
+
+    @property
+    def capacity(self) -> int:
+        """
+        Allow one batch queued behind each running one, so a worker
+        never idles waiting for the scheduler and there is something
+        to steal.
+        """
+        return self.num_workers * 2
+
+    def start(self):
+        self._closing = False
+        self._workers = [
+            _ProcessWorker(worker_id, self.shm_bytes) for worker_id in range(self.num_workers)
+        ]
+        # Start every process first so they boot in parallel
+        for worker in self._workers:
+            self._spawn(worker)
+        for worker in self._workers:
+            self._wait_ready(worker)
+            worker.thread = threading.Thread(
+                target=self._dispatch_loop,
+                args=(worker,),
+                name=f"dispatch-{worker.worker_id}",
+                daemon=True,
+            )
+            worker.thread.start()
+
+    def _spawn(self, worker: _ProcessWorker):
+        parent_conn, child_conn = self._ctx.Pipe()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                worker.worker_id,
+                child_conn,
+                worker.shm.name,
+                self.max_sessions,
+                self.session_ttl_s,
+                self.roi_margin,
+                self.enabled_models,
+            ),
+            name=f"inference-{worker.worker_id}",
+            daemon=True,
+        )
+        worker.process.start()
+        child_conn.close()
+        worker.conn = parent_conn
+
+    def _wait_ready(self, worker: _ProcessWorker):
+        _, worker.pid = worker.conn.recv()
+        worker.last_active = time.monotonic()
+
+    def _respawn(self, worker: _ProcessWorker):
+        worker.conn.close()
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.restarts += 1
+        self._spawn(worker)
+        self._wait_ready(worker)
+
+    def _session_worker(self, session_id: str) -> _ProcessWorker:
+        return self._workers[zlib.crc32(session_id.encode()) % len(self._workers)]
+
+    def _enqueue(self, task: _Task, target: _ProcessWorker | None = None):
+        with self._cond:
+            if self._closing or not self._workers:
+                raise RuntimeError("Worker pool is not running")
+            if target is None:
+                target = min(self._workers, key=lambda w: len(w.tasks) + w.busy)
+            target.tasks.append(task)
+            self._cond.notify_all()
+
+    async def submit(self, model: str, images: list, session_ids: list | None = None) -> list:
+        """
+        Queue a batch and wait for its results. Untagged frames go to
+        the least loaded worker as one stealable task; frames tagged
+        with a session id are split off to their session's worker.
+        """
+        if model not in MODELS:
+            raise ValueError(f"Unknown model: {model}")
+        loop = asyncio.get_running_loop()
+
+        if not session_ids or not any(session_ids):
+            task = _Task(model, images, loop.create_future(), loop)
+            self._enqueue(task)
+            return await task.future
+
+        groups: dict[int | None, list[int]] = {}
+        for i, session_id in enumerate(session_ids):
+            key = self._session_worker(session_id).worker_id if session_id else None
+            groups.setdefault(key, []).append(i)
+
+        parts = []
+        for worker_id, indices in groups.items():
+            task = _Task(
+                model,
+                [images[i] for i in indices],
+                loop.create_future(),
+                loop,
+                session_ids=[session_ids[i] for i in indices],
+                pinned=worker_id is not None,
+            )
+            self._enqueue(task, self._workers[worker_id] if worker_id is not None else None)
+            parts.append((indices, task.future))
+
+        results = [None] * len(images)
+        for indices, future in parts:
+            for i, result in zip(indices, await future):
+                results[i] = result
+        return results
+
+    async def end_session(self, session_id: str) -> bool:
+        """Release a streaming session's tracking graphs in its worker."""
+        loop = asyncio.get_running_loop()
+        task = _Task("end_session", [session_id], loop.create_future(), loop, pinned=True)
+        self._enqueue(task, self._session_worker(session_id))
+        return await task.future
+
+    async def _broadcast(self, command: str, *args) -> list:
+        """Send a control command to every worker; their replies in worker order."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for worker in self._workers:
+            task = _Task(command, list(args), loop.create_future(), loop, pinned=True)
+            self._enqueue(task, worker)
+            futures.append(task.future)
+        return await asyncio.gather(*futures)
+
+    async def warm_up(self, models):
+        """Load the models in every worker process and run each once."""
+        await self._broadcast("warm_up", list(models))
+
+    def loaded_models(self) -> dict[str, int]:
+        """How many workers have each model loaded."""
+        return {
+            model: sum(model in worker.models for worker in self._workers)
+            for model in self.enabled_models
+        }
+
+    async def start_profiler(self, interval_s: float):
+        """Start sampling inside every worker process."""
+        await self._broadcast("profile_start", interval_s)
+
+    async def stop_profiler(self) -> Counter:
+        """Stop the workers' profilers; their stacks are rooted at worker-<id>."""
+        stacks = Counter()
+        for worker, worker_stacks in zip(self._workers, await self._broadcast("profile_stop")):
+            for stack, count in worker_stacks.items():
+                stacks[f"worker-{worker.worker_id};{stack}"] += count
+        return stacks
+
+    def session_stats(self) -> dict:
+        totals: dict = {}
+        for worker in self._workers:
+            for key, value in worker.session_stats.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def _next_task(self, worker: _ProcessWorker) -> _Task | None:
+        with self._cond:
+            while not self._closing:
+                if worker.tasks:
+                    return worker.tasks.popleft()
+                task = self._steal(worker)
+                if task is not None:
+                    return task
+                self._cond.wait()
+            return None
+
+    def _steal(self, thief: _ProcessWorker) -> _Task | None:
+        """Take the newest unpinned task from the most loaded other worker."""
+        for victim in sorted(self._workers, key=lambda w: len(w.tasks), reverse=True):
+            if victim is thief or not victim.tasks:
+                continue
+            for i in range(len(victim.tasks) - 1, -1, -1):
+                if not victim.tasks[i].pinned:
+                    task = victim.tasks[i]
+                    del victim.tasks[i]
+                    thief.batches_stolen += 1
+                    return task
+        return None
+
+    def _dispatch_loop(self, worker: _ProcessWorker):
+        while True:
+            task = self._next_task(worker)
+            if task is None:
+                break
+            worker.busy = True
+            try:
+                if task.model in CONTROL_COMMANDS:
+                    task.resolve(self._request(worker, (task.model, *task.images)))
+                    continue
+                task.resolve(self._execute(worker, task.model, task.images, task.session_ids))
+                worker.batches_completed += 1
+                worker.jobs_completed += len(task.images)
+            except (EOFError, OSError) as e:
+                worker.errors += 1
+                task.fail(RuntimeError(f"Inference worker {worker.worker_id} died: {e!r}"))
+                try:
+                    self._respawn(worker)
+                except Exception as respawn_error:
+                    print(f"❌ Could not restart worker {worker.worker_id}: {respawn_error!r}")
+                    time.sleep(1)
+            except Exception as e:
+                worker.errors += 1
+                task.fail(e)
+            finally:
+                worker.busy = False
+                worker.last_active = time.monotonic()
+
+        try:
+            worker.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+
+    def _execute(
+        self, worker: _ProcessWorker, model: str, images: list, session_ids: list | None
+    ) -> list:
+        """Pack frames into the worker's arena, splitting batches that do not fit."""
+        results = []
+        frames = []
+        start = 0
+        offset = 0
+
+        def flush(end: int):
+            ids = session_ids[start:end] if session_ids else None
+            results.extend(self._request(worker, ("predict", model, frames, ids)))
+
+        for i, image in enumerate(images):
+            if isinstance(image, FrameData):
+                data = memoryview(image.buffer).cast("B")
+                nbytes = data.nbytes
+            else:
+                image = np.ascontiguousarray(image, dtype=np.uint8)
+                nbytes = image.nbytes
+            if nbytes > self.shm_bytes:
+                if isinstance(image, FrameData):
+                    # A memoryview cannot be pickled
+                    image = dataclasses.replace(image, buffer=bytes(data))
+                frames.append(("inline", image))
+                continue
+            if offset + nbytes > self.shm_bytes:
+                flush(i)
+                frames, start, offset = [], i, 0
+            if isinstance(image, FrameData):
+                worker.shm.buf[offset:offset + nbytes] = data
+                spec = (image.pixel_format, image.height, image.width, image.reduction)
+                frames.append(("shm_data", offset, nbytes, spec))
+            else:
+                view = np.ndarray(image.shape, dtype=np.uint8, buffer=worker.shm.buf, offset=offset)
+                view[...] = image
+                frames.append(("shm", offset, image.shape))
+            offset += nbytes
+        if frames:
+            flush(len(images))
+        return results
+
+    def _request(self, worker: _ProcessWorker, message: tuple):
+        worker.conn.send(message)
+        reply = worker.conn.recv()
+        if reply[0] != "ok":
+            raise RuntimeError(reply[1])
+        worker.session_stats = reply[2]["sessions"]
+        worker.models = reply[2]["models"]
+        return reply[1]
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers) and not self._closing
+
+    def health(self) -> list[dict]:
+        return [worker.health() for worker in self._workers]
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            if worker.thread is not None:
+                worker.thread.join()
+            for task in worker.tasks:
+                task.fail(RuntimeError("Worker pool closed"))
+            worker.tasks.clear()
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.kill()
+            worker.shm.close()
+            worker.shm.unlink()
+        self._workers = []
+
+
+def create_worker_pool(
+    mode: str,
+    num_workers: int,
+    shm_mb: int = 16,
+    max_sessions: int = 64,
+    session_ttl_s: float = 30.0,
+    roi_margin: float = 0.0,
+    enabled_models=tuple(STATIC_CLASSIFIERS),
+):
+    """Build the worker pool selected by the WORKER_MODE setting."""
+    if mode == "process":
+        return ProcessWorkerPool(
+            num_workers=num_workers,
+            shm_mb=shm_mb,
+            max_sessions=max_sessions,
+            session_ttl_s=session_ttl_s,
+            roi_margin=roi_margin,
+            enabled_models=enabled_models,
+        )
+    if mode == "thread":
+        return ThreadWorkerPool(
+            num_workers=num_workers,
+            max_sessions=max_sessions,
+            session_ttl_s=session_ttl_s,
+            roi_margin=roi_margin,
+            enabled_models=enabled_models,
+        )
+    raise ValueError(f"Unknown worker mode: {mode}")
@@ -1,36 +1,228 @@
 import base64
+from dataclasses import dataclass
+
 import numpy as np
 import cv2
 
 
+# Raw (pre-decoded) pixel layouts accepted by the binary endpoints
+RAW_FRAME_FORMATS = ("rgb", "bgr", "nv12")
+
+# Downscale factor → imdecode flag. libjpeg decodes JPEGs at 1/2, 1/4
+# or 1/8 size directly (DCT scaling), much cheaper than decode + resize.
+# MediaPipe works on normalized coordinates and resizes internally, so
+# landmarks are unaffected apart from precision.
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
 def decode_base64_image(image_base64: str) -> np.ndarray:
     """
     Convert a base64 string into an image array.
-    
+
     The frontend captures a camera frame and sends it as base64 text.
     This function converts that text back into an image OpenCV can read.
     """
+    return decode_image_bytes(decode_base64_bytes(image_base64))
+
+
+def decode_base64_bytes(image_base64: str) -> bytes:
+    """Strip an optional data-URL header and return the encoded image bytes."""
     # Remove header if present (e.g. "data:image/jpeg;base64,")
     if "," in image_base64:
         image_base64 = image_base64.split(",")[1]
 
     # Decode base64 string to bytes
-    image_bytes = base64.b64decode(image_base64)
+    return base64.b64decode(image_base64)
+
+
+def decode_image_bytes(image_bytes, reduction: int = 1) -> np.ndarray:
+    """
+    Decode an encoded JPEG/PNG buffer into a BGR image.
 
-    # Convert bytes to numpy array
+    Accepts anything exposing the buffer protocol (bytes, bytearray,
+    memoryview). np.frombuffer wraps the buffer without copying it,
+    so the request body goes straight into cv2.imdecode.
+    reduction (1, 2, 4 or 8) decodes at 1/reduction of the size.
+    Returns None if the bytes are not a valid image.
+    """
+    if reduction not in DECODE_FLAGS:
+        raise ValueError(f"Unsupported decode reduction: {reduction}")
     np_array = np.frombuffer(image_bytes, dtype=np.uint8)
+    if np_array.size == 0:
+        return None
+    return cv2.imdecode(np_array, DECODE_FLAGS[reduction])
 
-    # Decode numpy array to actual image
-    image = cv2.imdecode(np_array, cv2.IMREAD_COLOR)
 
+def decode_raw_frame(buffer, height: int, width: int, pixel_format: str = "rgb") -> np.ndarray:
+    """
+    Wrap a raw pre-decoded frame as an RGB image ready for MediaPipe.
+
+    rgb  — height * width * 3 bytes, used as-is (zero copy)
+    bgr  — height * width * 3 bytes, converted to RGB
+    nv12 — height * width * 3 / 2 bytes (Y plane + interleaved UV)
+
+    Raises ValueError if the buffer size does not match the shape.
+    """
+    if pixel_format not in RAW_FRAME_FORMATS:
+        raise ValueError(f"Unsupported pixel format: {pixel_format}")
+    if height <= 0 or width <= 0:
+        raise ValueError("Frame shape must be positive")
+
+    np_array = np.frombuffer(buffer, dtype=np.uint8)
+
+    if pixel_format == "nv12":
+        if height % 2 or width % 2:
+            raise ValueError("NV12 frames need even width and height")
+        expected = height * width * 3 // 2
+        if np_array.size != expected:
+            raise ValueError(f"Expected {expected} bytes for NV12 {height}x{width}, got {np_array.size}")
+        yuv = np_array.reshape(height * 3 // 2, width)
+        return cv2.cvtColor(yuv, cv2.COLOR_YUV2RGB_NV12)
+
+    expected = height * width * 3
+    if np_array.size != expected:
+        raise ValueError(f"Expected {expected} bytes for {pixel_format} {height}x{width}, got {np_array.size}")
+    image = np_array.reshape(height, width, 3)
+
+    if pixel_format == "bgr":
+        return preprocess_image(image)
     return image
 
 
-def preprocess_image(image: np.ndarray) -> np.ndarray:
+def decode_frame(
+    buffer,
+    pixel_format: str | None = None,
+    height: int = 0,
+    width: int = 0,
+    reduction: int = 1,
+) -> np.ndarray:
+    """
+    Turn a binary frame into an RGB image ready for MediaPipe.
+
+    Without a pixel_format the buffer is an encoded JPEG/PNG, decoded at
+    1/reduction size; otherwise it is a raw frame of the given shape
+    (see decode_raw_frame). Raises ValueError if it cannot be decoded.
+    """
+    if pixel_format:
+        return decode_raw_frame(buffer, height, width, pixel_format)
+
+    image = decode_image_bytes(buffer, reduction)
+    if image is None:
+        raise ValueError("Could not decode image")
+    # The decoded buffer belongs to this frame, so convert it in place
+    return preprocess_image(image, out=image)
+
+
+@dataclass(slots=True)
+class FrameData:
+    """
+    An undecoded frame plus what decode_frame needs to decode it.
+
+    The HTTP and WebSocket handlers pass these to the scheduler as-is,
+    so decoding happens on the inference workers instead of the event loop.
+    """
+    buffer: bytes | memoryview
+    pixel_format: str | None = None
+    height: int = 0
+    width: int = 0
+    reduction: int = 1
+
+    def decode(self) -> np.ndarray:
+        return decode_frame(self.buffer, self.pixel_format, self.height, self.width, self.reduction)
+
+
+def preprocess_image(image: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
     """
     Prepare image for MediaPipe processing.
     MediaPipe expects RGB format but OpenCV loads as BGR.
+
+    Pass out (which may be the image itself) to convert into an existing
+    buffer instead of allocating a new one.
     """
     # Convert BGR → RGB
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    return image_rgb
\ No newline at end of file
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=out)
+    return image_rgb
+
+
+class RegionOfInterest:
+    """
+    Crop window that follows the previous detection in a video stream.
+
+    After a detection, update() places a window around the landmarks'
+    bounding box (grown by `margin` on each side); crop() then hands
+    MediaPipe only that part of the next frame. The window only moves
+    when the detection gets close to its edge, so consecutive frames
+    usually share a crop and tracking stays stable. When nothing is
+    detected the next frame is processed in full.
+
+    crop() copies into a buffer reused across frames, so the crop of
+    the previous frame is overwritten — use one instance per session.
+    """
+
+    def __init__(self, margin: float = 0.5):
+        self.margin = margin
+        self.window: tuple[int, int, int, int] | None = None    # x0, y0, x1, y1 in pixels
+        self._buffer: np.ndarray | None = None
+
+    def crop(self, image: np.ndarray) -> np.ndarray:
+        """The current window of the frame as a contiguous array."""
+        if self.window is None:
+            return image
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = self.window
+        x1, y1 = min(x1, width), min(y1, height)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            self.window = None
+            return image
+
+        view = image[y0:y1, x0:x1]
+        if self._buffer is None or self._buffer.shape != view.shape:
+            self._buffer = np.empty(view.shape, dtype=image.dtype)
+        np.copyto(self._buffer, view)
+        return self._buffer
+
+    def to_frame_coords(self, points: np.ndarray, frame_shape: tuple) -> np.ndarray:
+        """Map landmarks normalized to the crop back to the full frame."""
+        if self.window is None:
+            return points
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = self.window
+        crop_w, crop_h = min(x1, width) - x0, min(y1, height) - y0
+        points = points.copy()
+        points[:, 0] = (points[:, 0] * crop_w + x0) / width
+        points[:, 1] = (points[:, 1] * crop_h + y0) / height
+        # MediaPipe z uses roughly the same scale as x
+        points[:, 2] = points[:, 2] * crop_w / width
+        return points
+
+    def update(self, points: np.ndarray | None, frame_shape: tuple):
+        """Re-centre the window on full-frame normalized landmarks (or reset it)."""
+        if points is None:
+            self.window = None
+            return
+        height, width = frame_shape[:2]
+        bx0, by0 = points[:, 0].min() * width, points[:, 1].min() * height
+        bx1, by1 = points[:, 0].max() * width, points[:, 1].max() * height
+
+        if self.window is not None:
+            # Keep the window while the box stays inside its inner part
+            x0, y0, x1, y1 = self.window
+            inset_x = (x1 - x0) * self.margin / (1 + 2 * self.margin) / 2
+            inset_y = (y1 - y0) * self.margin / (1 + 2 * self.margin) / 2
+            if (bx0 >= x0 + inset_x and by0 >= y0 + inset_y
+                    and bx1 <= x1 - inset_x and by1 <= y1 - inset_y):
+                return
+
+        pad_x = (bx1 - bx0) * self.margin
+        pad_y = (by1 - by0) * self.margin
+        self.window = (
+            max(0, int(bx0 - pad_x)),
+            max(0, int(by0 - pad_y)),
+            min(width, int(bx1 + pad_x) + 1),
+            min(height, int(by1 + pad_y) + 1),
+        )
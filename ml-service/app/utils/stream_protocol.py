@@ -0,0 +1,54 @@
+"""
+Binary framing for the /stream WebSocket.
+
+Every frame message is one binary WebSocket message:
+
+    header  — seq (uint32), model (uint8), pixel format (uint8),
+              height (uint16), width (uint16), session id length (uint16)
+    session — UTF-8 session id (may be empty)
+    payload — encoded JPEG/PNG, or raw pixels when format != 0
+
+Replies are JSON text messages: {"seq": n, "result": {...}} or
+{"seq": n, "error": "..."}. Clients may also send JSON text control
+messages such as {"type": "end_session", "session_id": "..."}.
+"""
+import struct
+
+HEADER = struct.Struct("!IBBHHH")
+SEQ = struct.Struct("!I")   # Leading field of HEADER
+
+# 2 runs both models on one decode; its result is {"gesture": ..., "face": ...}
+MODEL_CODES = {0: "gesture", 1: "face", 2: "multi"}
+FORMAT_CODES = {0: None, 1: "rgb", 2: "bgr", 3: "nv12"}
+
+
+def peek_seq(message: bytes) -> int | None:
+    """
+    Sequence number of a frame message, read before anything else is
+    validated, so an error reply can still name the frame it rejects.
+    None if the message is too short to hold one.
+    """
+    if len(message) < SEQ.size:
+        return None
+    return SEQ.unpack_from(message)[0]
+
+
+def parse_frame_message(message: bytes) -> tuple[int, str, str | None, int, int, str | None, memoryview]:
+    """
+    Split a binary frame message into its fields.
+    The payload is returned as a memoryview, so it is never copied.
+    Raises ValueError for malformed messages.
+    """
+    if len(message) < HEADER.size:
+        raise ValueError("Message shorter than header")
+    seq, model_code, format_code, height, width, session_len = HEADER.unpack_from(message)
+    if model_code not in MODEL_CODES:
+        raise ValueError(f"Unknown model code: {model_code}")
+    if format_code not in FORMAT_CODES:
+        raise ValueError(f"Unknown pixel format code: {format_code}")
+
+    view = memoryview(message)
+    session_end = HEADER.size + session_len
+    session_id = bytes(view[HEADER.size:session_end]).decode() or None
+    payload = view[session_end:]
+    return seq, MODEL_CODES[model_code], FORMAT_CODES[format_code], height, width, session_id, payload
@@ -0,0 +1,93 @@
+"""
+Preprocessing micro-benchmark: JPEG decode at 1/1, 1/2 and 1/4 size,
+BGR→RGB conversion, and the RegionOfInterest crop, for common webcam
+resolutions.
+
+Run from ml-service/:
+    python -m benchmarks.bench_preprocess [--repeat 50]
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.utils.image_processor import (
+    RegionOfInterest,
+    decode_frame,
+    decode_image_bytes,
+    preprocess_image,
+)
+
+RESOLUTIONS = {
+    "480p": (480, 640),
+    "720p": (720, 1280),
+    "1080p": (1080, 1920),
+}
+REDUCTIONS = (1, 2, 4)
+
+
+def synthetic_jpeg(height: int, width: int) -> bytes:
+    """A smooth gradient with noise — compresses like a real camera frame."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    noise = rng.integers(0, 24, size=(height, width, 3))
+    image = np.clip(base + noise, 0, 255).astype(np.uint8)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    assert ok
+    return encoded.tobytes()
+
+
+def hand_sized_roi(height: int, width: int) -> RegionOfInterest:
+    """An ROI around a box about a fifth of the frame, as for a hand at arm's length."""
+    roi = RegionOfInterest(margin=0.5)
+    points = np.array([[0.4, 0.4, 0.0], [0.6, 0.6, 0.0]], dtype=np.float32)
+    roi.update(points, (height, width))
+    return roi
+
+
+def time_ms(fn, repeat: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    header = f"{'frame':>6} {'stage':<22} {'ms':>8} {'output':>12}"
+    print(header)
+    print("─" * len(header))
+
+    for name, (height, width) in RESOLUTIONS.items():
+        jpeg = synthetic_jpeg(height, width)
+
+        for reduction in REDUCTIONS:
+            image = decode_frame(jpeg, reduction=reduction)
+            ms = time_ms(lambda: decode_frame(jpeg, reduction=reduction), args.repeat)
+            shape = f"{image.shape[1]}x{image.shape[0]}"
+            print(f"{name:>6} {f'decode+rgb 1/{reduction}':<22} {ms:>8.2f} {shape:>12}")
+
+        bgr = decode_image_bytes(jpeg)
+        out = np.empty_like(bgr)
+        ms = time_ms(lambda: preprocess_image(bgr), args.repeat)
+        print(f"{name:>6} {'bgr→rgb (alloc)':<22} {ms:>8.2f} {'':>12}")
+        ms = time_ms(lambda: preprocess_image(bgr, out=out), args.repeat)
+        print(f"{name:>6} {'bgr→rgb (reused)':<22} {ms:>8.2f} {'':>12}")
+
+        roi = hand_sized_roi(height, width)
+        crop = roi.crop(out)
+        ms = time_ms(lambda: roi.crop(out), args.repeat)
+        shape = f"{crop.shape[1]}x{crop.shape[0]}"
+        print(f"{name:>6} {'roi crop':<22} {ms:>8.2f} {shape:>12}")
+        pixels = crop.shape[0] * crop.shape[1] / (height * width)
+        print(f"{name:>6} {'roi pixels vs full':<22} {pixels:>8.0%} {'':>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+"""
+Inference benchmark suite: per-stage timings and full round trips.
+
+Run from ml-service/:
+    python -m benchmarks.bench_suite [--output bench.json] [--baseline old.json]
+        [--suites stages,ml,backend] [--concurrency 1,4,16] [--requests 200]
+        [--resolution 480p] [--frames DIR [--max-frames 100]]
+
+Suites:
+- stages  — in this process, one call at a time: base64 decode,
+            cv2.imdecode, colour conversion, MediaPipe process (Hands,
+            FaceMesh) and landmark classification
+- ml      — HTTP (/predict, /predict/binary) and WebSocket (/stream)
+            round trips against an ml-service started on a loopback port
+- backend — HTTP (/api/v1/gestures/ml/predict-face) and WebSocket
+            (/api/v1/ws/{id}) round trips through a backend started in
+            front of that ml-service (neither endpoint needs the database)
+
+Frames are synthetic unless --frames points at a directory of recorded
+JPEG/PNG frames. Synthetic frames contain no hand or face, so MediaPipe
+only runs detection; use recorded frames to include landmark models.
+Recorded frames (an evenly spaced sample of at most --max-frames) are
+cycled through, every call taking the next one. The ml-service under
+test runs with its result cache off, so repeats measure inference, not
+cache hits.
+
+Every benchmark reports p50/p95/p99 latency and throughput per
+concurrency level. Results are written as JSON; with --baseline the
+run is compared with an earlier file (and --max-regression makes a
+p95 regression beyond that percentage exit non-zero).
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+import httpx
+import numpy as np
+import websockets
+
+from app.models.face_classifier import FaceClassifier, NUM_FACE_LANDMARKS, classify_face_landmarks
+from app.models.gesture_classifier import GestureClassifier, NUM_HAND_LANDMARKS, classify_landmarks
+from app.utils.image_processor import decode_base64_bytes, decode_image_bytes, preprocess_image
+from app.utils.stream_protocol import HEADER
+from benchmarks.bench_preprocess import RESOLUTIONS, synthetic_jpeg
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = SERVICE_DIR.parent / "backend"
+SUITES = ("stages", "ml", "backend")
+
+
+# ─── Measurement ─────────────────────────────────────────────────────────────
+
+def summarize(latencies_s: list[float], wall_s: float) -> dict:
+    ms = np.array(latencies_s) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(ms),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "throughput_per_s": round(len(ms) / wall_s, 1),
+    }
+
+
+def bench_sync(fn, repeat: int, warmup: int = 3) -> dict:
+    """Time fn() repeat times, one call at a time."""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def bench_async(open_client, concurrency: int, requests: int, warmup: int = 2) -> dict:
+    """
+    Run `requests` calls spread over `concurrency` clients, each issuing
+    one call at a time. open_client(i) is an async context manager
+    yielding an async call().
+    """
+    latencies = []
+    remaining = requests
+
+    async def client(i: int):
+        nonlocal remaining
+        async with open_client(i) as call:
+            for _ in range(warmup):
+                await call()
+            await ready.wait()
+            while remaining > 0:
+                remaining -= 1
+                t0 = time.perf_counter()
+                await call()
+                latencies.append(time.perf_counter() - t0)
+
+    ready = asyncio.Event()
+    clients = [asyncio.create_task(client(i)) for i in range(concurrency)]
+    # Give every client time to connect and warm up before the clock starts
+    await asyncio.sleep(0.5)
+    start = time.perf_counter()
+    ready.set()
+    await asyncio.gather(*clients)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+# ─── Stage Benchmarks ────────────────────────────────────────────────────────
+
+def cycle(items: list):
+    """A callable returning the next of items on each call, round-robin."""
+    return itertools.cycle(items).__next__
+
+
+def run_stages(frames: list[bytes], repeat: int) -> dict:
+    next_jpeg = cycle(frames)
+    next_base64 = cycle([base64.b64encode(jpeg).decode() for jpeg in frames])
+    bgr_frames = [decode_image_bytes(jpeg) for jpeg in frames]
+    next_bgr = cycle(bgr_frames)
+    next_rgb = cycle([preprocess_image(bgr) for bgr in bgr_frames])
+    # Recorded frames may differ in size; one output buffer per shape
+    outs = {bgr.shape: np.empty_like(bgr) for bgr in bgr_frames}
+
+    def bgr_to_rgb():
+        bgr = next_bgr()
+        preprocess_image(bgr, out=outs[bgr.shape])
+
+    gesture = GestureClassifier()
+    face = FaceClassifier()
+    rng = np.random.default_rng(0)
+    hand_points = rng.random((1, NUM_HAND_LANDMARKS, 3), dtype=np.float32)
+    face_points = rng.random((1, NUM_FACE_LANDMARKS, 3), dtype=np.float32)
+    try:
+        stages = {
+            "base64_decode": lambda: decode_base64_bytes(next_base64()),
+            "imdecode": lambda: decode_image_bytes(next_jpeg()),
+            "bgr_to_rgb": bgr_to_rgb,
+            "mediapipe_hands_process": lambda: gesture.hands.process(next_rgb()),
+            "mediapipe_face_mesh_process": lambda: face.face_mesh.process(next_rgb()),
+            "classify_hand_landmarks": lambda: classify_landmarks(hand_points),
+            "classify_face_landmarks": lambda: classify_face_landmarks(face_points),
+        }
+        results = {}
+        for name, fn in stages.items():
+            results[f"stage.{name}"] = {"1": bench_sync(fn, repeat)}
+            print(f"  {name:<30} p50 {results[f'stage.{name}']['1']['p50_ms']:>9.3f} ms")
+        return results
+    finally:
+        gesture.close()
+        face.close()
+
+
+# ─── Local Services ──────────────────────────────────────────────────────────
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalService:
+    """A uvicorn subprocess on a loopback port, up once health_path answers 200."""
+
+    def __init__(
+        self,
+        name: str,
+        cwd: Path,
+        env: dict | None = None,
+        startup_timeout_s: float = 180.0,
+        health_path: str = "/health",
+    ):
+        self.name = name
+        self.health_path = health_path
+        self.cwd = cwd
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = {**os.environ, **(env or {})}
+        self.startup_timeout_s = startup_timeout_s
+        self.process: subprocess.Popen | None = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=self.cwd,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + self.startup_timeout_s
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited during startup ({self.process.returncode})")
+            try:
+                if httpx.get(f"{self.url}{self.health_path}", timeout=1.0).status_code == 200:
+                    print(f"  {self.name} up on port {self.port}")
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"{self.name} did not become healthy in {self.startup_timeout_s:g}s")
+
+    def __exit__(self, *exc):
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class _HttpClient:
+    def __init__(self, request):
+        self.request = request
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(timeout=30.0)
+        return lambda: self.request(self.client)
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+
+class _WsClient:
+    def __init__(self, url: str, exchange):
+        self.url = url
+        self.exchange = exchange
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, max_size=None)
+        return lambda: self.exchange(self.ws)
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+
+def http_post(url: str, next_kwargs):
+    """POST with the arguments next_kwargs() returns — the next frame each call."""
+    async def request(client: httpx.AsyncClient):
+        response = await client.post(url, **next_kwargs())
+        response.raise_for_status()
+    return lambda i: _HttpClient(request)
+
+
+def ml_stream(url: str, next_jpeg):
+    async def exchange(ws):
+        await ws.send(HEADER.pack(0, 0, 0, 0, 0, 0) + next_jpeg())
+        reply = json.loads(await ws.recv())
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+    return lambda i: _WsClient(url, exchange)
+
+
+def backend_ws(base_url: str, next_message):
+    async def exchange(ws):
+        await ws.send(next_message())
+        reply = json.loads(await ws.recv())
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+    return lambda i: _WsClient(f"{base_url}/api/v1/ws/bench-{i}", exchange)
+
+
+async def run_round_trips(benchmarks: dict, concurrency: list[int], requests: int) -> dict:
+    results = {}
+    for name, open_client in benchmarks.items():
+        results[name] = {}
+        for level in concurrency:
+            summary = await bench_async(open_client, level, requests)
+            results[name][str(level)] = summary
+            print(f"  {name:<30} c={level:<3} p50 {summary['p50_ms']:>9.2f} ms  "
+                  f"p99 {summary['p99_ms']:>9.2f} ms  {summary['throughput_per_s']:>8.1f}/s")
+    return results
+
+
+def run_services(frames: list[bytes], suites: list[str], concurrency: list[int], requests: int) -> dict:
+    encoded = [base64.b64encode(jpeg).decode() for jpeg in frames]
+    next_json = cycle([{"json": {"image_base64": image_base64}} for image_base64 in encoded])
+    next_binary = cycle([{"content": jpeg, "headers": {"Content-Type": "image/jpeg"}} for jpeg in frames])
+    next_message = cycle([json.dumps({"image_base64": image_base64}) for image_base64 in encoded])
+    results = {}
+    # Repeated frames must not be served from the result cache
+    # /ready: measure warm classifiers, not model loading
+    with LocalService("ml-service", SERVICE_DIR, {"RESULT_CACHE_MODE": "off"}, health_path="/ready") as ml:
+        ws_base = ml.url.replace("http://", "ws://")
+        if "ml" in suites:
+            results.update(asyncio.run(run_round_trips({
+                "ml.http_json": http_post(f"{ml.url}/predict", next_json),
+                "ml.http_binary": http_post(f"{ml.url}/predict/binary", next_binary),
+                "ml.websocket": ml_stream(f"{ws_base}/stream", cycle(frames)),
+            }, concurrency, requests)))
+
+        if "backend" in suites:
+            backend_env = {
+                "ML_SERVICE_URL": ml.url,
+                "ML_SERVICE_URLS": "[]",
+                # Nothing benchmarked touches the database; fail fast instead of hanging
+                "POSTGRES_HOST": "127.0.0.1",
+                "POSTGRES_PORT": "1",
+            }
+            with LocalService("backend", BACKEND_DIR, backend_env) as backend:
+                results.update(asyncio.run(run_round_trips({
+                    "backend.http_predict_face": http_post(
+                        f"{backend.url}/api/v1/gestures/ml/predict-face", next_json
+                    ),
+                    "backend.websocket": backend_ws(backend.url.replace("http://", "ws://"), next_message),
+                }, concurrency, requests)))
+    return results
+
+
+# ─── Report ──────────────────────────────────────────────────────────────────
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict) -> float:
+    """Print the change against a baseline; returns the worst p95 regression (%)."""
+    worst = 0.0
+    print(f"\n{'benchmark':<34} {'c':>3} {'p50 Δ':>9} {'p95 Δ':>9} {'thrpt Δ':>9}")
+    for name, levels in results.items():
+        for level, now in levels.items():
+            before = baseline.get("results", {}).get(name, {}).get(level)
+            if before is None:
+                continue
+
+            def delta(key: str) -> float:
+                return (now[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+
+            worst = max(worst, delta("p95_ms"))
+            print(f"{name:<34} {level:>3} {delta('p50_ms'):>+8.1f}% {delta('p95_ms'):>+8.1f}% "
+                  f"{delta('throughput_per_s'):>+8.1f}%")
+    return worst
+
+
+def load_frames(frames_dir: Path | None, resolution: str, max_frames: int = 100) -> tuple[list[bytes], str]:
+    """
+    The frames to benchmark with, as JPEG: an evenly spaced sample of
+    at most max_frames recorded frames from frames_dir, or one
+    synthetic frame.
+    """
+    if frames_dir is None:
+        height, width = RESOLUTIONS[resolution]
+        return [synthetic_jpeg(height, width)], f"synthetic {width}x{height}"
+    paths = [p for p in sorted(frames_dir.iterdir()) if p.suffix.lower() in (".jpg", ".jpeg", ".png")]
+    if len(paths) > max_frames:
+        paths = [paths[i * len(paths) // max_frames] for i in range(max_frames)]
+    frames, shapes = [], set()
+    for path in paths:
+        image = cv2.imread(str(path))
+        if image is None:
+            print(f"  skipping unreadable frame {path.name}")
+            continue
+        ok, encoded = cv2.imencode(".jpg", image)
+        frames.append(encoded.tobytes())
+        shapes.add(f"{image.shape[1]}x{image.shape[0]}")
+    if not frames:
+        raise SystemExit(f"No JPEG/PNG frames in {frames_dir}")
+    return frames, f"{len(frames)} recorded frames from {frames_dir.name} ({', '.join(sorted(shapes))})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference benchmark suite")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"comma-separated subset of {SUITES}")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=200, help="round trips per concurrency level")
+    parser.add_argument("--repeat", type=int, default=100, help="calls per stage benchmark")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="480p")
+    parser.add_argument("--frames", type=Path, default=None, help="directory of recorded frames")
+    parser.add_argument("--max-frames", type=int, default=100,
+                        help="recorded frames to sample from --frames (each is held decoded in memory)")
+    parser.add_argument("--output", type=Path, default=Path("bench.json"))
+    parser.add_argument("--baseline", type=Path, default=None, help="earlier output to compare with")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="exit 1 if any p95 got worse than this many percent")
+    args = parser.parse_args()
+
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    if set(suites) - set(SUITES):
+        parser.error(f"--suites must be a subset of {SUITES}")
+    concurrency = [int(c) for c in args.concurrency.split(",")]
+    frames, frame = load_frames(args.frames, args.resolution, max(1, args.max_frames))
+
+    results = {}
+    if "stages" in suites:
+        print("⏱️  Stages")
+        results.update(run_stages(frames, args.repeat))
+    if "ml" in suites or "backend" in suites:
+        print("🌐 Round trips")
+        results.update(run_services(frames, suites, concurrency, args.requests))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "frame": frame,
+            "frames": len(frames),
+            "frame_bytes": round(sum(map(len, frames)) / len(frames)),
+            "result_cache": "off",
+            "worker_mode": os.environ.get("WORKER_MODE", "thread"),
+            "inference_workers": os.environ.get("INFERENCE_WORKERS", "2"),
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\n📄 Results written to {args.output}")
+
+    if args.baseline is not None:
+        worst = compare(results, json.loads(args.baseline.read_text()))
+        if args.max_regression is not None and worst > args.max_regression:
+            print(f"❌ p95 regressed by {worst:.1f}% (limit {args.max_regression:g}%)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
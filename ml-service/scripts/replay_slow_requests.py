@@ -0,0 +1,73 @@
+"""
+Replay frames kept by the slow request recorder through the classifiers.
+
+Run from ml-service/:
+    python -m scripts.replay_slow_requests data/profiles/slow-<timestamp> [--repeat 5]
+
+Each frame runs --repeat times on a one-thread worker pool (the same
+decode and inference path as the service, without HTTP or batching),
+and its recorded stage timings are printed next to the replayed median.
+A frame that is slow again points at the frame itself (size, content);
+one that replays fast points at contention in production (queueing,
+batching, CPU). Session frames replay on a fresh tracking session, so
+the first repetition pays for detection like a new stream would.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.worker_pool import TIMINGS_KEY, create_worker_pool
+from app.utils.image_processor import FrameData
+
+
+def _format(stages: dict) -> str:
+    return "  ".join(f"{stage}={ms:.1f}" for stage, ms in stages.items())
+
+
+async def replay(directory: Path, repeat: int):
+    index = json.loads((directory / "index.json").read_text())
+    pool = create_worker_pool("thread", num_workers=1, roi_margin=settings.ROI_MARGIN)
+    pool.start()
+    try:
+        # Keep model loading out of the replayed timings
+        await pool.warm_up(pool.enabled_models)
+        for entry in index:
+            data = (directory / entry["file"]).read_bytes()
+            session_id = f"replay:{entry['file']}" if entry["session_id"] else None
+            runs: dict[str, list[float]] = {}
+            for _ in range(repeat):
+                frame = FrameData(
+                    data, entry["pixel_format"], entry["height"], entry["width"], settings.DECODE_REDUCTION
+                )
+                result = (await pool.submit(entry["model"], [frame], [session_id]))[0]
+                if isinstance(result, Exception):
+                    print(f"❌ {entry['file']}: {result}")
+                    break
+                for stage, ns in result[TIMINGS_KEY].items():
+                    runs.setdefault(stage, []).append(ns / 1e6)
+            if session_id:
+                await pool.end_session(session_id)
+
+            recorded = entry["stages_ms"]
+            print(f"🎞️  {entry['file']}  {entry['route']}  {entry['model']}  "
+                  f"{entry['frame_bytes']} bytes  recorded total {recorded.get('total', 0):.1f} ms")
+            print(f"    recorded: {_format(recorded)}")
+            if runs:
+                print(f"    replayed: {_format({s: statistics.median(v) for s, v in runs.items()})}")
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded slow requests through the classifiers")
+    parser.add_argument("directory", type=Path, help="a slow-<timestamp> directory written by the recorder")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per frame (median is reported)")
+    args = parser.parse_args()
+    asyncio.run(replay(args.directory, max(1, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Run several ML service replicas locally, one uvicorn process per port,
+as a stand-in for a scaled-out deployment.
+
+Run from ml-service/:
+    python -m scripts.run_replicas [--replicas 3] [--port 8101]
+
+Point the backend at them with the printed ML_SERVICE_URLS value.
+Each replica inherits this environment (INFERENCE_WORKERS, WORKER_MODE, ...).
+Ctrl+C stops them all; a replica that exits is reported, not restarted,
+so killing one by pid is an easy way to exercise failover.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local ML service replicas")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8101, help="port of the first replica")
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    service_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processes = {}
+    for i in range(args.replicas):
+        port = args.port + i
+        processes[port] = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", args.host, "--port", str(port), "--log-level", "warning"],
+            cwd=service_dir,
+        )
+        print(f"🚀 Replica on port {port} (pid {processes[port].pid})")
+
+    urls = [f"http://{args.host}:{port}" for port in processes]
+    print(f"\nML_SERVICE_URLS='{json.dumps(urls)}'\n")
+
+    try:
+        while processes:
+            for port, process in list(processes.items()):
+                if process.poll() is not None:
+                    print(f"⚠️  Replica on port {port} exited with {process.returncode}")
+                    del processes[port]
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("👋 Stopping replicas...")
+        for process in processes.values():
+            process.send_signal(signal.SIGINT)
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import pytest
+
+from app.batch import ResultWriter, SourceFrame, to_row
+
+
+def write(output_dir, rows: list[dict], models=("gesture",)):
+    writer = ResultWriter(output_dir, "npz", list(models), part_size=2)
+    for row in rows:
+        writer.add(row)
+    writer.flush()
+    return writer
+
+
+def test_frames_that_failed_are_retried_on_resume(tmp_path):
+    write(tmp_path, [
+        {"frame_id": "a.jpg", "gesture_gesture_name": "fist"},
+        {"frame_id": "b.jpg", "error": "Could not decode image"},
+        {"frame_id": "c.jpg", "gesture_gesture_name": "open_palm"},
+    ])
+    assert ResultWriter(tmp_path, "npz", ["gesture"]).done_ids() == {"a.jpg", "c.jpg"}
+
+
+def test_resuming_with_other_models_is_refused(tmp_path):
+    write(tmp_path, [{"frame_id": "a.jpg", "gesture_gesture_name": "fist"}])
+    with pytest.raises(SystemExit, match="gesture"):
+        ResultWriter(tmp_path, "npz", ["gesture", "face"])
+    assert ResultWriter(tmp_path, "npz", ["gesture"]).done_ids() == {"a.jpg"}
+
+
+def test_exceptions_without_a_message_still_mark_the_row_failed():
+    row = to_row(SourceFrame("a.jpg", frame=None), ["gesture"], BrokenPipeError())
+    assert row["error"] == "BrokenPipeError"
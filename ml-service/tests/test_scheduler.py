@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+
+from app.services.scheduler import BatchScheduler, SchedulerOverloaded
+from app.services.worker_pool import TIMINGS_KEY
+
+
+class FakePool:
+    """Records each submitted batch; holds them while `gate` is clear."""
+
+    def __init__(self, capacity: int = 1, results=None):
+        self.capacity = capacity
+        self.batches: list[tuple[str, list, list]] = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.results = results or (lambda model, image: {"model": model, "image": image})
+
+    async def submit(self, model, images, session_ids=None):
+        self.batches.append((model, list(images), list(session_ids)))
+        await self.gate.wait()
+        return [self.results(model, image) for image in images]
+
+
+async def started(pool, **kwargs) -> BatchScheduler:
+    scheduler = BatchScheduler(pool, **kwargs)
+    await scheduler.start()
+    return scheduler
+
+
+def test_concurrent_frames_are_batched_up_to_max_batch_size():
+    async def scenario():
+        pool = FakePool()
+        scheduler = await started(pool, max_batch_size=4, max_wait_us=10_000)
+        results = await asyncio.gather(*(scheduler.submit("gesture", i) for i in range(10)))
+        await scheduler.stop()
+        return pool, scheduler, results
+
+    pool, scheduler, results = asyncio.run(scenario())
+    # Each caller gets the result for its own frame, in order
+    assert [r["image"] for r in results] == list(range(10))
+    assert [len(images) for _, images, _ in pool.batches] == [4, 4, 2]
+    assert scheduler.stats()["jobs_completed"] == 10
+    assert scheduler.stats()["batch_size_histogram"] == {2: 1, 4: 2}
+
+
+def test_lone_frame_is_dispatched_after_max_wait():
+    async def scenario():
+        pool = FakePool()
+        scheduler = await started(pool, max_batch_size=8, max_wait_us=0)
+        result = await asyncio.wait_for(scheduler.submit("face", "frame"), timeout=1.0)
+        await scheduler.stop()
+        return pool, result
+
+    pool, result = asyncio.run(scenario())
+    assert result == {"model": "face", "image": "frame"}
+    assert pool.batches == [("face", ["frame"], [None])]
+
+
+def test_mixed_batch_runs_each_model_separately():
+    async def scenario():
+        pool = FakePool()
+        scheduler = await started(pool, max_batch_size=8, max_wait_us=10_000)
+        results = await asyncio.gather(
+            scheduler.submit("gesture", 0, "s1"),
+            scheduler.submit("face", 1),
+            scheduler.submit("gesture", 2),
+        )
+        await scheduler.stop()
+        return pool, results
+
+    pool, results = asyncio.run(scenario())
+    assert [r["model"] for r in results] == ["gesture", "face", "gesture"]
+    assert sorted(pool.batches) == [("face", [1], [None]), ("gesture", [0, 2], ["s1", None])]
+
+
+def test_only_capacity_batches_are_in_flight():
+    async def scenario():
+        pool = FakePool(capacity=2)
+        pool.gate.clear()
+        scheduler = await started(pool, max_batch_size=1, max_wait_us=0)
+        tasks = [asyncio.create_task(scheduler.submit("gesture", i)) for i in range(5)]
+        await asyncio.sleep(0.05)
+        in_flight = len(pool.batches)
+        queued = scheduler.queue_depth
+        pool.gate.set()
+        await asyncio.gather(*tasks)
+        await scheduler.stop()
+        return in_flight, queued
+
+    in_flight, queued = asyncio.run(scenario())
+    # No batch is formed without a free worker, so the rest stay queued
+    # (and count towards admission control)
+    assert in_flight == 2
+    assert queued == 3
+
+
+def test_full_queue_rejects_fast():
+    async def scenario():
+        pool = FakePool(capacity=1)
+        pool.gate.clear()
+        scheduler = await started(pool, max_batch_size=1, max_wait_us=0, max_queue=2)
+        first = asyncio.create_task(scheduler.submit("gesture", 0))
+        await asyncio.sleep(0.01)   # dispatched, holding the only worker
+        queued = [asyncio.create_task(scheduler.submit("gesture", i)) for i in (1, 2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(SchedulerOverloaded):
+            await scheduler.submit("gesture", 3)
+        pool.gate.set()
+        results = await asyncio.gather(first, *queued)
+        await scheduler.stop()
+        return scheduler, results
+
+    scheduler, results = asyncio.run(scenario())
+    assert [r["image"] for r in results] == [0, 1, 2]
+    assert scheduler.stats()["jobs_rejected"] == 1
+
+
+def test_frame_errors_fail_only_their_own_job():
+    def results(model, image):
+        return ValueError("bad frame") if image == "bad" else {"image": image}
+
+    async def scenario():
+        scheduler = await started(FakePool(results=results), max_batch_size=4, max_wait_us=10_000)
+        outcome = await asyncio.gather(
+            scheduler.submit("gesture", "ok"),
+            scheduler.submit("gesture", "bad"),
+            return_exceptions=True,
+        )
+        await scheduler.stop()
+        return scheduler, outcome
+
+    scheduler, (good, bad) = asyncio.run(scenario())
+    assert good == {"image": "ok"}
+    assert isinstance(bad, ValueError)
+    assert scheduler.jobs_completed == 1 and scheduler.jobs_failed == 1
+
+
+def test_pool_failure_fails_every_job_of_the_batch():
+    class BrokenPool(FakePool):
+        async def submit(self, model, images, session_ids=None):
+            raise RuntimeError("worker died")
+
+    async def scenario():
+        scheduler = await started(BrokenPool(), max_batch_size=4, max_wait_us=10_000)
+        outcome = await asyncio.gather(
+            *(scheduler.submit("gesture", i) for i in range(3)), return_exceptions=True
+        )
+        # The worker slot is released, so the scheduler keeps serving
+        scheduler.pool = FakePool()
+        after = await asyncio.wait_for(scheduler.submit("gesture", 9), timeout=1.0)
+        await scheduler.stop()
+        return outcome, after
+
+    outcome, after = asyncio.run(scenario())
+    assert all(isinstance(e, RuntimeError) for e in outcome)
+    assert after["image"] == 9
+
+
+def test_worker_timings_gain_queue_and_worker_stages():
+    async def scenario():
+        pool = FakePool(results=lambda model, image: {TIMINGS_KEY: {"decode": 5}})
+        scheduler = await started(pool, max_wait_us=0)
+        result = await scheduler.submit("gesture", 0)
+        await scheduler.stop()
+        return result
+
+    timings = asyncio.run(scenario())[TIMINGS_KEY]
+    assert timings["decode"] == 5
+    assert timings["queue"] >= 0 and timings["worker"] >= 0
+
+
+def test_stop_fails_frames_still_queued():
+    async def scenario():
+        pool = FakePool(capacity=1)
+        pool.gate.clear()
+        scheduler = await started(pool, max_batch_size=1, max_wait_us=0)
+        first = asyncio.create_task(scheduler.submit("gesture", 0))
+        await asyncio.sleep(0.01)
+        waiting = asyncio.create_task(scheduler.submit("gesture", 1))
+        await asyncio.sleep(0.01)
+        stopping = asyncio.create_task(scheduler.stop())
+        await asyncio.sleep(0.01)
+        pool.gate.set()   # let the in-flight batch finish
+        await stopping
+        return await asyncio.gather(first, waiting, return_exceptions=True)
+
+    first, waiting = asyncio.run(scenario())
+    assert first == {"model": "gesture", "image": 0}
+    assert isinstance(waiting, RuntimeError)
+
+
+def test_submit_before_start_is_an_error():
+    with pytest.raises(RuntimeError):
+        asyncio.run(BatchScheduler(FakePool()).submit("gesture", 0))
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app.services import sessions as sessions_module
+from app.services.sessions import SessionClosed, SessionStore, TrackingSession
+from app.services.worker_pool import COMBINED_MODEL, _predict_frames
+
+
+class FakeTracker:
+    """Stands in for a tracking-mode MediaPipe classifier."""
+
+    built = []
+
+    def __init__(self, static_image_mode: bool):
+        self.closed = False
+        FakeTracker.built.append(self)
+
+    def predict(self, image, roi=None) -> dict:
+        return {"latency_ms": 0}
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def trackers(monkeypatch):
+    FakeTracker.built = []
+    monkeypatch.setattr(
+        sessions_module, "TRACKING_CLASSIFIERS", {"gesture": FakeTracker, "face": FakeTracker}
+    )
+    return FakeTracker.built
+
+
+def test_closed_session_refuses_to_build_graphs(trackers):
+    session = TrackingSession("s1")
+    session.predict("gesture", None)
+    session.close()
+    assert session.closed and trackers[0].closed
+    with pytest.raises(SessionClosed):
+        session.predict("face", None)
+    with pytest.raises(SessionClosed):
+        session.get_classifier("face")
+    assert len(trackers) == 1
+
+
+def test_locked_refetches_a_session_evicted_before_its_lock_was_taken(trackers):
+    store = SessionStore()
+    stale = store.get("s1")
+    store.end("s1")
+    # The first lookup races the eviction and still returns the old session
+    lookups = iter([stale])
+    fresh_get = store.get
+    store.get = lambda session_id: next(lookups, None) or fresh_get(session_id)
+
+    with store.locked("s1") as session:
+        assert session is not stale and not session.closed
+        session.predict("gesture", None)
+    assert [tracker.closed for tracker in trackers] == [False]
+
+
+def test_frames_are_counted_once_per_frame():
+    store = SessionStore()
+    image = np.zeros((2, 2, 3), dtype=np.uint8)
+    classifiers = {"gesture": FakeTracker(True), "face": FakeTracker(True)}
+    _predict_frames(classifiers, store, COMBINED_MODEL, [image, image], ["s1", "s1"])
+    _predict_frames(classifiers, store, "gesture", [image], ["s1"])
+    assert store.get("s1").frames == 3
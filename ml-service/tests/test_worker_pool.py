@@ -0,0 +1,176 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.worker_pool import ProcessWorkerPool, _frame_from_arena, _ProcessWorker, _Task
+from app.utils.image_processor import FrameData
+
+SHM_BYTES = 4096
+
+
+class ArenaPool(ProcessWorkerPool):
+    """
+    A process pool without processes: _request reads the frames back
+    out of the arena in this process, the way _worker_main does.
+    """
+
+    def __init__(self, num_workers: int = 2):
+        super().__init__(num_workers=num_workers)
+        self.shm_bytes = SHM_BYTES
+        self._workers = [_ProcessWorker(i, SHM_BYTES) for i in range(num_workers)]
+        self.messages = []
+
+    def _request(self, worker, message):
+        _, model, frames, session_ids = message
+        self.messages.append((frames, session_ids))
+        results = []
+        for frame in frames:
+            image = _frame_from_arena(worker.shm, frame)
+            if isinstance(image, FrameData):
+                results.append(bytes(image.buffer))
+            else:
+                # Copy before the arena is overwritten by the next batch
+                results.append(np.array(image))
+        return results
+
+    def release(self):
+        for worker in self._workers:
+            worker.shm.close()
+            worker.shm.unlink()
+
+
+@pytest.fixture
+def pool():
+    pool = ArenaPool()
+    yield pool
+    pool.release()
+
+
+def task(pinned: bool = False) -> _Task:
+    return _Task("gesture", [], future=None, loop=None, pinned=pinned)
+
+
+# ─── Shared-memory arena ─────────────────────────────────────────────────────
+
+def test_images_and_frame_data_round_trip_through_the_arena(pool):
+    image = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    encoded = FrameData(b"\xff\xd8 jpeg bytes", None, 0, 0, 2)
+    raw = FrameData(memoryview(bytearray(b"rgbrgb")), "rgb", 1, 2)
+
+    results = pool._execute(pool._workers[0], "gesture", [image, encoded, raw], None)
+
+    assert np.array_equal(results[0], image)
+    assert results[1] == b"\xff\xd8 jpeg bytes"
+    assert results[2] == b"rgbrgb"
+    frames, _ = pool.messages[0]
+    assert [frame[0] for frame in frames] == ["shm", "shm_data", "shm_data"]
+    # Packed back to back, FrameData fields travel alongside the offset
+    assert frames[1][1] == image.nbytes
+    assert frames[2][3] == ("rgb", 1, 2, 1)
+
+
+def test_batch_larger_than_the_arena_is_split(pool):
+    images = [np.full((1000,), i, dtype=np.uint8) for i in range(10)]
+    session_ids = [f"s{i}" for i in range(10)]
+
+    results = pool._execute(pool._workers[0], "gesture", images, session_ids)
+
+    assert [int(r[0]) for r in results] == list(range(10))
+    # 4 frames of 1000 bytes fit in 4096
+    assert [len(frames) for frames, _ in pool.messages] == [4, 4, 2]
+    # Each message carries the session ids of its own frames
+    assert [ids for _, ids in pool.messages] == [session_ids[0:4], session_ids[4:8], session_ids[8:10]]
+
+
+def test_frame_larger_than_the_arena_goes_inline(pool):
+    big = np.ones((SHM_BYTES + 1,), dtype=np.uint8)
+    big_data = FrameData(memoryview(bytes(SHM_BYTES + 1)))
+    small = np.zeros((10,), dtype=np.uint8)
+
+    results = pool._execute(pool._workers[0], "gesture", [big, small, big_data], None)
+
+    assert np.array_equal(results[0], big)
+    assert np.array_equal(results[1], small)
+    assert results[2] == bytes(SHM_BYTES + 1)
+    frames, _ = pool.messages[0]
+    assert [frame[0] for frame in frames] == ["inline", "shm", "inline"]
+    # Memoryviews cannot be pickled, so inline FrameData carries bytes
+    assert isinstance(frames[2][1].buffer, bytes)
+
+
+# ─── Work stealing ───────────────────────────────────────────────────────────
+
+def test_idle_worker_steals_newest_unpinned_task_from_busiest(pool):
+    thief, victim = pool._workers
+    oldest, newest = task(), task()
+    victim.tasks.extend([oldest, newest])
+
+    assert pool._next_task(thief) is newest
+    assert list(victim.tasks) == [oldest]
+    assert thief.batches_stolen == 1
+
+
+def test_pinned_session_tasks_are_never_stolen(pool):
+    thief, victim = pool._workers
+    stealable, pinned = task(), task(pinned=True)
+    victim.tasks.extend([stealable, pinned])
+
+    assert pool._steal(thief) is stealable
+    assert pool._steal(thief) is None
+    assert list(victim.tasks) == [pinned]
+
+
+def test_worker_takes_its_own_tasks_first_in_order(pool):
+    worker, other = pool._workers
+    first, second = task(), task()
+    worker.tasks.extend([first, second])
+    other.tasks.append(task())
+
+    assert pool._next_task(worker) is first
+    assert pool._next_task(worker) is second
+    assert worker.batches_stolen == 0
+
+
+def test_steals_from_the_longest_deque():
+    pool = ArenaPool(num_workers=3)
+    try:
+        thief, short, long = pool._workers
+        short.tasks.append(task())
+        target = task()
+        long.tasks.extend([task(), task(), target])
+
+        assert pool._steal(thief) is target
+    finally:
+        pool.release()
+
+
+def test_batches_go_to_the_least_loaded_worker(pool):
+    first, second = pool._workers
+    first.tasks.append(task())
+    pool._enqueue(task())
+    assert (len(first.tasks), len(second.tasks)) == (1, 1)
+
+    second.busy = True
+    pool._enqueue(task())
+    assert (len(first.tasks), len(second.tasks)) == (2, 1)
+
+
+# ─── Real worker processes ───────────────────────────────────────────────────
+
+def test_process_pool_round_trip():
+    """Spawned workers decode frames and answer control messages (no model loads)."""
+    async def scenario(pool):
+        undecodable = await pool.submit("gesture", [FrameData(b"not an image")])
+        ended = await pool.end_session("nobody")
+        return undecodable, ended
+
+    pool = ProcessWorkerPool(num_workers=2, shm_mb=1)
+    pool.start()
+    try:
+        (result,), ended = asyncio.run(scenario(pool))
+    finally:
+        pool.close()
+    assert isinstance(result, ValueError)
+    assert ended is False
+    assert pool._workers == []